@@ -0,0 +1,148 @@
+"""Compresión negociada (zstd o gzip) de las respuestas grandes.
+
+Middleware ASGI: elige la codificación según ``Accept-Encoding`` (zstd si el
+cliente la acepta y el paquete opcional ``zstandard`` está instalado; si no,
+gzip) y solo comprime respuestas de al menos ``RESPONSE_COMPRESSION_MIN_BYTES``
+con un tipo de contenido comprimible. Las respuestas en streaming se
+comprimen por fragmentos, vaciando el compresor en cada uno para no retener
+datos; Server-Sent Events no se comprime (prima la latencia de cada evento).
+"""
+from typing import Callable, List, Optional, Tuple
+import zlib
+
+from . import config
+
+try:  # Compresión zstd opcional.
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain", "text/csv")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Codificación a usar según la cabecera ``Accept-Encoding`` (o ``None``)."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("zstd", "gzip"):
+        if encoding == "zstd" and zstandard is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Interfaz común (``compress``/``flush``/``finish``) sobre zlib y zstandard."""
+
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=config.RESPONSE_ZSTD_LEVEL).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._final = zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib.
+            self._obj = zlib.compressobj(config.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._sync = zlib.Z_SYNC_FLUSH
+            self._final = zlib.Z_FINISH
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        out = self._obj.compress(data)
+        return out + self._obj.flush(self._sync) if flush else out
+
+    def finish(self) -> bytes:
+        return self._obj.flush(self._final)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressor = _Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: Callable, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                # Primer fragmento del cuerpo: se decide si se comprime.
+                if not _should_compress(start["headers"], len(body), more_body, self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                start["headers"] = _compressed_headers(start["headers"], encoding)
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    start["headers"].append((b"content-length", str(len(data)).encode()))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send(start)
+            if more_body:
+                data = compressor.compress(body, flush=True)
+                if data:
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _should_compress(headers: List[Tuple[bytes, bytes]], size: int, more_body: bool, minimum_size: int) -> bool:
+    content_type = b""
+    for name, value in headers:
+        name = name.lower()
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value.lower()
+        if name == b"content-length" and int(value) < minimum_size:
+            return False
+    if not content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES):
+        return False
+    # Sin Content-Length (streaming) solo se sabe el tamaño del primer fragmento.
+    return more_body or size >= minimum_size
+
+
+def _compressed_headers(headers: List[Tuple[bytes, bytes]], encoding: str) -> List[Tuple[bytes, bytes]]:
+    result = [(name, value) for name, value in headers if name.lower() not in (b"content-length", b"vary")]
+    vary = [value for name, value in headers if name.lower() == b"vary"]
+    result.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    result.append((b"content-encoding", encoding.encode()))
+    return result
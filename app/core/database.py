@@ -1,21 +1,142 @@
 # Importa las funciones y clases necesarias de SQLAlchemy.
-from sqlalchemy import create_engine
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Importa la configuración de la base de datos.
+from . import config
+from .config import DATABASE_URL, ASYNC_DATABASE_URL
+
+
+class PoolMetrics:
+    """Métricas de un pool de conexiones a la base de datos.
+
+    Cuenta las conexiones entregadas, el tiempo de espera para obtenerlas,
+    los timeouts y el uso de conexiones de overflow (por encima de `pool_size`).
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_checkouts = 0
+        self.overflow_peak = 0
+
+    def record_checkout(self, wait: float, overflow: int) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        if wait > self.wait_max:
+            self.wait_max = wait
+        if overflow > 0:
+            self.overflow_checkouts += 1
+            if overflow > self.overflow_peak:
+                self.overflow_peak = overflow
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "overflow_checkouts": self.overflow_checkouts,
+            "overflow_peak": self.overflow_peak,
+        }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+
+def _instrumented_pool(base: type, metrics: PoolMetrics) -> type:
+    """Crea una subclase del pool `base` que registra sus métricas en `metrics`."""
 
-# Importa la URL de la base de datos desde el archivo de configuración.
-from .config import DATABASE_URL
+    class InstrumentedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            metrics.pool = self
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.timeouts += 1
+                raise
+            metrics.record_checkout(time.perf_counter() - started, self.overflow())
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def _engine_options(url: str, pool_class: type, metrics: PoolMetrics, is_async: bool) -> Dict[str, Any]:
+    """Opciones del motor a partir de la configuración (pool, timeouts, executemany)."""
+    if url.startswith("sqlite"):
+        # SQLite usa su propio pool por defecto (un fichero local, sin red).
+        return {}
+    options: Dict[str, Any] = {
+        "poolclass": _instrumented_pool(pool_class, metrics),
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if url.startswith("postgresql"):
+        if is_async:
+            if config.DB_STATEMENT_TIMEOUT_MS:
+                options["connect_args"] = {
+                    "server_settings": {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}
+                }
+        else:
+            # ``executemany_mode`` solo existe en el dialecto psycopg2.
+            if make_url(url).get_driver_name() == "psycopg2":
+                options["executemany_mode"] = config.DB_EXECUTEMANY_MODE
+            if config.DB_STATEMENT_TIMEOUT_MS:
+                options["connect_args"] = {
+                    "options": f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+                }
+    return options
+
+
+# Métricas de los pools de conexiones (se exponen en /metrics/db-pool).
+pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
 
 # Crea el motor de la base de datos.
 # El motor es el punto de entrada a la base de datos.
 engine = create_engine(
-    DATABASE_URL
+    DATABASE_URL,
+    **_engine_options(DATABASE_URL, QueuePool, pool_metrics["sync"], is_async=False)
 )
 
 # Crea una clase SessionLocal.
 # Esta clase será la que cree las sesiones de la base de datos.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono (asyncpg para PostgreSQL, aiosqlite para SQLite).
+# Lo usan los endpoints `async def` para no bloquear el event loop con la base de datos.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **_engine_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, pool_metrics["async"], is_async=True)
+)
+
+# Sesiones asíncronas. `expire_on_commit=False` evita recargas implícitas
+# (que no están permitidas en modo asíncrono) al leer objetos tras un commit.
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Crea una clase Base.
 # Esta clase será la base para todos los modelos de la base de datos.
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
@@ -0,0 +1,289 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import bisect
+import threading
+import time
+
+from . import config
+
+
+class LatencyStats:
+    """Contador simple de latencias (número, media y máximo)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "avg_ms": round(avg * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+# --- Registro de métricas en formato Prometheus ---
+#
+# Registro en memoria del proceso, sin dependencias externas. ``/metrics``
+# devuelve ``registry.render()`` en el formato de texto de Prometheus.
+
+# Límites (segundos) de los histogramas de latencia.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[Any, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Líneas de valores en formato de texto de Prometheus."""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type}"] + self.samples()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas del proceso."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self, extra: Iterable[_Metric] = ()) -> str:
+        """Salida en formato de texto de Prometheus.
+
+        ``extra`` son métricas calculadas en el momento (por ejemplo, el estado
+        de los pools o de las cachés) que no se guardan en el registro.
+        """
+        metrics = list(self._metrics.values()) + list(extra)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro compartido por todo el proceso.
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "Peticiones HTTP atendidas.", ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP.", ("method", "route"))
+provider_request_duration = registry.histogram(
+    "gemini_request_duration_seconds", "Duración de cada intento de llamada al proveedor.", ("kind", "model"))
+provider_responses = registry.counter(
+    "gemini_responses_total", "Respuestas del proveedor por código de estado (o 'error' de red).",
+    ("kind", "model", "status"))
+provider_tokens = registry.counter(
+    "gemini_tokens_total", "Tokens consumidos según el campo de uso de la respuesta.", ("model", "type"))
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "Duración de cada etapa de una operación.", ("operation", "stage"))
+
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI que cuenta y cronometra cada petición por ruta.
+
+    La ruta es la plantilla completa (``/gemini/embeddings/{embedding_id}``),
+    no la URL concreta: ``root_path`` (prefijo de montaje) más la plantilla
+    de la ruta, que incluye el prefijo de su ``APIRouter``. En respuestas en
+    streaming se mide hasta el último fragmento.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # El router deja la ruta elegida en el propio scope.
+            route = scope.get("route")
+            path = scope.get("root_path", "") + route.path_format if route is not None else "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=path)
+            http_requests.inc(method=method, route=path, status=status_code)
+
+
+_known_models: Optional[FrozenSet[str]] = None
+
+
+def model_label(model: Optional[str]) -> str:
+    """Etiqueta ``model`` de las métricas: el nombre si es un modelo conocido, si no ``"other"``."""
+    global _known_models
+    if _known_models is None:
+        names = {config.GEMINI_MODEL, config.GEMINI_EMBED_MODEL}
+        names.update(config.METRICS_MODELS.split(","))
+        # Modelos de los endpoints ("url|peso|modelo").
+        names.update(item.split("|")[2] for item in config.GEMINI_ENDPOINTS.split(",") if item.count("|") >= 2)
+        _known_models = frozenset(name.strip() for name in names if name and name.strip())
+    return model if model in _known_models else "other"
+
+
+@contextmanager
+def time_stage(operation: str, stage: str):
+    """Mide el bloque como la etapa ``stage`` de ``operation`` en ``stage_duration``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - started, operation=operation, stage=stage)
+
+
+# Nombres de los campos de uso de tokens según el formato del proveedor.
+_USAGE_FIELDS = {
+    "prompt": ("promptTokenCount", "prompt_tokens", "input_tokens"),
+    "completion": ("candidatesTokenCount", "completion_tokens", "output_tokens"),
+    "total": ("totalTokenCount", "total_tokens"),
+}
+
+
+def record_token_usage(model: str, response: Any) -> None:
+    """Suma a ``gemini_tokens_total`` el uso informado en la respuesta, si lo hay."""
+    if not isinstance(response, dict):
+        return
+    usage = response.get("usageMetadata") or response.get("usage")
+    if not isinstance(usage, dict):
+        return
+    for kind, fields in _USAGE_FIELDS.items():
+        for field in fields:
+            value = usage.get(field)
+            if isinstance(value, (int, float)):
+                provider_tokens.inc(value, model=model_label(model), type=kind)
+                break
+
+
+def gauges_from_stats(prefix: str, label: str, stats: Dict[str, Dict[str, Any]]) -> List[Gauge]:
+    """Convierte ``{nombre: {campo: valor}}`` en gauges ``{prefix}_{campo}{label="nombre"}``.
+
+    Sirve para exponer los diccionarios de ``stats()`` de pools y cachés; los
+    campos no numéricos se ignoran.
+    """
+    gauges: Dict[str, Gauge] = {}
+    for name, values in stats.items():
+        for field, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"{prefix}_{field}"
+            gauge = gauges.get(metric)
+            if gauge is None:
+                gauge = gauges[metric] = Gauge(metric, f"{prefix} {field}.", (label,))
+            gauge.set(value, **{label: name})
+    return list(gauges.values())
@@ -0,0 +1,70 @@
+"""Paginación por cursor (keyset) sobre ``(created_at, id)``.
+
+En lugar de ``OFFSET`` (que recorre y descarta todas las filas anteriores),
+cada página filtra a partir de la última fila devuelta, así que el coste no
+depende de la profundidad. El cursor es opaco para el cliente: base64 de la
+clave de la última fila.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, Optional, Tuple
+import json
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    """Cursor opaco que apunta justo después de la fila ``(created_at, row_id)``."""
+    key = [created_at.isoformat() if created_at else None, row_id]
+    return urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Inverso de ``encode_cursor``. Lanza ``ValueError`` si el cursor no es válido."""
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(query: Any, created_col, id_col, cursor: Optional[str], limit: int,
+                descending: bool = True, dialect: str = ""):
+    """Aplica orden, filtro del cursor y límite a ``query`` (un ``select``).
+
+    Se pide una fila más que ``limit`` para saber si hay página siguiente
+    (ver ``next_cursor``). En SQLite se pagina solo por ``id``: ``created_at``
+    se guarda como texto (``CURRENT_TIMESTAMP`` sin microsegundos) y no se
+    compara bien con el ``datetime`` del cursor; como lo rellena el servidor
+    al insertar, el orden por ``id`` es el mismo.
+    """
+    by_id = dialect == "sqlite"
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if by_id:
+            after = id_col < row_id if descending else id_col > row_id
+        elif created_at is None:
+            raise ValueError("Invalid cursor")
+        elif descending:
+            after = or_(created_col < created_at, and_(created_col == created_at, id_col < row_id))
+        else:
+            after = or_(created_col > created_at, and_(created_col == created_at, id_col > row_id))
+        query = query.where(after)
+    columns = (id_col,) if by_id else (created_col, id_col)
+    if descending:
+        columns = tuple(column.desc() for column in columns)
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def next_cursor(rows: list, limit: int) -> Optional[str]:
+    """Recorta a ``limit`` la lista de ``keyset_page`` y devuelve el cursor siguiente.
+
+    Modifica ``rows`` en el sitio; devuelve ``None`` si no hay más páginas.
+    """
+    if len(rows) <= limit:
+        return None
+    del rows[limit:]
+    last = rows[-1]
+    return encode_cursor(getattr(last, "created_at", None), last.id)
+
@@ -1,16 +1,82 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import Optional, Tuple
+from ..core import config
 from ..core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from ..core.metrics import LatencyStats
 from ..schemas.token import TokenData
+from .ttl_cache import TTLCache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib/bcrypt y jose se importan la primera vez que se usan: así importar la
+# app (y arrancar cada worker) no paga su coste, y los tokens ya verificados
+# en ``token_cache`` no llegan a cargar jose.
+_pwd_context = None
+
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
+    return _pwd_context
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifica la contraseña y, si el hash usa un coste antiguo, devuelve uno nuevo."""
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+# --- Hash de contraseñas fuera del event loop ---
+# bcrypt consume cientos de ms de CPU por llamada. Se ejecuta en un pool de
+# procesos de tamaño fijo (sin contención por el GIL) y un semáforo limita las
+# operaciones pendientes para que una avalancha de logins no llene la cola.
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_slots: Optional[asyncio.Semaphore] = None
+hash_latency = {"hash": LatencyStats(), "verify": LatencyStats()}
+
+
+def _get_hash_pool() -> Tuple[ProcessPoolExecutor, asyncio.Semaphore]:
+    global _hash_pool, _hash_slots
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS)
+        _hash_slots = asyncio.Semaphore(config.PASSWORD_HASH_WORKERS * config.PASSWORD_HASH_QUEUE_PER_WORKER)
+    return _hash_pool, _hash_slots
+
+
+async def _run_in_hash_pool(kind: str, fn, *args):
+    pool, slots = _get_hash_pool()
+    async with slots:
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        finally:
+            hash_latency[kind].record(time.perf_counter() - started)
+
+
+async def aget_password_hash(password: str) -> str:
+    """Versión asíncrona de ``get_password_hash`` (se ejecuta en el pool de hash)."""
+    return await _run_in_hash_pool("hash", get_password_hash, password)
+
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Versión asíncrona de ``verify_and_update_password`` (se ejecuta en el pool de hash)."""
+    return await _run_in_hash_pool("verify", verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool, _hash_slots
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+        _hash_slots = None
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -18,7 +84,8 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -28,17 +95,33 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "refresh"})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception) -> TokenData:
+# Tokens ya verificados: token -> TokenData, hasta su "exp". Evita repetir la
+# verificación de la firma en cada petición del mismo usuario.
+token_cache = TTLCache(maxsize=config.TOKEN_CACHE_SIZE, ttl=0)
+
+def verify_token(token: str, credentials_exception, token_type: str = "access") -> TokenData:
+    """Verifica un JWT del tipo indicado ("access" o "refresh") y devuelve sus datos.
+
+    Los tokens válidos se guardan en ``token_cache`` hasta que caducan.
+    """
+    cached = token_cache.get((token_type, token))
+    if cached is not None:
+        return cached
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str | None = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type") != token_type:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    ttl = float(payload["exp"]) - time.time()
+    if ttl > 0:
+        token_cache.put((token_type, token), token_data, ttl=ttl)
     return token_data
@@ -0,0 +1,83 @@
+"""Serialización rápida de respuestas JSON y de vectores.
+
+``FastJSONResponse`` es la clase de respuesta por defecto de la app: usa
+``orjson`` si está instalado (varias veces más rápido que ``json`` y
+serializa arrays NumPy y fechas sin convertirlos antes) y, si no, ``json``
+compacto. Los endpoints de embeddings construyen el cuerpo con
+``embedding_payload`` y devuelven la respuesta directamente, sin validar de
+nuevo la lista de floats con Pydantic.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Literal
+import base64
+import json
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:  # Serializador JSON rápido opcional.
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+# Formato de los vectores en las respuestas: lista JSON de floats o bytes
+# float32 little-endian en base64 (unas 3 veces más pequeño y sin parseo).
+VectorEncoding = Literal["float", "base64"]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa ``content`` a JSON (UTF-8, sin espacios)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+                            | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` serializada con ``orjson`` cuando está disponible."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def encode_vector_base64(vector: Any) -> str:
+    """Vector como bytes float32 little-endian codificados en base64."""
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vector_base64(data: str) -> np.ndarray:
+    """Inversa de ``encode_vector_base64``."""
+    return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+
+def embedding_payload(embedding: Any, encoding: VectorEncoding = "float") -> Dict[str, Any]:
+    """Cuerpo de respuesta de un embedding (``StoredEmbedding`` o fila ``models.Embedding``).
+
+    Con las filas de la tabla se usa el array NumPy directamente (sin pasar
+    por una lista de floats de Python).
+    """
+    vector = embedding.array if hasattr(embedding, "array") else embedding.embedding
+    if encoding == "base64":
+        vector = encode_vector_base64(vector)
+    elif orjson is None and isinstance(vector, np.ndarray):
+        vector = vector.tolist()
+    payload = {
+        "id": embedding.id,
+        "embedding": vector,
+        "model": embedding.model,
+        "text": embedding.text,
+        "text_hash": embedding.text_hash,
+        "created_at": embedding.created_at,
+        "updated_at": embedding.updated_at,
+    }
+    if encoding == "base64":
+        payload["embedding_encoding"] = "base64_float32"
+    return payload
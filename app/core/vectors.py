@@ -0,0 +1,42 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+# Tipos binarios soportados para guardar vectores (siempre little-endian).
+STORAGE_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+    "int8": np.dtype("i1"),
+}
+
+
+def encode_vector(values: Any, dtype: str = "float32") -> Tuple[bytes, int, str, Optional[float]]:
+    """Codifica un vector como bytes.
+
+    Devuelve ``(blob, dim, dtype, scale)``. ``scale`` solo se usa con ``int8``:
+    cada componente se guarda como ``round(v / scale)`` con ``scale = max|v| / 127``.
+    """
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+    array = np.asarray(values, dtype=np.float32).reshape(-1)
+    scale = None
+    if dtype == "int8":
+        peak = float(np.abs(array).max()) if array.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        array = np.clip(np.rint(array / scale), -127, 127)
+    return array.astype(STORAGE_DTYPES[dtype]).tobytes(), int(array.size), dtype, scale
+
+
+def decode_vector(blob: bytes, dtype: str = "float32", scale: Optional[float] = None) -> np.ndarray:
+    """Decodifica un vector guardado con ``encode_vector`` como array float32.
+
+    Para ``float32`` no hay copia: el array es una vista (de solo lectura)
+    sobre los bytes de la fila.
+    """
+    array = np.frombuffer(blob, dtype=STORAGE_DTYPES[dtype])
+    if dtype == "float32":
+        return array
+    array = array.astype(np.float32)
+    if dtype == "int8" and scale:
+        array *= np.float32(scale)
+    return array
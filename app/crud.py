@@ -1,7 +1,8 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import select
+from typing import List, Optional, Tuple
 from . import models, schemas
+from .core.pagination import keyset_page, next_cursor
 from .core.security import get_password_hash
 
 
@@ -40,8 +41,13 @@ def create_system_message(db: Session, message: schemas.SystemMessage) -> models
 def get_system_message(db: Session, message_id: int) -> Optional[models.SystemMessage]:
     return db.query(models.SystemMessage).filter(models.SystemMessage.id == message_id).first()
 
-def get_system_messages(db: Session, skip: int = 0, limit: int = 100) -> List[models.SystemMessage]:
-    return db.query(models.SystemMessage).offset(skip).limit(limit).all()
+def get_system_messages(db: Session, cursor: Optional[str] = None,
+                        limit: int = 100) -> Tuple[List[models.SystemMessage], Optional[str]]:
+    query = keyset_page(select(models.SystemMessage), models.SystemMessage.created_at,
+                        models.SystemMessage.id, cursor, limit, descending=False,
+                        dialect=db.bind.dialect.name)
+    rows = list(db.scalars(query))
+    return rows, next_cursor(rows, limit)
 
 def update_system_message(db: Session, message_id: int, message: schemas.SystemMessage) -> Optional[models.SystemMessage]:
     db_message = db.query(models.SystemMessage).filter(models.SystemMessage.id == message_id).first()
@@ -56,11 +62,13 @@ def update_system_message(db: Session, message_id: int, message: schemas.SystemM
 # --- Embedding CRUD Operations ---
 
 def create_embedding(db: Session, embedding: schemas.EmbeddingResponse) -> models.Embedding:
-    db_embedding = models.Embedding(**embedding.model_dump())
-    db.add(db_embedding)
+    """Inserta un embedding de forma idempotente (si el ``text_hash`` ya existe no falla)."""
+    db.execute(
+        models.Embedding.insert_ignore_duplicates(db.bind.dialect.name),
+        [models.Embedding.row_values(embedding.model_dump())]
+    )
     db.commit()
-    db.refresh(db_embedding)
-    return db_embedding
+    return get_embedding_by_hash(db, embedding.text_hash)
 
 def get_embedding(db: Session, embedding_id: int) -> Optional[models.Embedding]:
     return db.query(models.Embedding).filter(models.Embedding.id == embedding_id).first()
@@ -68,8 +76,36 @@ def get_embedding(db: Session, embedding_id: int) -> Optional[models.Embedding]:
 def get_embedding_by_hash(db: Session, text_hash: str) -> Optional[models.Embedding]:
     return db.query(models.Embedding).filter(models.Embedding.text_hash == text_hash).first()
 
-def get_embeddings(db: Session, skip: int = 0, limit: int = 100) -> List[models.Embedding]:
-    return db.query(models.Embedding).order_by(desc(models.Embedding.created_at)).offset(skip).limit(limit).all()
+def get_embeddings_by_hashes(db: Session, text_hashes: List[str]) -> List[models.Embedding]:
+    """Busca varios embeddings con una sola consulta ``IN (...)``."""
+    if not text_hashes:
+        return []
+    return db.query(models.Embedding).filter(models.Embedding.text_hash.in_(text_hashes)).all()
+
+def create_embeddings(db: Session, embeddings: List[schemas.EmbeddingResponse]) -> List[models.Embedding]:
+    """Inserta varios embeddings en bloque, de forma idempotente."""
+    if not embeddings:
+        return []
+    db.execute(
+        models.Embedding.insert_ignore_duplicates(db.bind.dialect.name),
+        [models.Embedding.row_values(embedding.model_dump()) for embedding in embeddings]
+    )
+    db.commit()
+    return get_embeddings_by_hashes(db, [embedding.text_hash for embedding in embeddings])
+
+def get_embeddings(db: Session, cursor: Optional[str] = None, limit: int = 100,
+                   with_vector: bool = True) -> Tuple[List[models.Embedding], Optional[str]]:
+    query = select(models.Embedding)
+    if not with_vector:
+        query = query.options(defer(models.Embedding.vector))
+    query = keyset_page(query, models.Embedding.created_at, models.Embedding.id, cursor, limit,
+                        dialect=db.bind.dialect.name)
+    rows = list(db.scalars(query))
+    return rows, next_cursor(rows, limit)
+
+def iter_embeddings(db: Session, batch_size: int = 1000):
+    """Recorre todos los embeddings por bloques, sin cargar la tabla entera en memoria."""
+    return db.query(models.Embedding).yield_per(batch_size)
 
 def delete_embedding(db: Session, embedding_id: int) -> bool:
     db_embedding = db.query(models.Embedding).filter(models.Embedding.id == embedding_id).first()
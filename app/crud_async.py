@@ -0,0 +1,347 @@
+"""Versiones asíncronas (``AsyncSession``) de las operaciones de ``crud``.
+
+Las usan los endpoints ``async def`` para que las consultas no bloqueen el
+event loop. Mantienen los mismos nombres y parámetros que en ``crud``.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select, update
+from sqlalchemy.orm import aliased, defer
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from . import models, schemas
+from .core.pagination import decode_cursor, encode_cursor, keyset_page, next_cursor
+
+
+# --- User CRUD Operations ---
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.username == username))
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: str) -> models.User:
+    """Crea el usuario con un hash ya calculado (ver ``security.aget_password_hash``)."""
+    db_user = models.User(email=user.email, username=user.username, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user_password_hash(db: AsyncSession, db_user: models.User, hashed_password: str) -> None:
+    db_user.hashed_password = hashed_password
+    await db.commit()
+
+
+# --- System Message CRUD Operations ---
+
+async def create_system_message(db: AsyncSession, message: schemas.SystemMessage) -> models.SystemMessage:
+    db_message = models.SystemMessage(**message.model_dump(exclude={'created_at', 'updated_at'}))
+    db.add(db_message)
+    await db.commit()
+    await db.refresh(db_message)
+    return db_message
+
+async def get_system_message(db: AsyncSession, message_id: int) -> Optional[models.SystemMessage]:
+    return await db.get(models.SystemMessage, message_id)
+
+async def get_system_messages(db: AsyncSession, cursor: Optional[str] = None,
+                              limit: int = 100) -> Tuple[List[models.SystemMessage], Optional[str]]:
+    """Página de mensajes en orden de creación y cursor de la siguiente."""
+    query = keyset_page(select(models.SystemMessage), models.SystemMessage.created_at,
+                        models.SystemMessage.id, cursor, limit, descending=False,
+                        dialect=db.bind.dialect.name)
+    rows = list(await db.scalars(query))
+    return rows, next_cursor(rows, limit)
+
+async def update_system_message(db: AsyncSession, message_id: int, message: schemas.SystemMessage) -> Optional[models.SystemMessage]:
+    db_message = await db.get(models.SystemMessage, message_id)
+    if db_message:
+        for key, value in message.model_dump(exclude={'created_at', 'updated_at'}).items():
+            setattr(db_message, key, value)
+        await db.commit()
+        await db.refresh(db_message)
+    return db_message
+
+
+# --- Embedding CRUD Operations ---
+
+async def create_embedding(db: AsyncSession, embedding: schemas.EmbeddingResponse) -> models.Embedding:
+    """Inserta un embedding de forma idempotente (si el ``text_hash`` ya existe no falla)."""
+    await db.execute(
+        models.Embedding.insert_ignore_duplicates(db.bind.dialect.name),
+        [models.Embedding.row_values(embedding.model_dump())]
+    )
+    await db.commit()
+    return await get_embedding_by_hash(db, embedding.text_hash)
+
+async def create_embeddings(db: AsyncSession, embeddings: List[schemas.EmbeddingResponse]) -> List[models.Embedding]:
+    """Inserta varios embeddings en bloque, de forma idempotente."""
+    if not embeddings:
+        return []
+    await db.execute(
+        models.Embedding.insert_ignore_duplicates(db.bind.dialect.name),
+        [models.Embedding.row_values(embedding.model_dump()) for embedding in embeddings]
+    )
+    await db.commit()
+    return await get_embeddings_by_hashes(db, [embedding.text_hash for embedding in embeddings])
+
+async def get_embedding(db: AsyncSession, embedding_id: int) -> Optional[models.Embedding]:
+    return await db.get(models.Embedding, embedding_id)
+
+async def get_embedding_by_hash(db: AsyncSession, text_hash: str) -> Optional[models.Embedding]:
+    return await db.scalar(select(models.Embedding).where(models.Embedding.text_hash == text_hash))
+
+async def get_embeddings_by_hashes(db: AsyncSession, text_hashes: List[str]) -> List[models.Embedding]:
+    """Busca varios embeddings con una sola consulta ``IN (...)``."""
+    if not text_hashes:
+        return []
+    result = await db.scalars(select(models.Embedding).where(models.Embedding.text_hash.in_(text_hashes)))
+    return list(result)
+
+async def get_embedding_texts(db: AsyncSession, embedding_ids: List[int]) -> Dict[int, str]:
+    """Textos de varios embeddings (sin leer los vectores), por id."""
+    if not embedding_ids:
+        return {}
+    result = await db.execute(select(models.Embedding.id, models.Embedding.text)
+                              .where(models.Embedding.id.in_(embedding_ids)))
+    return {embedding_id: text for embedding_id, text in result}
+
+async def get_embeddings(db: AsyncSession, cursor: Optional[str] = None, limit: int = 100,
+                         with_vector: bool = True) -> Tuple[List[models.Embedding], Optional[str]]:
+    """Página de embeddings, de más reciente a más antiguo, y cursor de la siguiente.
+
+    Con ``with_vector=False`` no se lee la columna ``vector``.
+    """
+    query = select(models.Embedding)
+    if not with_vector:
+        query = query.options(defer(models.Embedding.vector))
+    query = keyset_page(query, models.Embedding.created_at, models.Embedding.id, cursor, limit,
+                        dialect=db.bind.dialect.name)
+    rows = list(await db.scalars(query))
+    return rows, next_cursor(rows, limit)
+
+async def iter_embeddings(db: AsyncSession, batch_size: int = 1000, model: Optional[str] = None,
+                          max_id: Optional[int] = None, after_id: int = 0) -> AsyncIterator[models.Embedding]:
+    """Recorre los embeddings por bloques (en orden de ``id``), sin cargar la tabla entera en memoria."""
+    query = select(models.Embedding)
+    if model is not None:
+        query = query.where(models.Embedding.model == model)
+    if after_id:
+        query = query.where(models.Embedding.id > after_id)
+    if max_id is not None:
+        query = query.where(models.Embedding.id <= max_id)
+    result = await db.stream_scalars(query.order_by(models.Embedding.id).execution_options(yield_per=batch_size))
+    async for row in result:
+        yield row
+
+async def get_embedding_export_shape(db: AsyncSession, model: str,
+                                     max_id: Optional[int] = None) -> Tuple[int, Optional[int], Optional[int], Optional[int]]:
+    """``(filas, dim mínima, dim máxima, id máximo)`` de los embeddings de ``model``."""
+    query = select(func.count(), func.min(models.Embedding.dim), func.max(models.Embedding.dim),
+                   func.max(models.Embedding.id)).where(models.Embedding.model == model)
+    if max_id is not None:
+        query = query.where(models.Embedding.id <= max_id)
+    return tuple((await db.execute(query)).one())
+
+async def insert_embedding_rows(db: AsyncSession, rows: List[dict]) -> None:
+    """Inserta en bloque filas ya codificadas (``Embedding.row_values``), ignorando duplicados."""
+    if not rows:
+        return
+    await db.execute(models.Embedding.insert_ignore_duplicates(db.bind.dialect.name), rows)
+    await db.commit()
+
+async def delete_embedding(db: AsyncSession, embedding_id: int) -> bool:
+    db_embedding = await db.get(models.Embedding, embedding_id)
+    if db_embedding:
+        await db.delete(db_embedding)
+        await db.commit()
+        return True
+    return False
+
+
+# --- Job CRUD Operations ---
+
+async def create_job(db: AsyncSession, kind: str, payload: dict, owner: str,
+                     priority: int = 0, max_attempts: int = 3) -> models.Job:
+    db_job = models.Job(kind=kind, payload=payload, owner=owner, priority=priority,
+                        max_attempts=max_attempts, status="queued")
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[models.Job]:
+    return await db.get(models.Job, job_id, populate_existing=True)
+
+async def claim_next_job(db: AsyncSession, per_owner_limit: int) -> Optional[models.Job]:
+    """Marca como ``running`` el siguiente trabajo disponible y lo devuelve.
+
+    Elige por prioridad y antigüedad, saltando a los usuarios que ya tienen
+    ``per_owner_limit`` trabajos en ejecución. El límite se vuelve a comprobar
+    dentro del ``UPDATE ... WHERE status = 'queued'``, así que si otro worker
+    reclama el mismo trabajo u otro del mismo usuario a la vez, solo pasa el
+    que cabe. En PostgreSQL los reclamos de un mismo usuario se serializan con
+    un cerrojo de transacción (sin él, dos ``UPDATE`` concurrentes contarían
+    los trabajos en ejecución antes de ver el del otro).
+    """
+    busy_owners = (
+        select(models.Job.owner)
+        .where(models.Job.status == "running")
+        .group_by(models.Job.owner)
+        .having(func.count() >= per_owner_limit)
+    )
+    candidates = await db.execute(
+        select(models.Job.id, models.Job.owner)
+        .where(
+            models.Job.status == "queued",
+            models.Job.available_at <= func.now(),
+            models.Job.owner.not_in(busy_owners),
+        )
+        .order_by(desc(models.Job.priority), models.Job.created_at)
+        .limit(5)
+    )
+    running = aliased(models.Job)
+    owner_running = (
+        select(func.count())
+        .select_from(running)
+        .where(running.owner == models.Job.owner, running.status == "running")
+        .scalar_subquery()
+    )
+    for job_id, owner in list(candidates):
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(owner))))
+        result = await db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == "queued", owner_running < per_owner_limit)
+            .values(status="running", attempts=models.Job.attempts + 1, started_at=func.now(),
+                    heartbeat_at=func.now())
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            return await get_job(db, job_id)
+    return None
+
+async def finish_job(db: AsyncSession, job: models.Job, status: str,
+                     result: Any = None, error: Optional[str] = None) -> None:
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = func.now()
+    await db.commit()
+
+async def retry_job(db: AsyncSession, job: models.Job, delay: float, error: str) -> None:
+    """Vuelve a encolar un trabajo fallido para que se ejecute dentro de ``delay`` segundos."""
+    job.status = "queued"
+    job.error = error
+    job.available_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    await db.commit()
+
+async def cancel_job(db: AsyncSession, job_id: int) -> bool:
+    """Cancela un trabajo si aún está en cola."""
+    result = await db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == "queued")
+        .values(status="cancelled", finished_at=func.now())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def touch_job(db: AsyncSession, job_id: int) -> None:
+    """Renueva el latido de un trabajo en ejecución."""
+    await db.execute(update(models.Job).where(models.Job.id == job_id, models.Job.status == "running")
+                     .values(heartbeat_at=func.now()))
+    await db.commit()
+
+async def requeue_stale_jobs(db: AsyncSession, older_than: float) -> Tuple[int, int]:
+    """Recupera los trabajos en ``running`` sin latido desde hace ``older_than`` segundos.
+
+    Los que ya han agotado ``max_attempts`` pasan a ``failed`` (un trabajo que
+    tumba a su worker no se reencola indefinidamente); el resto vuelve a la
+    cola. Devuelve ``(reencolados, fallidos)``.
+    """
+    limit = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    stale = (models.Job.status == "running",
+             func.coalesce(models.Job.heartbeat_at, models.Job.started_at) < limit)
+    failed = await db.execute(
+        update(models.Job)
+        .where(*stale, models.Job.attempts >= models.Job.max_attempts)
+        .values(status="failed", error="Job interrupted (worker stopped) after its last attempt",
+                finished_at=func.now())
+    )
+    requeued = await db.execute(
+        update(models.Job)
+        .where(*stale)
+        .values(status="queued", available_at=func.now())
+    )
+    await db.commit()
+    return requeued.rowcount, failed.rowcount
+
+
+# --- Document CRUD Operations ---
+
+async def create_document(db: AsyncSession, name: str, owner: str, content_type: str, model: str) -> models.Document:
+    db_document = models.Document(name=name, owner=owner, content_type=content_type, model=model,
+                                  status="processing")
+    db.add(db_document)
+    await db.commit()
+    await db.refresh(db_document)
+    return db_document
+
+async def get_document(db: AsyncSession, document_id: int, owner: Optional[str] = None) -> Optional[models.Document]:
+    """Documento por id; con ``owner``, solo si pertenece a ese usuario."""
+    document = await db.get(models.Document, document_id, populate_existing=True)
+    if document is not None and owner is not None and document.owner != owner:
+        return None
+    return document
+
+async def add_document_chunks(db: AsyncSession, document_id: int, chunks: List[dict],
+                              chunks_total: int) -> None:
+    """Guarda el linaje de un bloque de fragmentos y actualiza el progreso del documento."""
+    await db.execute(models.DocumentChunk.__table__.insert(), chunks)
+    await db.execute(
+        update(models.Document)
+        .where(models.Document.id == document_id)
+        .values(chunks_embedded=models.Document.chunks_embedded + len(chunks), chunks_total=chunks_total,
+                heartbeat_at=func.now())
+    )
+    await db.commit()
+
+async def touch_document(db: AsyncSession, document_id: int) -> None:
+    """Renueva el latido de un documento en ingesta."""
+    await db.execute(update(models.Document).where(models.Document.id == document_id)
+                     .values(heartbeat_at=func.now()))
+    await db.commit()
+
+async def fail_stale_documents(db: AsyncSession, older_than: float) -> int:
+    """Marca como ``failed`` los documentos en ``processing`` sin latido reciente."""
+    limit = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    result = await db.execute(
+        update(models.Document)
+        .where(models.Document.status == "processing", models.Document.heartbeat_at < limit)
+        .values(status="failed", error="Ingestion interrupted (worker stopped)", finished_at=func.now())
+    )
+    await db.commit()
+    return result.rowcount
+
+async def finish_document(db: AsyncSession, document_id: int, status: str, error: Optional[str] = None,
+                          **values: Any) -> None:
+    await db.execute(
+        update(models.Document)
+        .where(models.Document.id == document_id)
+        .values(status=status, error=error, finished_at=func.now(), **values)
+    )
+    await db.commit()
+
+async def get_document_chunks(db: AsyncSession, document_id: int, cursor: Optional[str] = None,
+                              limit: int = 100) -> Tuple[List[models.DocumentChunk], Optional[str]]:
+    """Página de fragmentos en orden de posición y cursor de la siguiente."""
+    query = select(models.DocumentChunk).where(models.DocumentChunk.document_id == document_id)
+    if cursor:
+        _, position = decode_cursor(cursor)
+        query = query.where(models.DocumentChunk.position > position)
+    rows = list(await db.scalars(query.order_by(models.DocumentChunk.position).limit(limit + 1)))
+    if len(rows) <= limit:
+        return rows, None
+    del rows[limit:]
+    return rows, encode_cursor(None, rows[-1].position)
@@ -1,5 +1,13 @@
-from .core.database import SessionLocal
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .core import security
+from .core.database import SessionLocal, AsyncSessionLocal
+from .schemas.user import User
+from .services import user_cache
 from .services.gemini_client import GeminiClient
+from .services.embedding_cache import EmbeddingCache, embedding_cache
 
 
 def get_db():
@@ -10,16 +18,48 @@ def get_db():
         db.close()
 
 
-async def get_gemini_client():
-    """Dependency that yields an async GeminiClient and closes it after use.
+async def get_async_db():
+    """Dependency que devuelve una ``AsyncSession`` para los endpoints ``async def``."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_gemini_client(request: Request) -> GeminiClient:
+    """Dependency que devuelve el GeminiClient compartido de la aplicación.
+
+    El cliente se crea una única vez en el lifespan de la app (ver ``app.main``)
+    y mantiene un pool de conexiones vivo entre peticiones, evitando un
+    handshake TCP+TLS por cada llamada al proveedor.
 
     Use like: client: GeminiClient = Depends(get_gemini_client)
     """
-    client = GeminiClient()
-    try:
-        yield client
-    finally:
-        try:
-            await client.aclose()
-        except Exception:
-            pass
+    return request.app.state.gemini_client
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Dependency que devuelve la caché LRU de embeddings del proceso."""
+    return embedding_cache
+
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Dependency que devuelve el usuario autenticado a partir del token de acceso.
+
+    El token verificado y los datos del usuario se cachean, así que en el caso
+    habitual no se verifica la firma ni se consulta la base de datos.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = security.verify_token(token, credentials_exception)
+    user = await user_cache.get_user_by_username(db, token_data.username)
+    if user is None or not user.is_active:
+        raise credentials_exception
+    return user
@@ -1,16 +1,65 @@
-from fastapi import FastAPI
-from .routers import auth, gemini
-from .core.database import engine
-from . import models
+from contextlib import asynccontextmanager
+import asyncio
 
-models.Base.metadata.create_all(bind=engine)
+from fastapi import Depends, FastAPI
+from .routers import auth, gemini, jobs, metrics
+from .core import config, metrics as app_metrics, security
+from .core.compression import CompressionMiddleware
+from .core.serialization import FastJSONResponse
+from .core.database import AsyncSessionLocal
+from .services.gemini_client import GeminiClient
+from .services import ingestion, system_message_service
+from .services.job_queue import JobWorkerPool
+from .dependencies import get_current_user
 
-app = FastAPI()
 
-app.include_router(auth.router, prefix="/auth", tags=["auth"])
-app.include_router(gemini.router, prefix="/gemini", tags=["gemini"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El esquema se crea con `python -m app.migrations.create_schema`; importar
+    # la app no abre ninguna conexión a la base de datos.
+    if config.DB_CREATE_SCHEMA_ON_STARTUP:
+        from .migrations import create_schema
+        await asyncio.to_thread(create_schema.migrate)
+    # Un único cliente Gemini (y su pool de conexiones) para toda la vida de la app.
+    app.state.gemini_client = GeminiClient()
+    # Precarga de los mensajes del sistema usados en /gemini/generate.
+    if config.SYSTEM_MESSAGE_CACHE_WARM:
+        async with AsyncSessionLocal() as db:
+            await system_message_service.warm(db)
+    # Pool de workers de trabajos en segundo plano.
+    app.state.job_pool = None
+    if config.JOB_WORKERS_ENABLED:
+        app.state.job_pool = JobWorkerPool(app.state.gemini_client)
+        await app.state.job_pool.start()
+    # Documentos que se quedaron en `processing` porque su worker murió.
+    reaper = asyncio.create_task(ingestion.reap_stale_documents())
+    try:
+        yield
+    finally:
+        reaper.cancel()
+        await ingestion.shutdown()
+        if app.state.job_pool is not None:
+            await app.state.job_pool.stop()
+        await app.state.gemini_client.aclose()
+        security.shutdown_hash_pool()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+if config.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=config.RESPONSE_COMPRESSION_MIN_BYTES)
+
+
+# Métricas por petición (middleware ASGI puro: no envuelve las respuestas en streaming).
+app.add_middleware(app_metrics.RequestMetricsMiddleware)
+
+# Cada router declara su prefijo: así la plantilla de ruta de cada endpoint
+# (etiqueta ``route`` de las métricas) ya lo incluye.
+app.include_router(auth.router, tags=["auth"])
+app.include_router(gemini.router, tags=["gemini"], dependencies=[Depends(get_current_user)])
+app.include_router(jobs.router, tags=["jobs"], dependencies=[Depends(get_current_user)])
+app.include_router(metrics.router, tags=["metrics"])
 
 
 @app.get("/")
 async def root():
-    return {"message": "Hello World"}
\ No newline at end of file
+    return {"message": "Hello World"}
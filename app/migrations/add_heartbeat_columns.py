@@ -0,0 +1,45 @@
+"""Añade las columnas de latido (``heartbeat_at``) a tablas ya existentes.
+
+Uso::
+
+    python -m app.migrations.add_heartbeat_columns
+
+Solo es necesario en bases de datos creadas antes de estas columnas; las
+nuevas las obtienen con ``create_schema``. Se puede relanzar sin problema.
+"""
+from sqlalchemy import DateTime, inspect, text
+
+from ..core.database import engine
+
+# Tabla -> columnas que deben existir.
+COLUMNS = {
+    "documents": {"heartbeat_at": DateTime(timezone=True)},
+    "jobs": {"heartbeat_at": DateTime(timezone=True)},
+}
+
+
+def migrate() -> int:
+    """Añade las columnas que falten y devuelve cuántas se han añadido."""
+    inspector = inspect(engine)
+    added = 0
+    with engine.begin() as conn:
+        for table, columns in COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, type_ in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} "
+                                      f"{type_.compile(dialect=conn.dialect)}"))
+                    conn.execute(text(f"UPDATE {table} SET {name} = CURRENT_TIMESTAMP"))
+                    added += 1
+    return added
+
+
+def main() -> None:
+    count = migrate()
+    print(f"Added {count} heartbeat columns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Crea los índices ``(created_at, id)`` de la paginación por cursor.
+
+Uso::
+
+    python -m app.migrations.add_keyset_indexes
+
+Solo es necesario en bases de datos creadas antes de estos índices; las
+nuevas los obtienen con ``create_schema``. Se puede relanzar sin problema.
+"""
+from ..core.database import engine
+from ..models import Embedding, SystemMessage
+
+
+def migrate() -> int:
+    """Crea los índices que falten y devuelve cuántos se han comprobado."""
+    indexes = [index for model in (Embedding, SystemMessage) for index in model.__table__.indexes
+               if index.name.endswith("_created_at_id")]
+    for index in indexes:
+        index.create(bind=engine, checkfirst=True)
+    return len(indexes)
+
+
+def main() -> None:
+    count = migrate()
+    print(f"Checked {count} keyset indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Crea las tablas e índices que falten en la base de datos.
+
+Uso (antes de arrancar la API por primera vez o tras añadir modelos)::
+
+    python -m app.migrations.create_schema
+
+La aplicación ya no crea el esquema al importarse: cada worker arrancaba
+abriendo una conexión y revisando todas las tablas. Para desarrollo se puede
+hacer en el arranque con ``DB_CREATE_SCHEMA_ON_STARTUP=true``. Se puede
+relanzar sin problema: solo crea lo que no existe.
+"""
+from ..core.database import engine
+from ..models import Base
+
+
+def migrate() -> int:
+    """Crea las tablas que falten y devuelve cuántas tablas tiene el esquema."""
+    Base.metadata.create_all(bind=engine)
+    return len(Base.metadata.tables)
+
+
+def main() -> None:
+    count = migrate()
+    print(f"Checked {count} tables")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Migra la tabla ``embeddings`` del vector en JSON al formato binario.
+
+Uso (hacer copia de seguridad antes)::
+
+    python -m app.migrations.embeddings_to_binary [--dtype float32] [--batch-size 1000]
+
+Pasos:
+1. Añade las columnas ``vector``, ``dim``, ``dtype`` y ``scale`` si no existen.
+2. Convierte por bloques cada fila que aún tenga el vector solo en JSON.
+3. Elimina la columna JSON ``embedding``.
+
+Se puede relanzar sin problema: solo procesa las filas pendientes.
+"""
+import argparse
+import json
+
+from sqlalchemy import Float, Integer, LargeBinary, String, inspect, text
+
+from ..core import config
+from ..core.database import engine
+from ..core.vectors import encode_vector
+
+
+def _add_missing_columns(conn, columns) -> None:
+    dialect = conn.dialect
+    new_columns = {
+        "vector": LargeBinary(),
+        "dim": Integer(),
+        "dtype": String(16),
+        "scale": Float(),
+    }
+    for name, type_ in new_columns.items():
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE embeddings ADD COLUMN {name} {type_.compile(dialect=dialect)}"))
+
+
+def migrate(dtype: str = "float32", batch_size: int = 1000) -> int:
+    """Convierte las filas JSON a binario y devuelve cuántas se han migrado."""
+    columns = {column["name"] for column in inspect(engine).get_columns("embeddings")}
+    if "embedding" not in columns:
+        return 0
+
+    with engine.begin() as conn:
+        _add_missing_columns(conn, columns)
+
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, embedding FROM embeddings "
+                     "WHERE vector IS NULL AND id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size},
+            ).all()
+            if not rows:
+                break
+            params = []
+            for row_id, values in rows:
+                if isinstance(values, str):
+                    values = json.loads(values)
+                blob, dim, row_dtype, scale = encode_vector(values, dtype)
+                params.append({"id": row_id, "vector": blob, "dim": dim, "dtype": row_dtype, "scale": scale})
+            conn.execute(
+                text("UPDATE embeddings SET vector = :vector, dim = :dim, dtype = :dtype, scale = :scale "
+                     "WHERE id = :id"),
+                params,
+            )
+        migrated += len(rows)
+        last_id = rows[-1][0]
+
+    with engine.begin() as conn:
+        remaining = conn.execute(text("SELECT COUNT(*) FROM embeddings WHERE vector IS NULL")).scalar()
+        if remaining:
+            raise RuntimeError(f"{remaining} rows could not be migrated; JSON column kept")
+        conn.execute(text("ALTER TABLE embeddings DROP COLUMN embedding"))
+    return migrated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dtype", default=config.EMBEDDING_STORAGE_DTYPE,
+                        choices=["float32", "float16", "int8"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    count = migrate(dtype=args.dtype, batch_size=args.batch_size)
+    print(f"Migrated {count} embeddings to {args.dtype}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+from ..core.database import Base
+from .user import User
+from .gemini import SystemMessage, Embedding, GenerationCacheEntry
+from .job import Job
+from .document import Document, DocumentChunk
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class Document(Base):
+    """Documento ingerido por ``POST /gemini/documents``.
+
+    Estados: ``processing`` -> ``done`` / ``failed``. Los contadores se
+    actualizan por bloques durante la ingesta para poder seguir el progreso.
+    El proceso que ingiere renueva ``heartbeat_at``; si deja de hacerlo (el
+    worker murió) el documento pasa a ``failed``.
+    """
+    __tablename__ = "documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    owner = Column(String, nullable=False, index=True)
+    content_type = Column(String(32), nullable=False)  # "text" o "ndjson"
+    model = Column(String, nullable=False)  # Modelo de embeddings
+    status = Column(String(16), nullable=False, default="processing")
+    bytes_received = Column(Integer, nullable=False, default=0)
+    chunks_total = Column(Integer, nullable=False, default=0)  # Fragmentos producidos
+    chunks_embedded = Column(Integer, nullable=False, default=0)  # Fragmentos ya guardados
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    heartbeat_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class DocumentChunk(Base):
+    """Fragmento de un documento y el embedding con el que se guardó (linaje).
+
+    Varios fragmentos (de este u otros documentos) pueden compartir embedding
+    si su texto es idéntico.
+    """
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Orden del fragmento en el documento
+    segment = Column(Integer, nullable=False, default=0)  # Registro NDJSON de origen (0 en texto)
+    start_char = Column(Integer, nullable=False)  # Posición del fragmento dentro del segmento
+    text_hash = Column(String, nullable=False)
+    embedding_id = Column(Integer, ForeignKey("embeddings.id", ondelete="SET NULL"), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_document_chunks_document_position", "document_id", "position"),
+    )
@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, LargeBinary, ForeignKey, Index, insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.sql import func
 from ..core.database import Base
+from ..core import config
+from ..core.vectors import encode_vector, decode_vector
 
 
 class SystemMessage(Base):
     """Modelo para almacenar mensajes del sistema que definen el comportamiento base."""
     __tablename__ = "system_messages"
+    # Índice para la paginación por cursor sobre (created_at, id)
+    __table_args__ = (Index("ix_system_messages_created_at_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
@@ -16,13 +21,81 @@ class SystemMessage(Base):
 
 
 class Embedding(Base):
-    """Modelo para almacenar embeddings generados."""
+    """Modelo para almacenar embeddings generados.
+
+    El vector se guarda en binario (``vector``) junto con su dimensión, tipo
+    (float32, float16 o int8) y, para int8, la escala de cuantización.
+    """
     __tablename__ = "embeddings"
+    # Índice para la paginación por cursor sobre (created_at, id)
+    __table_args__ = (Index("ix_embeddings_created_at_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
     text_hash = Column(String, unique=True, index=True)
-    embedding = Column(JSON, nullable=False)  # Vector almacenado como JSON
+    vector = Column(LargeBinary, nullable=False)  # Vector almacenado en binario
+    dim = Column(Integer, nullable=False)
+    dtype = Column(String(16), nullable=False, default="float32")
+    scale = Column(Float, nullable=True)
     model = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    @property
+    def array(self):
+        """Vector como array NumPy float32 (sin copia si se guardó en float32)."""
+        return decode_vector(self.vector, self.dtype, self.scale)
+
+    @property
+    def embedding(self):
+        """Vector como lista de floats (formato de la API)."""
+        return self.array.tolist()
+
+    @embedding.setter
+    def embedding(self, values):
+        self.vector, self.dim, self.dtype, self.scale = encode_vector(
+            values, config.EMBEDDING_STORAGE_DTYPE
+        )
+
+    @staticmethod
+    def row_values(row: dict) -> dict:
+        """Valores de columna para insertar un embedding dado como diccionario.
+
+        ``row`` tiene ``text``, ``text_hash``, ``model`` y ``embedding`` (lista de floats).
+        """
+        vector, dim, dtype, scale = encode_vector(row["embedding"], config.EMBEDDING_STORAGE_DTYPE)
+        return {
+            "text": row["text"],
+            "text_hash": row["text_hash"],
+            "model": row["model"],
+            "vector": vector,
+            "dim": dim,
+            "dtype": dtype,
+            "scale": scale,
+        }
+
+    @classmethod
+    def insert_ignore_duplicates(cls, dialect_name: str):
+        """Sentencia INSERT que ignora los ``text_hash`` ya existentes.
+
+        En PostgreSQL y SQLite genera ``ON CONFLICT (text_hash) DO NOTHING``, de
+        modo que dos inserciones concurrentes del mismo embedding no fallan con
+        ``IntegrityError``. Se ejecuta con una lista de ``row_values``.
+        """
+        if dialect_name == "postgresql":
+            return postgresql.insert(cls).on_conflict_do_nothing(index_elements=["text_hash"])
+        if dialect_name == "sqlite":
+            return sqlite.insert(cls).on_conflict_do_nothing(index_elements=["text_hash"])
+        return insert(cls)
+
+
+class GenerationCacheEntry(Base):
+    """Respuesta de generación cacheada (backend "db" de la caché de generación)."""
+    __tablename__ = "generation_cache"
+
+    key = Column(String(64), primary_key=True)  # SHA-256 del prompt completo y parámetros
+    response = Column(Text, nullable=False)  # Respuesta del proveedor en JSON
+    size_bytes = Column(Integer, nullable=False)
+    latency_ms = Column(Float, nullable=False)  # Latencia original del proveedor
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
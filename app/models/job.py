@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class Job(Base):
+    """Trabajo en segundo plano (generación o embeddings en lote).
+
+    Estados: ``queued`` -> ``running`` -> ``succeeded`` / ``failed``; un trabajo
+    en cola también puede pasar a ``cancelled``. Los fallos se reintentan
+    volviendo a ``queued`` con ``available_at`` en el futuro. El worker que lo
+    ejecuta renueva ``heartbeat_at``; si deja de hacerlo (el proceso murió) el
+    trabajo vuelve a la cola.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(32), nullable=False)  # "generate" o "embeddings"
+    status = Column(String(16), nullable=False, default="queued")
+    priority = Column(Integer, nullable=False, default=0)  # Mayor valor = antes
+    owner = Column(String, nullable=False, index=True)
+    payload = Column(JSON, nullable=False)  # Cuerpo de la petición
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Índice para elegir el siguiente trabajo: en cola, por prioridad y antigüedad.
+        Index("ix_jobs_status_priority_created", "status", "priority", "created_at"),
+    )
@@ -1,58 +1,93 @@
 # Importa las clases y funciones necesarias de FastAPI y otros módulos.
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Importa los módulos de la aplicación.
-from .. import crud, schemas
+from .. import crud_async, schemas
 from ..core import security
-from ..dependencies import get_db
+from ..dependencies import get_async_db
+from ..services import user_cache
 
 # Crea un nuevo router de FastAPI.
 # Los routers se utilizan para agrupar rutas relacionadas.
-router = APIRouter()
+router = APIRouter(prefix="/auth")
 
 # Define la ruta para crear un nuevo usuario.
 @router.post("/signup", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Crea un nuevo usuario en la base de datos.
     """
     # Busca si ya existe un usuario con el mismo email.
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await crud_async.get_user_by_email(db, email=user.email)
     if db_user:
         # Si el email ya está registrado, lanza una excepción HTTP.
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Busca si ya existe un usuario con el mismo nombre de usuario.
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await crud_async.get_user_by_username(db, username=user.username)
     if db_user:
         # Si el nombre de usuario ya está registrado, lanza una excepción HTTP.
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    # Si no hay conflictos, crea el nuevo usuario.
-    return crud.create_user(db=db, user=user)
+    # Si no hay conflictos, calcula el hash (en el pool de procesos) y crea el nuevo usuario.
+    hashed_password = await security.aget_password_hash(user.password)
+    return await crud_async.create_user(db=db, user=user, hashed_password=hashed_password)
 
 # Define la ruta para el login de usuarios.
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Autentica a un usuario y devuelve un token de acceso y un token de refresco.
     """
     # Busca al usuario por su nombre de usuario.
-    user = crud.get_user_by_username(db, username=form_data.username)
+    user = await crud_async.get_user_by_username(db, username=form_data.username)
     
+    # Verifica la contraseña en el pool de procesos. Si el hash usa un coste
+    # antiguo, se recibe además un hash nuevo para guardarlo.
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await security.averify_and_update_password(form_data.password, user.hashed_password)
+
     # Si el usuario no existe o la contraseña es incorrecta, lanza una excepción HTTP.
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Actualiza el hash de forma transparente si hace falta.
+    if new_hash:
+        await crud_async.update_user_password_hash(db, user, new_hash)
     
     # Si las credenciales son correctas, crea un token de acceso y un token de refresco.
     access_token = security.create_access_token(data={"sub": user.username})
     refresh_token = security.create_refresh_token(data={"sub": user.username})
     
     # Devuelve los tokens.
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+# Define la ruta para renovar los tokens con el token de refresco.
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_access_token(request: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Devuelve un nuevo token de acceso y de refresco a partir de un token de refresco válido,
+    sin volver a pedir la contraseña.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = security.verify_token(request.refresh_token, credentials_exception, token_type="refresh")
+
+    # El usuario debe seguir existiendo y estar activo.
+    user = await user_cache.get_user_by_username(db, token_data.username)
+    if user is None or not user.is_active:
+        raise credentials_exception
+
+    access_token = security.create_access_token(data={"sub": user.username})
+    refresh_token = security.create_refresh_token(data={"sub": user.username})
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
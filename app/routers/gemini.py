@@ -1,111 +1,170 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Union
+import json
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..schemas.gemini import (
     GeminiRequest, GeminiResponse, SystemMessage,
-    EmbeddingRequest, EmbeddingResponse, StoredEmbedding
+    EmbeddingRequest, BatchEmbeddingRequest, StoredEmbedding, EncodedStoredEmbedding, EmbeddingSummary,
+    EmbeddingSearchRequest, EmbeddingSearchResult
 )
 from ..services.gemini_client import GeminiClient, GeminiError
-from ..dependencies import get_gemini_client, get_db
-from .. import crud
+from ..services.embedding_cache import EmbeddingCache
+from ..services import embedding_service, embedding_transfer, generation_service, ingestion, system_message_service
+from ..services.system_message_service import system_message_cache
+from ..services.generation_cache import generation_cache
+from ..services.vector_index import vector_index
+from ..core import config
+from ..core.serialization import FastJSONResponse, VectorEncoding, embedding_payload
+from ..dependencies import get_gemini_client, get_async_db, get_embedding_cache, get_current_user
+from ..schemas.document import Document, DocumentChunk
+from ..schemas.user import User
+from .. import crud_async
 
-router = APIRouter()
+router = APIRouter(prefix="/gemini")
+
+# Respuesta de los endpoints que devuelven embeddings (vector en floats o en base64).
+EmbeddingOut = Union[StoredEmbedding, EncodedStoredEmbedding]
+
+
+def _check_page_limit(limit: int) -> None:
+    if not 1 <= limit <= config.LIST_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {config.LIST_MAX_LIMIT}")
+
+
+def _set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    """Devuelve el cursor de la página siguiente en la cabecera ``X-Next-Cursor``."""
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
 
 
 # --- Text Generation Endpoints ---
 
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Formatea un evento Server-Sent Events."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/generate", response_model=GeminiResponse)
 async def generate(
     request: GeminiRequest,
+    http_request: Request,
     client: GeminiClient = Depends(get_gemini_client),
-    db: Session = Depends(get_db)
+    cache: EmbeddingCache = Depends(get_embedding_cache),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Genera texto usando el modelo Gemini configurado."""
+    """Genera texto usando el modelo Gemini configurado.
+
+    Con ``retrieve`` el contexto se recupera en el servidor de los embeddings
+    almacenados y se añade al de ``context_texts``. Con ``stream=true`` la
+    respuesta se envía como Server-Sent Events (ver ``/generate/stream``).
+    """
+    if request.stream:
+        return await generate_stream(request, http_request, client, cache, db)
     try:
-        # Obtener mensaje del sistema si se especifica
-        system_message = None
-        if request.system_message_id:
-            db_message = crud.get_system_message(db, request.system_message_id)
-            if not db_message:
-                raise HTTPException(status_code=404, detail="System message not found")
-            system_message = db_message.content
-
-        # Genera el texto con el contexto completo
-        resp = await client.generate_text(
+        return await generation_service.generate_response(request, client, cache, db)
+    except generation_service.GenerationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except GeminiError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def generate_stream(
+    request: GeminiRequest,
+    http_request: Request,
+    client: GeminiClient = Depends(get_gemini_client),
+    cache: EmbeddingCache = Depends(get_embedding_cache),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Genera texto en streaming como Server-Sent Events.
+
+    Cada fragmento se envía como ``data: {"text": ...}``; al terminar se envía
+    ``event: done`` y, si el proveedor falla a mitad, ``event: error``. Si el
+    cliente se desconecta se cancela la llamada al proveedor.
+    """
+    try:
+        db_message, context_texts = await generation_service.prepare_generation(request, client, cache, db)
+    except generation_service.GenerationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except GeminiError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+    async def events():
+        chunks = client.stream_text(
             prompt=request.prompt,
             model=request.model,
             temperature=request.temperature,
             max_tokens=request.max_tokens,
-            system_message=system_message,
-            context_texts=request.context_texts
+            system_message=db_message.content if db_message else None,
+            context_texts=context_texts or None
         )
-    except GeminiError as e:
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+        try:
+            async for chunk in chunks:
+                if await http_request.is_disconnected():
+                    break
+                yield _sse_event({"text": chunk})
+            else:
+                yield _sse_event({"used_context": context_texts or None}, event="done")
+        except GeminiError as e:
+            yield _sse_event({"detail": str(e)}, event="error")
+        finally:
+            # Cierra el stream del proveedor aunque no se haya consumido entero.
+            await chunks.aclose()
 
-    # Extraer texto de la respuesta
-    text = None
-    if isinstance(resp, dict):
-        if "text" in resp and isinstance(resp["text"], str):
-            text = resp["text"]
-        elif "choices" in resp and isinstance(resp["choices"], list) and len(resp["choices"]) > 0:
-            first = resp["choices"][0]
-            if isinstance(first, dict) and "text" in first:
-                text = first["text"]
-
-    if text is None:
-        text = str(resp)
-
-    # Construir respuesta con contexto usado
-    response = GeminiResponse(
-        text=text,
-        raw=resp,
-        used_context=request.context_texts
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    
-    if request.system_message_id:
-        response.used_system_message = SystemMessage.from_orm(db_message)
-    
-    return response
 
 
 # --- System Message Endpoints ---
 
 @router.post("/system-messages", response_model=SystemMessage)
-def create_system_message(
+async def create_system_message(
     message: SystemMessage,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crea un nuevo mensaje del sistema."""
-    return crud.create_system_message(db, message)
+    return await system_message_service.create_system_message(db, message)
 
 @router.get("/system-messages", response_model=List[SystemMessage])
-def list_system_messages(
-    skip: int = 0,
+async def list_system_messages(
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Lista todos los mensajes del sistema."""
-    return crud.get_system_messages(db, skip=skip, limit=limit)
+    """Lista los mensajes del sistema por páginas (cursor en ``X-Next-Cursor``)."""
+    _check_page_limit(limit)
+    try:
+        messages, next_cursor = await crud_async.get_system_messages(db, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _set_next_cursor(response, next_cursor)
+    return messages
 
 @router.get("/system-messages/{message_id}", response_model=SystemMessage)
-def get_system_message(
+async def get_system_message(
     message_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene un mensaje del sistema específico."""
-    message = crud.get_system_message(db, message_id)
+    message = await system_message_service.get_system_message(db, message_id)
     if message is None:
         raise HTTPException(status_code=404, detail="System message not found")
     return message
 
 @router.put("/system-messages/{message_id}", response_model=SystemMessage)
-def update_system_message(
+async def update_system_message(
     message_id: int,
     message: SystemMessage,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualiza un mensaje del sistema existente."""
-    updated = crud.update_system_message(db, message_id, message)
+    updated = await system_message_service.update_system_message(db, message_id, message)
     if updated is None:
         raise HTTPException(status_code=404, detail="System message not found")
     return updated
@@ -113,56 +172,304 @@ def update_system_message(
 
 # --- Embedding Endpoints ---
 
-@router.post("/embeddings", response_model=StoredEmbedding)
+@router.post("/embeddings", response_model=EmbeddingOut)
 async def create_embedding(
     request: EmbeddingRequest,
+    vector_encoding: VectorEncoding = "float",
+    client: GeminiClient = Depends(get_gemini_client),
+    cache: EmbeddingCache = Depends(get_embedding_cache),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Genera y almacena un embedding para el texto dado (consultando antes la caché).
+
+    Con ``vector_encoding=base64`` el vector se devuelve como bytes float32 en base64.
+    """
+    try:
+        stored = await embedding_service.get_or_create_embedding(
+            db, client, cache, text=request.text, model=request.model
+        )
+        return FastJSONResponse(embedding_payload(stored, vector_encoding))
+    except GeminiError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+@router.post("/embeddings/batch", response_model=List[EmbeddingOut])
+async def create_embeddings_batch(
+    request: BatchEmbeddingRequest,
+    vector_encoding: VectorEncoding = "float",
     client: GeminiClient = Depends(get_gemini_client),
-    db: Session = Depends(get_db)
+    cache: EmbeddingCache = Depends(get_embedding_cache),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Genera y almacena un embedding para el texto dado."""
+    """Genera y almacena embeddings para una lista de textos.
+
+    Devuelve un embedding por texto, en el mismo orden de la petición.
+    """
+    if len(request.texts) > config.EMBEDDING_BATCH_MAX_TEXTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many texts (max {config.EMBEDDING_BATCH_MAX_TEXTS})"
+        )
+    try:
+        stored = await embedding_service.get_or_create_embeddings(
+            db, client, cache, texts=request.texts, model=request.model
+        )
+        return FastJSONResponse([embedding_payload(embedding, vector_encoding) for embedding in stored])
+    except GeminiError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+@router.post("/embeddings/search", response_model=List[EmbeddingSearchResult])
+async def search_embeddings(
+    request: EmbeddingSearchRequest,
+    client: GeminiClient = Depends(get_gemini_client),
+    cache: EmbeddingCache = Depends(get_embedding_cache),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Devuelve los `k` textos almacenados más parecidos (similitud coseno)."""
+    if (request.query is None) == (request.vector is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'query' or 'vector'")
+    if not 1 <= request.k <= config.VECTOR_SEARCH_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {config.VECTOR_SEARCH_MAX_K}")
     try:
-        # Primero intentamos encontrar un embedding existente
-        embedding_response = await client.generate_embedding(
-            text=request.text,
-            model=request.model
+        results = await embedding_service.search_embeddings(
+            db, client, cache,
+            query=request.query, vector=request.vector, model=request.model, k=request.k
         )
-        
-        # Buscar si ya existe un embedding con el mismo hash
-        existing = crud.get_embedding_by_hash(db, embedding_response["text_hash"])
-        if existing:
-            return StoredEmbedding.from_orm(existing)
-        
-        # Si no existe, crear nuevo
-        return crud.create_embedding(db, EmbeddingResponse(**embedding_response))
-        
     except GeminiError as e:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+    return [
+        EmbeddingSearchResult(id=embedding_id, text=text, model=model, score=score)
+        for embedding_id, text, model, score in results
+    ]
+
+@router.get("/embeddings/export")
+async def export_embeddings(
+    format: Literal["ndjson", "npy"] = "ndjson",
+    model: Optional[str] = None,
+    max_id: Optional[int] = None,
+    include_vectors: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Exporta los embeddings en streaming (NDJSON o matriz ``.npy`` de un modelo).
+
+    ``npy`` requiere ``model`` y devuelve el ``max_id`` exportado en la cabecera
+    ``X-Export-Max-Id``; con ``format=ndjson&include_vectors=false`` y los mismos
+    ``model`` y ``max_id`` se obtienen los metadatos de cada fila, en el mismo orden.
+    """
+    if format == "ndjson":
+        return StreamingResponse(
+            embedding_transfer.export_ndjson(model=model, max_id=max_id, include_vectors=include_vectors),
+            media_type="application/x-ndjson"
+        )
+    if model is None:
+        raise HTTPException(status_code=400, detail="'model' is required for npy export")
+    rows, min_dim, max_dim, last_id = await crud_async.get_embedding_export_shape(db, model, max_id)
+    if rows and min_dim != max_dim:
+        raise HTTPException(status_code=409, detail="Embeddings of this model have different dimensions")
+    async def body():
+        yield embedding_transfer.npy_header(rows, min_dim or 0)
+        if rows:
+            async for chunk in embedding_transfer.export_npy(model, rows, last_id):
+                yield chunk
+    return StreamingResponse(
+        body(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Export-Max-Id": str(last_id or 0),
+            "Content-Disposition": 'attachment; filename="embeddings.npy"',
+        }
+    )
+
+@router.post("/embeddings/import")
+async def import_embeddings(request: Request, model: Optional[str] = None):
+    """Importa embeddings desde un cuerpo NDJSON (el formato de la exportación).
 
-@router.get("/embeddings", response_model=List[StoredEmbedding])
-def list_embeddings(
-    skip: int = 0,
+    Se lee en streaming y se inserta por bloques; los ``text_hash`` ya
+    existentes se ignoran. ``model`` se usa para las líneas que no lo indiquen.
+    """
+    try:
+        return await embedding_transfer.import_ndjson(request.stream(), default_model=model)
+    except embedding_transfer.EmbeddingImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except embedding_transfer.EmbeddingImportTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+@router.get("/embeddings", response_model=Union[List[EmbeddingOut], List[EmbeddingSummary]])
+async def list_embeddings(
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    fields: Literal["full", "summary"] = "full",
+    vector_encoding: VectorEncoding = "float",
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Lista todos los embeddings almacenados."""
-    return crud.get_embeddings(db, skip=skip, limit=limit)
+    """Lista los embeddings almacenados, del más reciente al más antiguo.
 
-@router.get("/embeddings/{embedding_id}", response_model=StoredEmbedding)
-def get_embedding(
+    Paginación por cursor: el de la página siguiente se devuelve en la cabecera
+    ``X-Next-Cursor``. Con ``fields=summary`` no se lee ni se devuelve el vector.
+    """
+    _check_page_limit(limit)
+    summary = fields == "summary"
+    try:
+        embeddings, next_cursor = await crud_async.get_embeddings(
+            db, cursor=cursor, limit=limit, with_vector=not summary
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary:
+        _set_next_cursor(response, next_cursor)
+        return [EmbeddingSummary.model_validate(embedding) for embedding in embeddings]
+    # Los vectores se serializan directamente desde las filas, sin validarlos con Pydantic.
+    full = FastJSONResponse([embedding_payload(embedding, vector_encoding) for embedding in embeddings])
+    _set_next_cursor(full, next_cursor)
+    return full
+
+@router.get("/embeddings/{embedding_id}", response_model=EmbeddingOut)
+async def get_embedding(
     embedding_id: int,
-    db: Session = Depends(get_db)
+    vector_encoding: VectorEncoding = "float",
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene un embedding específico."""
-    embedding = crud.get_embedding(db, embedding_id)
+    embedding = await crud_async.get_embedding(db, embedding_id)
     if embedding is None:
         raise HTTPException(status_code=404, detail="Embedding not found")
-    return embedding
+    return FastJSONResponse(embedding_payload(embedding, vector_encoding))
 
 @router.delete("/embeddings/{embedding_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_embedding(
+async def delete_embedding(
     embedding_id: int,
-    db: Session = Depends(get_db)
+    cache: EmbeddingCache = Depends(get_embedding_cache),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Elimina un embedding almacenado."""
-    if not crud.delete_embedding(db, embedding_id):
+    if not await crud_async.delete_embedding(db, embedding_id):
         raise HTTPException(status_code=404, detail="Embedding not found")
+    cache.discard_id(embedding_id)
+    vector_index.remove(embedding_id)
+
+
+# --- Document Ingestion Endpoints ---
+
+def _document_response(db_document) -> Document:
+    """Estado del documento con el rendimiento (fragmentos/s) de la ingesta."""
+    document = Document.model_validate(db_document)
+    progress = ingestion.active_ingestions.get(document.id)
+    if progress is not None:
+        # En curso en este proceso: progreso en memoria, más reciente que el de la tabla.
+        data = progress.as_dict()
+        document.chunks_total = data["chunks_total"]
+        document.chunks_embedded = data["chunks_embedded"]
+        document.chunks_per_second = data["chunks_per_second"]
+    elif document.finished_at and document.created_at:
+        elapsed = (document.finished_at - document.created_at).total_seconds()
+        if elapsed > 0:
+            document.chunks_per_second = round(document.chunks_embedded / elapsed, 2)
+    return document
+
+@router.post("/documents", response_model=Document, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_document(
+    request: Request,
+    name: str,
+    format: Optional[Literal["text", "ndjson"]] = None,
+    model: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    client: GeminiClient = Depends(get_gemini_client),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ingiere un documento subido en el cuerpo (texto plano o NDJSON ``{"text": ...}``).
+
+    El cuerpo se lee en streaming, se divide en fragmentos solapados y sus
+    embeddings se calculan por bloques mientras llega. Responde 202 en cuanto
+    se ha recibido el cuerpo entero; los fragmentos pendientes se terminan en
+    segundo plano y el progreso se consulta en ``GET /gemini/documents/{id}``.
+    """
+    if format is None:
+        format = "ndjson" if "ndjson" in request.headers.get("content-type", "") else "text"
+    model = model or client.embed_model
+    db_document = await crud_async.create_document(db, name=name, owner=current_user.username,
+                                                   content_type=format, model=model)
+    try:
+        await ingestion.start_ingestion(client, db_document.id, request.stream(), format, model)
+    except ingestion.IngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except GeminiError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+    return _document_response(await crud_async.get_document(db, db_document.id))
+
+@router.get("/documents/{document_id}", response_model=Document)
+async def get_document(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Estado y progreso de la ingesta de un documento."""
+    db_document = await crud_async.get_document(db, document_id, owner=current_user.username)
+    if db_document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return _document_response(db_document)
+
+@router.get("/documents/{document_id}/chunks", response_model=List[DocumentChunk])
+async def list_document_chunks(
+    document_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Fragmentos del documento en orden, con el embedding de cada uno (cursor en ``X-Next-Cursor``)."""
+    _check_page_limit(limit)
+    if await crud_async.get_document(db, document_id, owner=current_user.username) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    try:
+        chunks, next_cursor = await crud_async.get_document_chunks(db, document_id, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _set_next_cursor(response, next_cursor)
+    return chunks
+
+
+# --- Client Stats Endpoints ---
+
+@router.get("/pool-stats")
+async def get_pool_stats(client: GeminiClient = Depends(get_gemini_client)):
+    """Estado del pool de conexiones HTTP compartido con el proveedor."""
+    return client.pool_stats()
+
+
+@router.get("/limiter-stats")
+async def get_limiter_stats(client: GeminiClient = Depends(get_gemini_client)):
+    """Cola, concurrencia adaptativa, 429 recibidos y reintentos por tipo de llamada."""
+    return client.limiter_stats()
+
+
+@router.get("/endpoint-stats")
+async def get_endpoint_stats(client: GeminiClient = Depends(get_gemini_client)):
+    """Estado de los endpoints del proveedor: peso, latencia, cortocircuito y copias (hedging)."""
+    return client.endpoint_stats()
+
+
+@router.get("/stream-stats")
+async def get_stream_stats(client: GeminiClient = Depends(get_gemini_client)):
+    """Tiempo hasta el primer fragmento (TTFB) de las generaciones en streaming."""
+    return {"ttfb": client.ttfb.as_dict()}
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    client: GeminiClient = Depends(get_gemini_client),
+    cache: EmbeddingCache = Depends(get_embedding_cache)
+):
+    """Contadores de aciertos/fallos de las cachés del servicio."""
+    return {
+        "embeddings": cache.stats(),
+        "system_messages": system_message_cache.stats(),
+        "generation": generation_cache.stats(),
+        "single_flight": client.flight_stats(),
+    }
+
+
+@router.get("/index-stats")
+async def get_index_stats():
+    """Filas y dimensión del índice vectorial en memoria, por modelo."""
+    return vector_index.stats()
@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+
+from ..schemas.job import JobCreate, Job
+from ..schemas.gemini import BatchEmbeddingRequest, GeminiRequest
+from ..core import config
+from ..core.database import AsyncSessionLocal
+from ..dependencies import get_async_db, get_current_user
+from ..schemas.user import User
+from .. import crud_async
+
+router = APIRouter(prefix="/jobs")
+
+# Esquema con el que se valida el payload de cada tipo de trabajo.
+PAYLOAD_SCHEMAS = {
+    "generate": GeminiRequest,
+    "embeddings": BatchEmbeddingRequest,
+}
+
+FINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+async def _get_own_job(db: AsyncSession, job_id: int, user: User):
+    """Trabajo del usuario; 404 si no existe o es de otro (no se revela cuál)."""
+    job = await crud_async.get_job(db, job_id)
+    if job is None or job.owner != user.username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    job: JobCreate,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Encola un trabajo a nombre del usuario autenticado y devuelve su id."""
+    try:
+        payload = PAYLOAD_SCHEMAS[job.kind](**job.payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors())
+    if job.kind == "embeddings" and len(payload.texts) > config.EMBEDDING_BATCH_MAX_TEXTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many texts (max {config.EMBEDDING_BATCH_MAX_TEXTS})"
+        )
+
+    db_job = await crud_async.create_job(
+        db,
+        kind=job.kind,
+        payload=payload.model_dump(mode="json", exclude={"stream"}),
+        owner=current_user.username,
+        priority=job.priority,
+        max_attempts=job.max_attempts or config.JOB_MAX_ATTEMPTS,
+    )
+    pool = getattr(request.app.state, "job_pool", None)
+    if pool is not None:
+        pool.notify()
+    return db_job
+
+
+@router.get("/stats")
+async def get_job_stats(request: Request):
+    """Contadores del pool de workers de este proceso."""
+    pool = getattr(request.app.state, "job_pool", None)
+    return pool.stats() if pool is not None else {"workers": 0}
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Estado del trabajo y, si ha terminado, su resultado."""
+    return await _get_own_job(db, job_id, current_user)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: int, request: Request, current_user: User = Depends(get_current_user)):
+    """Envía el estado del trabajo como Server-Sent Events hasta que termina."""
+    async with AsyncSessionLocal() as db:
+        await _get_own_job(db, job_id, current_user)
+
+    async def events():
+        last_status = None
+        async with AsyncSessionLocal() as db:
+            while not await request.is_disconnected():
+                job = await crud_async.get_job(db, job_id)
+                if job is None:
+                    # Borrado mientras se seguía: se avisa y se cierra el stream.
+                    yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+                    break
+                if job.status != last_status:
+                    last_status = job.status
+                    data = Job.model_validate(job).model_dump(mode="json")
+                    yield f"event: status\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                if job.status in FINAL_STATUSES:
+                    break
+                await db.rollback()  # Cierra la transacción para ver cambios de otros workers
+                await asyncio.sleep(config.JOB_POLL_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancela un trabajo que todavía está en cola."""
+    await _get_own_job(db, job_id, current_user)
+    if not await crud_async.cancel_job(db, job_id):
+        job = await crud_async.get_job(db, job_id)
+        raise HTTPException(status_code=409, detail=f"Job is {job.status if job else 'gone'}")
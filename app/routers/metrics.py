@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from ..core.database import pool_metrics
+from ..core.metrics import gauges_from_stats, registry
+from ..core.security import hash_latency, token_cache
+from ..services.embedding_cache import embedding_cache
+from ..services.generation_cache import generation_cache
+from ..services.system_message_service import system_message_cache
+from ..services.user_cache import user_cache
+
+router = APIRouter(prefix="/metrics")
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_prometheus_metrics(request: Request):
+    """Todas las métricas en formato de texto de Prometheus.
+
+    Incluye las del registro (peticiones HTTP, proveedor, tokens y etapas) y
+    el estado actual de los pools de base de datos, las cachés y el cliente.
+    """
+    client = request.app.state.gemini_client
+    extra = (
+        gauges_from_stats("db_pool", "pool", {name: m.as_dict() for name, m in pool_metrics.items()})
+        + gauges_from_stats("cache", "cache", {
+            "embeddings": embedding_cache.stats(),
+            "generation": generation_cache.stats(),
+            "system_messages": system_message_cache.stats(),
+            "tokens": token_cache.stats(),
+            "users": user_cache.stats(),
+        })
+        + gauges_from_stats("gemini_limiter", "kind", client.limiter_stats())
+        + gauges_from_stats("gemini_pool", "client", {"gemini": client.pool_stats()})
+        + gauges_from_stats("gemini_endpoint", "endpoint", {
+            f"{kind}:{url}": stats
+            for kind, router_stats in client.endpoint_stats().items()
+            for url, stats in router_stats["endpoints"].items()
+        })
+    )
+    return PlainTextResponse(registry.render(extra), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/db-pool")
+async def get_db_pool_metrics():
+    """Métricas de los pools de conexiones (síncrono y asíncrono) a la base de datos."""
+    return {name: metrics.as_dict() for name, metrics in pool_metrics.items()}
+
+
+@router.get("/password-hashing")
+async def get_password_hashing_metrics():
+    """Latencia de los hash bcrypt (alta de usuarios) y de las verificaciones (login)."""
+    return {kind: stats.as_dict() for kind, stats in hash_latency.items()}
+
+
+@router.get("/auth-cache")
+async def get_auth_cache_metrics():
+    """Aciertos de las cachés de tokens verificados y de usuarios autenticados."""
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
@@ -0,0 +1,9 @@
+from .user import UserBase, UserCreate, User
+from .token import Token, TokenData, RefreshRequest
+from .gemini import (
+    SystemMessage, EmbeddingRequest, BatchEmbeddingRequest, EmbeddingResponse, StoredEmbedding,
+    EncodedStoredEmbedding, EmbeddingSummary, EmbeddingSearchRequest, EmbeddingSearchResult,
+    RetrieveOptions, GeminiRequest, GeminiResponse,
+)
+from .job import JobCreate, Job
+from .document import Document, DocumentChunk
@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class Document(BaseModel):
+    """Estado y progreso de la ingesta de un documento."""
+    id: int
+    name: str
+    owner: str
+    content_type: str
+    model: str
+    status: str
+    bytes_received: int
+    chunks_total: int
+    chunks_embedded: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    chunks_per_second: Optional[float] = None  # Rendimiento medio de la ingesta
+
+    class Config:
+        from_attributes = True
+
+
+class DocumentChunk(BaseModel):
+    """Fragmento de un documento con el embedding asociado."""
+    id: int
+    position: int
+    segment: int
+    start_char: int
+    text_hash: str
+    embedding_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
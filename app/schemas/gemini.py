@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, Optional, List
 from datetime import datetime
 
@@ -21,6 +21,12 @@ class EmbeddingRequest(BaseModel):
     model: Optional[str] = None
 
 
+class BatchEmbeddingRequest(BaseModel):
+    """Request para generar embeddings de varios textos en una sola llamada."""
+    texts: List[str]
+    model: Optional[str] = None
+
+
 class EmbeddingResponse(BaseModel):
     """Response con el vector embedding generado."""
     embedding: List[float]
@@ -39,6 +45,60 @@ class StoredEmbedding(EmbeddingResponse):
         from_attributes = True
 
 
+class EncodedStoredEmbedding(BaseModel):
+    """Embedding almacenado con el vector en base64 (``vector_encoding=base64``).
+
+    ``embedding`` son los bytes float32 little-endian del vector; en Python:
+    ``numpy.frombuffer(base64.b64decode(embedding), "<f4")``.
+    """
+    id: int
+    embedding: str
+    embedding_encoding: str = "base64_float32"
+    model: str
+    text: str
+    text_hash: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class EmbeddingSummary(BaseModel):
+    """Embedding almacenado sin el vector (listados con ``fields=summary``)."""
+    id: int
+    text: str
+    text_hash: str
+    model: str
+    dim: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EmbeddingSearchRequest(BaseModel):
+    """Búsqueda por similitud: se indica un texto (`query`) o un vector (`vector`)."""
+    query: Optional[str] = None
+    vector: Optional[List[float]] = None
+    k: int = 5
+    model: Optional[str] = None
+
+
+class EmbeddingSearchResult(BaseModel):
+    """Texto almacenado y su similitud coseno con la consulta."""
+    id: int
+    text: str
+    model: str
+    score: float
+
+
+class RetrieveOptions(BaseModel):
+    """Recuperación de contexto en el servidor a partir de los embeddings almacenados."""
+    query: str
+    k: int = 5
+    max_context_chars: Optional[int] = Field(default=None, gt=0)  # Por defecto RETRIEVE_MAX_CONTEXT_CHARS
+    model: Optional[str] = None  # Modelo de embeddings
+
+
 class GeminiRequest(BaseModel):
     prompt: str
     model: Optional[str] = None
@@ -46,6 +106,12 @@ class GeminiRequest(BaseModel):
     max_tokens: int = 512
     system_message_id: Optional[int] = None  # ID del mensaje del sistema a usar
     context_texts: Optional[List[str]] = None  # Textos relevantes del contexto
+    retrieve: Optional[RetrieveOptions] = None  # Contexto recuperado en el servidor
+    stream: bool = False  # Respuesta en streaming (Server-Sent Events)
+    use_cache: Optional[bool] = None  # Caché de respuestas (por defecto: activada si temperature=0 y GENERATION_CACHE_ENABLED)
+    hedge: Optional[bool] = None  # Peticiones duplicadas al proveedor (por defecto GEMINI_HEDGE_ENABLED)
+    include_raw: Optional[bool] = None  # Devolver la respuesta del proveedor en `raw` (por defecto GENERATE_INCLUDE_RAW)
+    include_context: Optional[bool] = None  # Devolver `used_context` (por defecto GENERATE_INCLUDE_CONTEXT)
 
 
 class GeminiResponse(BaseModel):
@@ -53,3 +119,4 @@ class GeminiResponse(BaseModel):
     raw: Optional[Any] = None
     used_system_message: Optional[SystemMessage] = None
     used_context: Optional[List[str]] = None
+    cached: bool = False  # True si la respuesta viene de la caché de generación
@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Any, Literal, Optional
+from datetime import datetime
+
+
+class JobCreate(BaseModel):
+    """Petición para encolar un trabajo.
+
+    ``payload`` es el cuerpo que se enviaría al endpoint equivalente:
+    ``GeminiRequest`` para ``generate`` y ``BatchEmbeddingRequest`` para ``embeddings``.
+    """
+    kind: Literal["generate", "embeddings"]
+    payload: dict
+    priority: int = 0
+    max_attempts: Optional[int] = None
+
+
+class Job(BaseModel):
+    """Estado (y resultado, si ha terminado) de un trabajo."""
+    id: int
+    kind: str
+    status: str
+    priority: int
+    owner: str
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,54 @@
+from typing import Any, Dict
+import hashlib
+
+from ..core import config
+from ..core.ttl_cache import TTLCache
+
+
+def compute_text_hash(text: str, model: str) -> str:
+    """Clave única SHA-256 de un embedding.
+
+    Incluye el modelo para que el mismo texto embebido con modelos distintos
+    no colisione en la columna única ``text_hash``.
+    """
+    return hashlib.sha256(f"{model}\n{text}".encode()).hexdigest()
+
+
+class EmbeddingCache(TTLCache):
+    """Caché LRU en memoria de embeddings almacenados, indexada por ``text_hash``.
+
+    Es la primera capa del camino de lectura de ``POST /gemini/embeddings``:
+    LRU en memoria -> tabla ``embeddings`` -> proveedor. Es un ``TTLCache``
+    sin caducidad (un embedding no cambia), así que la expulsión y los
+    contadores ``hits``/``misses`` son los de las demás cachés; además cuenta
+    cuántos fallos de memoria resolvió la tabla (``db_hits``) y cuántos
+    acabaron en el proveedor (``provider_misses``).
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        super().__init__(maxsize=maxsize, ttl=None)
+        self.db_hits = 0
+        self.provider_misses = 0
+
+    def discard_id(self, embedding_id: int) -> None:
+        """Elimina la entrada cuyo embedding almacenado tiene ese id."""
+        with self._lock:
+            for key, (value, _) in list(self._data.items()):
+                if getattr(value, "id", None) == embedding_id:
+                    del self._data[key]
+
+    def record_db_hit(self) -> None:
+        self.db_hits += 1
+
+    def record_miss(self) -> None:
+        self.provider_misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        data = super().stats()
+        data["db_hits"] = self.db_hits
+        data["provider_misses"] = self.provider_misses
+        return data
+
+
+# Instancia compartida por todo el proceso.
+embedding_cache = EmbeddingCache(maxsize=config.EMBEDDING_CACHE_SIZE)
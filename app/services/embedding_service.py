@@ -0,0 +1,235 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import crud_async
+from ..core import config
+from ..schemas.gemini import EmbeddingResponse, StoredEmbedding
+from .embedding_cache import EmbeddingCache, compute_text_hash
+from .gemini_client import GeminiClient
+from ..core.ttl_cache import TTLCache
+from .vector_index import vector_index
+
+# Vectores de consultas de búsqueda (no se guardan en la tabla): text_hash -> vector.
+query_embedding_cache = TTLCache(maxsize=config.QUERY_EMBEDDING_CACHE_SIZE, ttl=config.QUERY_EMBEDDING_CACHE_TTL)
+
+
+async def get_or_create_embedding(
+    db: AsyncSession,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    text: str,
+    model: Optional[str] = None,
+) -> StoredEmbedding:
+    """Devuelve el embedding de un texto siguiendo el camino de lectura.
+
+    Caché LRU en memoria -> tabla ``embeddings`` -> proveedor. Solo se llama
+    al proveedor cuando el texto no está en ninguna de las dos.
+    """
+    model = model or client.embed_model
+    text_hash = compute_text_hash(text, model)
+
+    # 1. Caché en memoria
+    cached = cache.get(text_hash)
+    if cached is not None:
+        return cached
+
+    # 2. Base de datos
+    existing = await crud_async.get_embedding_by_hash(db, text_hash)
+    if existing:
+        cache.record_db_hit()
+        stored = StoredEmbedding.model_validate(existing)
+        cache.put(text_hash, stored)
+        return stored
+
+    # 3. Proveedor (solo en caso de fallo de caché)
+    cache.record_miss()
+    embedding_response = await client.generate_embedding(text=text, model=model)
+    db_embedding = await crud_async.create_embedding(db, EmbeddingResponse(**embedding_response))
+    stored = StoredEmbedding.model_validate(db_embedding)
+    cache.put(text_hash, stored)
+    vector_index.add(stored.id, stored.text, stored.model, stored.embedding, text_hash=stored.text_hash)
+    return stored
+
+
+async def get_or_create_embeddings(
+    db: AsyncSession,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    texts: List[str],
+    model: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> List[StoredEmbedding]:
+    """Versión en lote de ``get_or_create_embedding``.
+
+    Los textos se deduplican por hash, los ya conocidos se resuelven con la
+    caché y una sola consulta ``IN (...)``, y solo los que faltan se envían al
+    proveedor en bloques de ``batch_size``, con como mucho ``concurrency``
+    llamadas simultáneas. Los nuevos se insertan en bloque. El resultado
+    respeta el orden de ``texts``. Si falla algún bloque se guardan los demás
+    y después se lanza el error del primero que falló.
+    """
+    model = model or client.embed_model
+    batch_size = max(1, batch_size or config.EMBEDDING_BATCH_SIZE)
+    concurrency = max(1, concurrency or config.EMBEDDING_BATCH_CONCURRENCY)
+
+    # Deduplicación por hash manteniendo el primer texto de cada hash.
+    hashes = [compute_text_hash(text, model) for text in texts]
+    unique: Dict[str, str] = {}
+    for text, text_hash in zip(texts, hashes):
+        unique.setdefault(text_hash, text)
+
+    # 1. Caché en memoria
+    found: Dict[str, StoredEmbedding] = {}
+    for text_hash in unique:
+        cached = cache.get(text_hash)
+        if cached is not None:
+            found[text_hash] = cached
+
+    # 2. Base de datos, una sola consulta para todos los pendientes
+    pending = [text_hash for text_hash in unique if text_hash not in found]
+    for db_embedding in await crud_async.get_embeddings_by_hashes(db, pending):
+        cache.record_db_hit()
+        stored = StoredEmbedding.model_validate(db_embedding)
+        found[stored.text_hash] = stored
+        cache.put(stored.text_hash, stored)
+
+    # 3. Proveedor, por bloques y con concurrencia limitada
+    missing = [unique[text_hash] for text_hash in unique if text_hash not in found]
+    if missing:
+        for _ in missing:
+            cache.record_miss()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def embed_chunk(chunk: List[str]):
+            async with semaphore:
+                return await client.generate_embeddings(texts=chunk, model=model)
+
+        chunks = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        results = await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks), return_exceptions=True)
+
+        # Los bloques que sí han llegado se guardan aunque otro haya fallado:
+        # al reintentar solo se piden los que faltan.
+        errors = [result for result in results if isinstance(result, BaseException)]
+        new_embeddings = [EmbeddingResponse(**item) for result in results
+                          if not isinstance(result, BaseException) for item in result]
+        if new_embeddings:
+            for db_embedding in await crud_async.create_embeddings(db, new_embeddings):
+                stored = StoredEmbedding.model_validate(db_embedding)
+                found[stored.text_hash] = stored
+                cache.put(stored.text_hash, stored)
+                vector_index.add(stored.id, stored.text, stored.model, stored.embedding,
+                                 text_hash=stored.text_hash)
+        if errors:
+            raise errors[0]
+
+    return [found[text_hash] for text_hash in hashes]
+
+
+_index_load_lock = asyncio.Lock()
+
+
+async def ensure_index_loaded(db: AsyncSession) -> None:
+    """Carga el índice vectorial desde la tabla la primera vez que se necesita."""
+    if vector_index.loaded:
+        return
+    async with _index_load_lock:
+        if not vector_index.loaded:
+            await vector_index.aload(crud_async.iter_embeddings(db, after_id=vector_index.resume_after_id))
+
+
+async def get_query_embedding(
+    db: AsyncSession,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    text: str,
+    model: str,
+) -> List[float]:
+    """Vector de un texto de consulta sin guardarlo como embedding del corpus.
+
+    Reutiliza el vector si el texto ya está almacenado (caché o tabla); si no,
+    lo pide al proveedor y lo guarda solo en ``query_embedding_cache``. Así
+    las búsquedas no añaden sus consultas a la tabla ni al índice vectorial.
+    """
+    text_hash = compute_text_hash(text, model)
+    stored = cache.get(text_hash)
+    if stored is not None:
+        return stored.embedding
+    vector = query_embedding_cache.get(text_hash)
+    if vector is not None:
+        return vector
+    existing = await crud_async.get_embedding_by_hash(db, text_hash)
+    if existing:
+        stored = StoredEmbedding.model_validate(existing)
+        cache.put(text_hash, stored)
+        return stored.embedding
+    embedding_response = await client.generate_embedding(text=text, model=model)
+    vector = embedding_response["embedding"]
+    query_embedding_cache.put(text_hash, vector)
+    return vector
+
+
+async def search_embeddings(
+    db: AsyncSession,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    query: Optional[str] = None,
+    vector: Optional[List[float]] = None,
+    model: Optional[str] = None,
+    k: int = 5,
+) -> List[Tuple[int, str, str, float]]:
+    """Devuelve ``(id, texto, modelo, score)`` de los ``k`` embeddings más parecidos.
+
+    Si se pasa ``query`` se obtiene su vector con ``get_query_embedding`` (la
+    consulta no se guarda en la tabla).
+    """
+    model = model or client.embed_model
+    if vector is None:
+        vector = await get_query_embedding(db, client, cache, text=query, model=model)
+    await ensure_index_loaded(db)
+    results = vector_index.search(vector, model=model, k=k)
+    if any(text is None for _, text, _ in results):
+        # El almacén en disco no guarda textos: se leen solo los de los resultados.
+        texts = await crud_async.get_embedding_texts(db, [embedding_id for embedding_id, _, _ in results])
+        results = [(embedding_id, texts.get(embedding_id), score) for embedding_id, _, score in results
+                   if embedding_id in texts]
+    return [(embedding_id, text, model, score) for embedding_id, text, score in results]
+
+
+def pack_context(texts: List[str], max_chars: int) -> List[str]:
+    """Selecciona textos en orden hasta llenar el presupuesto de caracteres.
+
+    Los textos que no caben enteros se omiten; si el primero ya supera el
+    presupuesto se incluye recortado para no devolver un contexto vacío.
+    """
+    packed: List[str] = []
+    used = 0
+    for text in texts:
+        if used + len(text) <= max_chars:
+            packed.append(text)
+            used += len(text) + 1  # +1 por el salto de línea que los separa
+        elif not packed:
+            packed.append(text[:max_chars])
+            break
+    return packed
+
+
+async def retrieve_context(
+    db: AsyncSession,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    query: str,
+    k: int = 5,
+    max_chars: Optional[int] = None,
+    model: Optional[str] = None,
+) -> List[str]:
+    """Recupera los ``k`` textos más parecidos a ``query`` dentro de un presupuesto.
+
+    La consulta no se guarda en la tabla (ver ``get_query_embedding``): el
+    prompt de un usuario nunca pasa a ser contexto recuperable por otro.
+    """
+    results = await search_embeddings(db, client, cache, query=query, model=model, k=k)
+    return pack_context([text for _, text, _, _ in results],
+                        config.RETRIEVE_MAX_CONTEXT_CHARS if max_chars is None else max_chars)
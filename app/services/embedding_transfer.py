@@ -0,0 +1,200 @@
+"""Exportación e importación masiva de embeddings en streaming.
+
+Formatos de exportación:
+
+- ``ndjson``: una línea JSON por embedding (``id``, ``text``, ``text_hash``,
+  ``model``, ``created_at`` y ``embedding``). Es el formato de importación.
+- ``npy``: la matriz float32 ``(filas, dim)`` de un modelo en formato
+  ``.npy``. Los metadatos de cada fila se obtienen con ``ndjson`` y
+  ``include_vectors=False`` usando el mismo ``model`` y ``max_id``: ambos
+  recorren las filas en orden de ``id``.
+
+Las filas se leen con un cursor de servidor (``yield_per``) y se escriben por
+bloques, así que la memoria no depende del tamaño del corpus.
+"""
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+import io
+import json
+
+import numpy as np
+
+from .. import crud_async, models
+from ..core import config
+from ..core.database import AsyncSessionLocal
+from .embedding_cache import compute_text_hash
+from .vector_index import vector_index
+
+
+class EmbeddingImportError(ValueError):
+    """Línea de importación no válida (``line`` empieza en 1)."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+class EmbeddingImportTooLarge(ValueError):
+    """El cuerpo de la importación supera ``EMBEDDING_IMPORT_MAX_BYTES``."""
+
+
+def _export_row(row: models.Embedding, include_vectors: bool) -> Dict:
+    item = {
+        "id": row.id,
+        "text": row.text,
+        "text_hash": row.text_hash,
+        "model": row.model,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+    if include_vectors:
+        item["embedding"] = row.array.tolist()
+    return item
+
+
+async def export_ndjson(model: Optional[str] = None, max_id: Optional[int] = None,
+                        include_vectors: bool = True) -> AsyncIterator[bytes]:
+    """Genera el NDJSON por bloques de ``EMBEDDING_EXPORT_BATCH_SIZE`` filas.
+
+    Abre su propia sesión: se consume dentro de un ``StreamingResponse``,
+    después de que la sesión de la petición se haya cerrado.
+    """
+    batch_size = config.EMBEDDING_EXPORT_BATCH_SIZE
+    async with AsyncSessionLocal() as db:
+        lines: List[str] = []
+        async for row in crud_async.iter_embeddings(db, batch_size=batch_size, model=model, max_id=max_id):
+            lines.append(json.dumps(_export_row(row, include_vectors), ensure_ascii=False))
+            if len(lines) >= batch_size:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+
+
+def npy_header(rows: int, dim: int) -> bytes:
+    """Cabecera ``.npy`` (versión 1.0) de una matriz float32 ``(rows, dim)``."""
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        buffer, {"descr": np.dtype("<f4").str, "fortran_order": False, "shape": (rows, dim)}
+    )
+    return buffer.getvalue()
+
+
+async def export_npy(model: str, rows: int, max_id: int) -> AsyncIterator[bytes]:
+    """Genera la matriz ``.npy`` de ``model`` hasta ``max_id``.
+
+    ``rows`` y ``max_id`` salen de ``crud_async.get_embedding_export_shape``
+    (la cabecera debe conocer el número de filas antes de empezar).
+    """
+    batch_size = config.EMBEDDING_EXPORT_BATCH_SIZE
+    async with AsyncSessionLocal() as db:
+        written = 0
+        block: List[np.ndarray] = []
+        async for row in crud_async.iter_embeddings(db, batch_size=batch_size, model=model, max_id=max_id):
+            block.append(row.array)
+            if len(block) >= batch_size:
+                yield np.stack(block).astype("<f4", copy=False).tobytes()
+                written += len(block)
+                block = []
+        if block:
+            yield np.stack(block).astype("<f4", copy=False).tobytes()
+            written += len(block)
+    if written != rows:
+        # Alguna fila se ha borrado durante la exportación: el .npy queda truncado
+        # y numpy lo rechazará al cargarlo en lugar de devolver datos desalineados.
+        raise RuntimeError(f"Export expected {rows} rows, got {written}")
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Divide un cuerpo recibido por trozos en líneas, sin cargarlo entero.
+
+    Con ``max_line_bytes`` se lanza ``EmbeddingImportError`` en cuanto una
+    línea lo supera, sin esperar a que termine: la memoria queda acotada
+    aunque el cuerpo no tenga saltos de línea.
+    """
+    pending = bytearray()
+    line_number = 0
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                break
+            pending += chunk[start:end]
+            line_number += 1
+            if max_line_bytes is not None and len(pending) > max_line_bytes:
+                raise EmbeddingImportError(line_number, f"line too long (max {max_line_bytes} bytes)")
+            yield bytes(pending)
+            pending.clear()
+            start = end + 1
+        pending += chunk[start:]
+        if max_line_bytes is not None and len(pending) > max_line_bytes:
+            raise EmbeddingImportError(line_number + 1, f"line too long (max {max_line_bytes} bytes)")
+    if pending:
+        yield bytes(pending)
+
+
+async def _limited(chunks: AsyncIterable[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise EmbeddingImportTooLarge(f"Import too large (max {max_bytes} bytes)")
+        yield chunk
+
+
+def _import_row(line_number: int, line: bytes, default_model: Optional[str]) -> Dict:
+    try:
+        item = json.loads(line)
+        text = item["text"]
+        model = item.get("model") or default_model
+        embedding = item["embedding"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise EmbeddingImportError(line_number, f"invalid record ({e})")
+    if not model:
+        raise EmbeddingImportError(line_number, "missing model")
+    if not isinstance(embedding, list) or not embedding:
+        raise EmbeddingImportError(line_number, "embedding must be a non-empty list")
+    # El hash se recalcula para que coincida siempre con el camino de lectura.
+    return models.Embedding.row_values({
+        "text": text,
+        "text_hash": compute_text_hash(text, model),
+        "model": model,
+        "embedding": embedding,
+    })
+
+
+async def import_ndjson(chunks: AsyncIterable[bytes], default_model: Optional[str] = None,
+                        chunk_size: Optional[int] = None) -> Dict[str, int]:
+    """Importa un NDJSON (formato de ``export_ndjson``) insertando por bloques.
+
+    Los ``text_hash`` ya existentes se ignoran, así que se puede relanzar una
+    importación interrumpida. Ante una línea no válida (o de más de
+    ``EMBEDDING_IMPORT_MAX_LINE_BYTES``) se lanza ``EmbeddingImportError`` y si
+    el cuerpo supera ``EMBEDDING_IMPORT_MAX_BYTES``, ``EmbeddingImportTooLarge``;
+    en ambos casos los bloques anteriores ya quedan guardados.
+    """
+    chunk_size = max(1, chunk_size or config.EMBEDDING_IMPORT_CHUNK_SIZE)
+    received = 0
+    chunks_written = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            rows: List[Dict] = []
+            line_number = 0
+            body = _limited(chunks, config.EMBEDDING_IMPORT_MAX_BYTES)
+            async for line in iter_lines(body, max_line_bytes=config.EMBEDDING_IMPORT_MAX_LINE_BYTES):
+                line_number += 1
+                if not line.strip():
+                    continue
+                rows.append(_import_row(line_number, line, default_model))
+                if len(rows) >= chunk_size:
+                    await crud_async.insert_embedding_rows(db, rows)
+                    received += len(rows)
+                    chunks_written += 1
+                    rows = []
+            if rows:
+                await crud_async.insert_embedding_rows(db, rows)
+                received += len(rows)
+                chunks_written += 1
+    finally:
+        if chunks_written:
+            vector_index.invalidate()
+    return {"received": received, "chunks": chunks_written}
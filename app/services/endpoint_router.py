@@ -0,0 +1,190 @@
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+import random
+import time
+
+
+class CircuitBreaker:
+    """Cortocircuito por endpoint.
+
+    Tras ``failure_threshold`` fallos seguidos se abre durante ``reset_timeout``
+    segundos (no se le envía nada). Pasado ese tiempo deja pasar una petición
+    de prueba: si va bien se cierra y si falla vuelve a abrirse. Con
+    ``failure_threshold <= 0`` no se abre nunca.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allows(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def on_dispatch(self) -> None:
+        if self.state == "half_open":
+            self.probing = True
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or (0 < self.failure_threshold <= self.failures):
+            if self.opened_at is None:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    """Un endpoint del proveedor con su peso, su latencia observada y su cortocircuito.
+
+    ``model`` (opcional) limita el endpoint a las peticiones de ese modelo:
+    permite tener despliegues distintos por modelo. Sin ``model`` acepta
+    cualquiera.
+    """
+
+    def __init__(self, url: str, weight: float = 1.0, model: Optional[str] = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, window: int = 200):
+        self.url = url
+        self.weight = weight
+        self.model = model
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies: "deque[float]" = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.hedges_won = 0
+
+    def serves(self, model: Optional[str]) -> bool:
+        return self.model is None or not model or self.model == model
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        if ok:
+            self.breaker.on_success()
+            self.latencies.append(latency)
+            self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+        else:
+            self.failures += 1
+            self.breaker.on_failure()
+
+    def abandon(self, elapsed: Optional[float] = None) -> None:
+        """La petición se canceló sin resultado: libera la prueba del cortocircuito.
+
+        ``elapsed`` (lo que llevaba esperando al cancelarse) entra en la media
+        de latencia como cota inferior: sin ella, un endpoint que siempre pierde
+        el *hedging* no tendría nunca latencia medida y ``choose`` lo trataría
+        como el más rápido. No se añade a ``latencies`` (no es una latencia
+        completa y subiría el percentil del *hedging*).
+        """
+        self.breaker.probing = False
+        if elapsed is not None:
+            self.ewma = elapsed if self.ewma is None else 0.8 * self.ewma + 0.2 * max(self.ewma, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "model": self.model,
+            "state": self.breaker.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "breaker_opens": self.breaker.opens,
+            "latency_ewma_ms": round(self.ewma * 1000, 3) if self.ewma is not None else None,
+            "hedges_won": self.hedges_won,
+        }
+
+
+def parse_endpoints(spec: str, failure_threshold: int, reset_timeout: float) -> List[Endpoint]:
+    """Lee una lista ``url[|peso[|modelo]]`` separada por comas."""
+    endpoints = []
+    for item in spec.split(","):
+        parts = [part.strip() for part in item.strip().split("|")]
+        if not parts[0]:
+            continue
+        weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+        if not weight > 0:
+            raise ValueError(f"Endpoint weight must be greater than 0: {item.strip()}")
+        model = parts[2] if len(parts) > 2 and parts[2] else None
+        endpoints.append(Endpoint(parts[0], weight, model, failure_threshold, reset_timeout))
+    return endpoints
+
+
+class EndpointRouter:
+    """Elige endpoint para cada intento entre los que tienen el cortocircuito cerrado.
+
+    La elección es aleatoria ponderada por ``peso / latencia media``: los
+    endpoints más rápidos reciben más tráfico sin dejar de probar los lentos.
+    Los que aún no tienen latencia medida usan la mejor conocida, para que
+    reciban tráfico y se midan. También calcula el retardo de las peticiones
+    duplicadas (*hedging*) a partir del percentil ``hedge_percentile``.
+    """
+
+    def __init__(self, endpoints: Iterable[Endpoint], hedge_percentile: float = 0.95,
+                 hedge_default_delay: float = 1.0, hedge_min_delay: float = 0.05,
+                 hedge_min_samples: int = 20):
+        self.endpoints = list(endpoints)
+        if not self.endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.rejected = 0
+        self.hedges = 0
+
+    def serves(self, model: Optional[str]) -> bool:
+        """Si algún endpoint acepta peticiones de ``model``."""
+        return any(endpoint.serves(model) for endpoint in self.endpoints)
+
+    def choose(self, exclude: Iterable[Endpoint] = (), model: Optional[str] = None) -> Optional[Endpoint]:
+        """Endpoint para el siguiente intento, o ``None`` si todos están abiertos.
+
+        Solo se eligen endpoints que sirven ``model``. ``exclude`` se evita
+        mientras quede alguna otra opción disponible.
+        """
+        available = [endpoint for endpoint in self.endpoints
+                     if endpoint.serves(model) and endpoint.breaker.allows()]
+        if not available:
+            self.rejected += 1
+            return None
+        excluded = set(id(endpoint) for endpoint in exclude)
+        preferred = [endpoint for endpoint in available if id(endpoint) not in excluded]
+        candidates = preferred or available
+        known = [endpoint.ewma for endpoint in candidates if endpoint.ewma]
+        default_latency = min(known) if known else 1.0
+        scores = [endpoint.weight / (endpoint.ewma or default_latency) for endpoint in candidates]
+        endpoint = random.choices(candidates, weights=scores)[0]
+        endpoint.breaker.on_dispatch()
+        endpoint.requests += 1
+        return endpoint
+
+    def hedge_delay(self) -> float:
+        """Espera antes de duplicar una petición: el percentil de las latencias recientes."""
+        samples = sorted(latency for endpoint in self.endpoints for latency in endpoint.latencies)
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        value = samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile))]
+        return max(self.hedge_min_delay, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoints": {endpoint.url: endpoint.stats() for endpoint in self.endpoints},
+            "rejected": self.rejected,
+            "hedges": self.hedges,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 3),
+        }
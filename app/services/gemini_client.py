@@ -1,16 +1,114 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
+import asyncio
 import json
-import hashlib
+import random
+import time
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from ..core import config
+from ..core import metrics
+from ..core.metrics import LatencyStats
+from .embedding_cache import compute_text_hash
+from .endpoint_router import Endpoint, EndpointRouter, parse_endpoints
+from .generation_cache import generation_cache_key
+from .single_flight import SingleFlight
+from .rate_limiter import ProviderLimiter, parse_retry_after
+
+
+# Respuestas del proveedor que merece la pena reintentar.
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> float:
+    """Estimación aproximada de tokens (≈ 4 caracteres por token)."""
+    return len(text) / 4.0
+
+
+def _create_router(spec: str, default_url: str, allow_model: bool) -> EndpointRouter:
+    endpoints = parse_endpoints(spec, config.GEMINI_BREAKER_FAILURES, config.GEMINI_BREAKER_RESET)
+    if not endpoints:
+        endpoints = [Endpoint(default_url, failure_threshold=config.GEMINI_BREAKER_FAILURES,
+                              reset_timeout=config.GEMINI_BREAKER_RESET)]
+    if not allow_model:
+        for endpoint in endpoints:
+            endpoint.model = None
+    return EndpointRouter(
+        endpoints,
+        hedge_percentile=config.GEMINI_HEDGE_PERCENTILE,
+        hedge_default_delay=config.GEMINI_HEDGE_DEFAULT_DELAY,
+        hedge_min_delay=config.GEMINI_HEDGE_MIN_DELAY,
+    )
+
+
+def _create_limiter(name: str, requests_per_second: float, tokens_per_minute: float) -> ProviderLimiter:
+    return ProviderLimiter(
+        name,
+        requests_per_second=requests_per_second,
+        tokens_per_minute=tokens_per_minute,
+        initial_concurrency=config.GEMINI_CONCURRENCY,
+        min_concurrency=config.GEMINI_MIN_CONCURRENCY,
+        max_concurrency=config.GEMINI_MAX_CONCURRENCY,
+        latency_target=config.GEMINI_LATENCY_TARGET,
+        retry_budget_ratio=config.GEMINI_RETRY_BUDGET_RATIO,
+    )
 
 
 class GeminiError(Exception):
     pass
 
 
+class PoolStats:
+    """Estadísticas del pool de conexiones HTTP compartido.
+
+    El tiempo de espera por conexión se mide desde que la petición entra en el
+    transporte hasta el primer evento de la conexión asignada (apertura TCP si
+    es nueva o envío de cabeceras si se reutiliza una conexión viva). Todo sale
+    de los eventos ``trace`` públicos de httpx, sin leer el estado interno del
+    pool: ``requests - connections_opened`` son las peticiones que reutilizaron
+    una conexión.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.connections_opened = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_count += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        avg = self.wait_total / self.wait_count if self.wait_count else 0.0
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "connections_opened": self.connections_opened,
+            "wait_avg_ms": round(avg * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+def extract_text(data: Any) -> Optional[str]:
+    """Extrae el texto de una respuesta (o fragmento) del proveedor."""
+    if isinstance(data, dict):
+        if "text" in data and isinstance(data["text"], str):
+            return data["text"]
+        if "choices" in data and isinstance(data["choices"], list) and len(data["choices"]) > 0:
+            first = data["choices"][0]
+            if isinstance(first, dict):
+                if "text" in first:
+                    return first["text"]
+                delta = first.get("delta")
+                if isinstance(delta, dict) and isinstance(delta.get("content"), str):
+                    return delta["content"]
+    return None
+
+
 class GeminiClient:
     """
     Cliente asíncrono para consumir el modelo Gemini.
@@ -19,16 +117,239 @@ class GeminiClient:
 
     def __init__(self, api_key: Optional[str] = None, endpoint: Optional[str] = None, 
                  model: Optional[str] = None, embed_endpoint: Optional[str] = None,
-                 embed_model: Optional[str] = None, timeout: float = 30.0):
-        self.api_key = api_key or config.GEMINI_API_KEY
-        self.endpoint = endpoint or config.GEMINI_ENDPOINT
-        self.model = model or config.GEMINI_MODEL
-        self.embed_endpoint = embed_endpoint or config.GEMINI_EMBED_ENDPOINT
-        self.embed_model = embed_model or config.GEMINI_EMBED_MODEL
-        self._client = httpx.AsyncClient(timeout=timeout)
+                 embed_model: Optional[str] = None, timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None,
+                 pool_timeout: Optional[float] = None,
+                 http2: Optional[bool] = None):
+        self.api_key = config.GEMINI_API_KEY if api_key is None else api_key
+        self.endpoint = config.GEMINI_ENDPOINT if endpoint is None else endpoint
+        self.model = config.GEMINI_MODEL if model is None else model
+        self.embed_endpoint = config.GEMINI_EMBED_ENDPOINT if embed_endpoint is None else embed_endpoint
+        self.embed_model = config.GEMINI_EMBED_MODEL if embed_model is None else embed_model
+
+        # Límites del pool: el cliente vive toda la aplicación, así que las
+        # conexiones abiertas se reutilizan entre peticiones (keep-alive).
+        # Los valores explícitos (también 0) tienen prioridad sobre la configuración.
+        limits = httpx.Limits(
+            max_connections=config.GEMINI_MAX_CONNECTIONS if max_connections is None else max_connections,
+            max_keepalive_connections=(config.GEMINI_MAX_KEEPALIVE_CONNECTIONS
+                                       if max_keepalive_connections is None else max_keepalive_connections),
+            keepalive_expiry=config.GEMINI_KEEPALIVE_EXPIRY if keepalive_expiry is None else keepalive_expiry,
+        )
+        timeouts = httpx.Timeout(
+            config.GEMINI_TIMEOUT if timeout is None else timeout,
+            pool=config.GEMINI_POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+        )
+        self.stats = PoolStats()
+        self.ttfb = LatencyStats()  # Tiempo hasta el primer fragmento en streaming
+        self._flights = SingleFlight()  # Agrupa llamadas idénticas concurrentes
+        # Control de tráfico con presupuestos separados por tipo de llamada.
+        self.limiters = {
+            "generate": _create_limiter("generate", config.GEMINI_GENERATE_RPS, config.GEMINI_GENERATE_TPM),
+            "embed": _create_limiter("embed", config.GEMINI_EMBED_RPS, config.GEMINI_EMBED_TPM),
+        }
+        # Endpoints por tipo de llamada. Si se pasa un endpoint explícito se usa solo ese.
+        self.routers = {
+            "generate": _create_router("" if endpoint is not None else config.GEMINI_ENDPOINTS,
+                                       self.endpoint, allow_model=True),
+            "embed": _create_router("" if embed_endpoint is not None else config.GEMINI_EMBED_ENDPOINTS,
+                                    self.embed_endpoint, allow_model=False),
+        }
+        # El cliente HTTP (contexto TLS, certificados, h2) se crea en la primera
+        # llamada al proveedor y no al arrancar el worker.
+        self._client_options = {
+            "timeout": timeouts,
+            "limits": limits,
+            "http2": config.GEMINI_HTTP2 if http2 is None else http2,
+        }
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(**self._client_options)
+        return self._http
 
     async def aclose(self) -> None:
-        await self._client.aclose()
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> httpx.Response:
+        """Envía un POST por el pool compartido midiendo la espera por conexión."""
+        started = time.perf_counter()
+        waited = False
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            nonlocal waited
+            if event == "connection.connect_tcp.complete":
+                self.stats.connections_opened += 1
+            if not waited and (event.startswith("connection.connect_tcp")
+                               or event.endswith("send_request_headers.started")):
+                waited = True
+                self.stats.record_wait(time.perf_counter() - started)
+
+        self.stats.requests += 1
+        self.stats.in_flight += 1
+        try:
+            return await self._client.post(
+                url,
+                headers=self._get_headers(),
+                json=payload,
+                extensions={"trace": trace},
+            )
+        finally:
+            self.stats.in_flight -= 1
+
+    async def _attempt(self, endpoint: Endpoint, payload: Dict[str, Any]) -> httpx.Response:
+        """Un envío a ``endpoint``, registrando el resultado en su cortocircuito."""
+        started = time.perf_counter()
+        try:
+            resp = await self._post(endpoint.url, payload)
+        except httpx.RequestError:
+            endpoint.record(None, ok=False)
+            raise
+        except asyncio.CancelledError:
+            # Cancelada (p. ej. perdió el hedging): lo esperado cuenta como latencia mínima.
+            endpoint.abandon(time.perf_counter() - started)
+            raise
+        endpoint.record(time.perf_counter() - started, ok=resp.status_code not in RETRYABLE_STATUS)
+        return resp
+
+    async def _backup_attempt(self, limiter: ProviderLimiter, tokens: float, endpoint: Endpoint,
+                              payload: Dict[str, Any]) -> httpx.Response:
+        """Copia de respaldo del *hedging*: ocupa su propio turno en el limitador."""
+        try:
+            async with limiter.slot(tokens):
+                return await self._attempt(endpoint, payload)
+        except asyncio.CancelledError:
+            # Cancelada antes de enviarse (esperando turno): libera la prueba del cortocircuito.
+            endpoint.abandon()
+            raise
+
+    async def _hedged_attempt(self, router: EndpointRouter, limiter: ProviderLimiter, tokens: float,
+                              endpoint: Endpoint, payload: Dict[str, Any]):
+        """Envío con copia de respaldo (*hedging*). Devuelve ``(endpoint, respuesta)``.
+
+        Si ``endpoint`` no responde antes de ``router.hedge_delay()`` se envía
+        una copia a otro endpoint (si hay presupuesto de reintentos y algún
+        endpoint disponible) y se usa la primera respuesta válida; la otra
+        petición se cancela. La copia espera su propio turno en el limitador.
+        """
+        primary = asyncio.ensure_future(self._attempt(endpoint, payload))
+        tasks = {primary: endpoint}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=router.hedge_delay())
+            backup_endpoint = None
+            if not done and limiter.retry_budget.can_spend():
+                backup_endpoint = router.choose(exclude=[endpoint], model=payload.get("model"))
+            if backup_endpoint is None:
+                return endpoint, await primary
+
+            limiter.retry_budget.try_spend()
+            router.hedges += 1
+            backup = asyncio.ensure_future(self._backup_attempt(limiter, tokens, backup_endpoint, payload))
+            tasks[backup] = backup_endpoint
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS:
+                        if task is not primary:
+                            backup_endpoint.hedges_won += 1
+                        return tasks[task], task.result()
+            # Las dos han fallado: se devuelve una respuesta si la hay, si no el error.
+            for task, task_endpoint in tasks.items():
+                if task.exception() is None:
+                    return task_endpoint, task.result()
+            return endpoint, primary.result()
+        finally:
+            # También si quien llama se cancela mientras se espera a la primera.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _request(self, kind: str, payload: Dict[str, Any], tokens: float = 0.0,
+                       hedge: bool = False) -> httpx.Response:
+        """POST con control de tráfico, elección de endpoint y reintentos acotados.
+
+        Cada intento espera turno en el limitador de ``kind`` y elige endpoint
+        entre los que tienen el cortocircuito cerrado (evitando los ya probados
+        si hay alternativa). Se reintentan los errores de red y las respuestas
+        429/5xx, respetando ``Retry-After`` (o backoff exponencial con jitter si
+        no viene), hasta ``GEMINI_MAX_ATTEMPTS`` intentos y mientras quede
+        presupuesto de reintentos. Devuelve la última respuesta para que quien
+        llama la valide.
+        """
+        limiter = self.limiters[kind]
+        router = self.routers[kind]
+        model = payload.get("model", "")
+        if not router.serves(model):
+            raise GeminiError(f"Gemini request failed: no endpoint configured for model {model}")
+        limiter.on_request()
+        tried: List[Endpoint] = []
+        attempt = 0
+        while True:
+            attempt += 1
+            resp = None
+            error = None
+            queued = time.perf_counter()
+            async with limiter.slot(tokens):
+                started = time.perf_counter()
+                metrics.stage_duration.observe(started - queued, operation=kind, stage="queue")
+                endpoint = router.choose(exclude=tried, model=model)
+                if endpoint is None:
+                    raise GeminiError("Gemini request failed: all endpoints are unavailable (circuit open)")
+                tried.append(endpoint)
+                try:
+                    if hedge:
+                        endpoint, resp = await self._hedged_attempt(router, limiter, tokens, endpoint, payload)
+                    else:
+                        resp = await self._attempt(endpoint, payload)
+                except httpx.RequestError as e:
+                    error = e
+                latency = time.perf_counter() - started
+            metrics.provider_request_duration.observe(latency, kind=kind, model=metrics.model_label(model))
+            metrics.provider_responses.inc(kind=kind, model=metrics.model_label(model),
+                                           status=resp.status_code if resp is not None else "error")
+
+            retry_after = None
+            if resp is not None:
+                if resp.status_code == 429:
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    limiter.on_throttle(retry_after)
+                elif resp.status_code not in RETRYABLE_STATUS:
+                    if resp.is_success:
+                        limiter.on_success(latency)
+                    return resp
+
+            if attempt >= config.GEMINI_MAX_ATTEMPTS or not limiter.allow_retry():
+                if error is not None:
+                    raise GeminiError(f"Gemini request failed: {error}")
+                return resp
+
+            if retry_after is None:
+                retry_after = min(config.GEMINI_RETRY_MAX_DELAY,
+                                  config.GEMINI_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                retry_after *= random.uniform(0.5, 1.0)
+            await asyncio.sleep(retry_after)
+
+    def endpoint_stats(self) -> Dict[str, Any]:
+        """Estado de cada endpoint (peso, latencia, cortocircuito) y de las copias."""
+        return {kind: router.stats() for kind, router in self.routers.items()}
+
+    def limiter_stats(self) -> Dict[str, Any]:
+        """Métricas de cola, concurrencia y limitaciones por tipo de llamada."""
+        return {kind: limiter.stats() for kind, limiter in self.limiters.items()}
+
+    def flight_stats(self) -> Dict[str, Any]:
+        """Llamadas al proveedor agrupadas por el single-flight."""
+        return self._flights.stats()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Devuelve el uso del pool: peticiones, conexiones abiertas y esperas (ver ``PoolStats``)."""
+        return self.stats.as_dict()
 
     def _get_headers(self) -> Dict[str, str]:
         if not self.api_key:
@@ -38,15 +359,12 @@ class GeminiClient:
             "Content-Type": "application/json",
         }
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10),
-           retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)))
-    async def generate_text(self, prompt: str, model: Optional[str] = None,
-                          temperature: float = 0.2, max_tokens: int = 512,
-                          system_message: Optional[str] = None,
-                          context_texts: Optional[List[str]] = None) -> Dict[str, Any]:
-        """Genera texto usando el modelo, opcionalmente con mensaje del sistema y contexto."""
+    def build_payload(self, prompt: str, model: Optional[str], temperature: float,
+                       max_tokens: int, system_message: Optional[str],
+                       context_texts: Optional[List[str]]) -> Dict[str, Any]:
+        """Construye el payload de generación con el prompt completo."""
         model = model or self.model
-        
+
         # Construye el prompt completo con sistema y contexto
         full_prompt = ""
         if system_message:
@@ -55,14 +373,34 @@ class GeminiClient:
             full_prompt += "Context:\n" + "\n".join(context_texts) + "\n\n"
         full_prompt += f"User: {prompt}\n\nAssistant:"
 
-        payload = {
+        return {
             "model": model,
             "prompt": full_prompt,
             "temperature": float(temperature),
             "max_output_tokens": int(max_tokens),
         }
 
-        resp = await self._client.post(self.endpoint, headers=self._get_headers(), json=payload)
+    async def generate_text(self, prompt: str, model: Optional[str] = None,
+                          temperature: float = 0.2, max_tokens: int = 512,
+                          system_message: Optional[str] = None,
+                          context_texts: Optional[List[str]] = None,
+                          hedge: Optional[bool] = None) -> Dict[str, Any]:
+        """Genera texto usando el modelo, opcionalmente con mensaje del sistema y contexto.
+
+        Las llamadas concurrentes con el mismo payload comparten una única
+        petición al proveedor. ``hedge`` activa las peticiones duplicadas (por
+        defecto ``GEMINI_HEDGE_ENABLED``).
+        """
+        hedge = config.GEMINI_HEDGE_ENABLED if hedge is None else hedge
+        with metrics.time_stage("generate", "build_payload"):
+            payload = self.build_payload(prompt, model, temperature, max_tokens,
+                                         system_message, context_texts)
+            key = ("generate", generation_cache_key(payload))
+        return await self._flights.do(key, lambda: self._send_generation(payload, hedge))
+
+    async def _send_generation(self, payload: Dict[str, Any], hedge: bool = False) -> Dict[str, Any]:
+        tokens = estimate_tokens(payload["prompt"]) + payload["max_output_tokens"]
+        resp = await self._request("generate", payload, tokens, hedge=hedge)
 
         try:
             resp.raise_for_status()
@@ -74,30 +412,118 @@ class GeminiClient:
                 detail = resp.text
             raise GeminiError(f"Gemini request failed: {e.response.status_code} - {detail}")
 
-        try:
-            return resp.json()
-        except Exception:
-            return {"text": resp.text}
+        with metrics.time_stage("generate", "parse"):
+            try:
+                data = resp.json()
+            except Exception:
+                data = {"text": resp.text}
+        metrics.record_token_usage(payload["model"], data)
+        return data
+
+    async def stream_text(self, prompt: str, model: Optional[str] = None,
+                          temperature: float = 0.2, max_tokens: int = 512,
+                          system_message: Optional[str] = None,
+                          context_texts: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Genera texto en streaming, devolviendo los fragmentos según llegan.
+
+        Lee la respuesta fragmentada del proveedor línea a línea (SSE ``data: {...}``
+        o JSON por línea). Solo se lee del proveedor cuando quien consume pide el
+        siguiente fragmento, y si se deja de consumir (por ejemplo, el cliente HTTP
+        se desconecta) la conexión con el proveedor se cierra.
+        """
+        payload = self.build_payload(prompt, model, temperature, max_tokens,
+                                     system_message, context_texts)
+        payload["stream"] = True
+
+        limiter = self.limiters["generate"]
+        tokens = estimate_tokens(payload["prompt"]) + payload["max_output_tokens"]
+        first = True
+        limiter.on_request()
+        queued = time.perf_counter()
+        async with limiter.slot(tokens):
+            started = time.perf_counter()
+            metrics.stage_duration.observe(started - queued, operation="stream", stage="queue")
+            router = self.routers["generate"]
+            if not router.serves(payload["model"]):
+                raise GeminiError(f"Gemini stream failed: no endpoint configured for model {payload['model']}")
+            endpoint = router.choose(model=payload["model"])
+            if endpoint is None:
+                raise GeminiError("Gemini stream failed: all endpoints are unavailable (circuit open)")
+            model_label = metrics.model_label(payload["model"])
+            self.stats.requests += 1
+            self.stats.in_flight += 1
+            try:
+                async with self._client.stream("POST", endpoint.url, headers=self._get_headers(),
+                                               json=payload) as resp:
+                    metrics.provider_responses.inc(kind="stream", model=model_label,
+                                                   status=resp.status_code)
+                    if resp.status_code in RETRYABLE_STATUS:
+                        endpoint.record(None, ok=False)
+                    if resp.status_code == 429:
+                        limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                    if resp.status_code >= 400:
+                        detail = (await resp.aread()).decode(errors="replace")
+                        raise GeminiError(f"Gemini stream failed: {resp.status_code} - {detail}")
+                    async for line in resp.aiter_lines():
+                        line = line.strip()
+                        if line.startswith("data:"):
+                            line = line[len("data:"):].strip()
+                        if not line or line.startswith(":") or line.startswith("event:"):
+                            continue
+                        if line == "[DONE]":
+                            break
+                        try:
+                            text = extract_text(json.loads(line))
+                        except ValueError:
+                            text = line
+                        if not text:
+                            continue
+                        if first:
+                            first = False
+                            ttfb = time.perf_counter() - started
+                            self.ttfb.record(ttfb)
+                            metrics.stage_duration.observe(ttfb, operation="stream", stage="first_chunk")
+                            # En streaming la señal de latencia es el primer fragmento.
+                            limiter.on_success(ttfb)
+                            endpoint.record(ttfb, ok=True)
+                        yield text
+            except httpx.RequestError as e:
+                metrics.provider_responses.inc(kind="stream", model=model_label, status="error")
+                endpoint.record(None, ok=False)
+                raise GeminiError(f"Gemini stream failed: {e}")
+            except (asyncio.CancelledError, GeneratorExit):
+                if first:
+                    # Cancelado esperando el primer fragmento: lo esperado es su latencia mínima.
+                    endpoint.abandon(time.perf_counter() - started)
+                raise
+            finally:
+                if first:
+                    # Sin ningún fragmento (cancelado o vacío): libera la prueba del cortocircuito.
+                    endpoint.abandon()
+                self.stats.in_flight -= 1
+                metrics.provider_request_duration.observe(time.perf_counter() - started,
+                                                          kind="stream", model=model_label)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10),
-           retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)))
     async def generate_embedding(self, text: str, model: Optional[str] = None) -> Dict[str, Any]:
-        """Genera un embedding para el texto dado."""
+        """Genera un embedding para el texto dado.
+
+        Las llamadas concurrentes con el mismo texto y modelo comparten una
+        única petición al proveedor.
+        """
         model = model or self.embed_model
 
-        # Calcula hash del texto para identificación única
-        text_hash = hashlib.sha256(text.encode()).hexdigest()
+        # Calcula hash del texto y el modelo para identificación única
+        text_hash = compute_text_hash(text, model)
+        return await self._flights.do(("embed", text_hash),
+                                      lambda: self._send_embedding(text, model, text_hash))
 
+    async def _send_embedding(self, text: str, model: str, text_hash: str) -> Dict[str, Any]:
         payload = {
             "model": model,
             "text": text,
         }
 
-        resp = await self._client.post(
-            self.embed_endpoint,
-            headers=self._get_headers(),
-            json=payload
-        )
+        resp = await self._request("embed", payload, estimate_tokens(text))
 
         try:
             resp.raise_for_status()
@@ -110,7 +536,9 @@ class GeminiClient:
             raise GeminiError(f"Embedding generation failed: {e.response.status_code} - {detail}")
 
         try:
-            response_data = resp.json()
+            with metrics.time_stage("embed", "parse"):
+                response_data = resp.json()
+            metrics.record_token_usage(model, response_data)
             # Adapta según la estructura real de tu proveedor
             embedding = response_data.get("embedding", response_data.get("embeddings", []))
             return {
@@ -121,3 +549,45 @@ class GeminiClient:
             }
         except Exception as e:
             raise GeminiError(f"Failed to parse embedding response: {e}")
+
+    async def generate_embeddings(self, texts: List[str], model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Genera los embeddings de varios textos en una sola llamada al proveedor."""
+        model = model or self.embed_model
+
+        payload = {
+            "model": model,
+            "texts": texts,
+        }
+
+        tokens = sum(estimate_tokens(text) for text in texts)
+        resp = await self._request("embed", payload, tokens)
+
+        try:
+            resp.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            detail = None
+            try:
+                detail = resp.json()
+            except Exception:
+                detail = resp.text
+            raise GeminiError(f"Batch embedding generation failed: {e.response.status_code} - {detail}")
+
+        try:
+            with metrics.time_stage("embed", "parse"):
+                response_data = resp.json()
+            metrics.record_token_usage(model, response_data)
+            # Adapta según la estructura real de tu proveedor
+            embeddings = response_data.get("embeddings", [])
+            if len(embeddings) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+            return [
+                {
+                    "embedding": embedding,
+                    "model": model,
+                    "text": text,
+                    "text_hash": compute_text_hash(text, model),
+                }
+                for text, embedding in zip(texts, embeddings)
+            ]
+        except Exception as e:
+            raise GeminiError(f"Failed to parse batch embedding response: {e}")
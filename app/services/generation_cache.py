@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..core import config
+
+
+def generation_cache_key(payload: Dict[str, Any]) -> str:
+    """Clave SHA-256 del payload completo (prompt ensamblado y parámetros)."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class MemoryBackend:
+    """Backend LRU en memoria del proceso, limitado por número de entradas y bytes."""
+
+    name = "memory"
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, db: Optional[AsyncSession], key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            response, size, latency_ms, expires_at = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return response, latency_ms
+
+    async def set(self, db: Optional[AsyncSession], key: str, response: Any, size: int, latency_ms: float) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (response, size, latency_ms, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.bytes -= item[1]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._data), "bytes": self.bytes}
+
+
+class DatabaseBackend:
+    """Backend en la tabla ``generation_cache``, compartido entre workers.
+
+    La limpieza (caducadas y exceso de entradas/bytes) se hace cada
+    ``evict_every`` escrituras para no añadir consultas a cada petición.
+    """
+
+    name = "db"
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, evict_every: int = 50):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._writes = 0
+
+    async def get(self, db: AsyncSession, key: str) -> Optional[Tuple[Any, float]]:
+        entry = await db.scalar(
+            select(models.GenerationCacheEntry).where(
+                models.GenerationCacheEntry.key == key,
+                models.GenerationCacheEntry.expires_at > datetime.now(timezone.utc),
+            )
+        )
+        if entry is None:
+            return None
+        return json.loads(entry.response), entry.latency_ms
+
+    async def set(self, db: AsyncSession, key: str, response: Any, size: int, latency_ms: float) -> None:
+        if size > self.max_bytes:
+            return
+        await db.merge(models.GenerationCacheEntry(
+            key=key,
+            response=json.dumps(response, ensure_ascii=False),
+            size_bytes=size,
+            latency_ms=latency_ms,
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+        ))
+        await db.commit()
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            await self.evict(db)
+
+    async def evict(self, db: AsyncSession) -> None:
+        """Borra las entradas caducadas y las más antiguas que excedan los límites.
+
+        El exceso se calcula en la base de datos (número de fila y bytes
+        acumulados de la más reciente a la más antigua), sin traer las claves.
+        """
+        table = models.GenerationCacheEntry
+        await db.execute(delete(table).where(table.expires_at <= datetime.now(timezone.utc)))
+        newest_first = (table.created_at.desc(), table.key)
+        ranked = select(
+            table.key,
+            func.row_number().over(order_by=newest_first).label("position"),
+            func.sum(table.size_bytes).over(order_by=newest_first, rows=(None, 0)).label("total_bytes"),
+        ).subquery()
+        excess = select(ranked.c.key).where(
+            or_(ranked.c.position > self.max_entries, ranked.c.total_bytes > self.max_bytes)
+        )
+        await db.execute(delete(table).where(table.key.in_(excess)))
+        await db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class GenerationCache:
+    """Caché de respuestas de generación con backend intercambiable.
+
+    Lleva la cuenta de aciertos/fallos y de la latencia del proveedor que se
+    ha ahorrado (la latencia original de cada respuesta servida desde caché).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    async def get(self, db: AsyncSession, key: str) -> Optional[Any]:
+        found = await self.backend.get(db, key)
+        if found is None:
+            self.misses += 1
+            return None
+        response, latency_ms = found
+        self.hits += 1
+        self.saved_ms += latency_ms
+        return response
+
+    async def set(self, db: AsyncSession, key: str, response: Any, latency_ms: float) -> None:
+        size = len(json.dumps(response, ensure_ascii=False).encode())
+        await self.backend.set(db, key, response, size, latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        data = {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_latency_ms": round(self.saved_ms, 3),
+        }
+        data.update(self.backend.stats())
+        return data
+
+
+def _create_backend():
+    options = dict(
+        ttl=config.GENERATION_CACHE_TTL,
+        max_entries=config.GENERATION_CACHE_MAX_ENTRIES,
+        max_bytes=config.GENERATION_CACHE_MAX_BYTES,
+    )
+    if config.GENERATION_CACHE_BACKEND == "db":
+        return DatabaseBackend(**options)
+    return MemoryBackend(**options)
+
+
+# Instancia compartida por todo el proceso.
+generation_cache = GenerationCache(_create_backend())
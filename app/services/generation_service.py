@@ -0,0 +1,128 @@
+"""Generación de texto: contexto, caché de generación y proveedor.
+
+Camino común de ``POST /gemini/generate`` (y de la preparación de
+``/generate/stream``) y de los trabajos ``generate`` de la cola.
+"""
+from typing import List, Optional, Tuple
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core import config
+from ..core.metrics import time_stage
+from ..schemas.gemini import GeminiRequest, GeminiResponse, SystemMessage
+from . import embedding_service, system_message_service
+from .embedding_cache import EmbeddingCache
+from .gemini_client import GeminiClient, extract_text
+from .generation_cache import generation_cache, generation_cache_key
+
+
+class GenerationError(ValueError):
+    """Petición de generación no válida; ``status_code`` es el código HTTP equivalente."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def prepare_generation(
+    request: GeminiRequest,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    db: AsyncSession
+) -> Tuple[Optional[SystemMessage], List[str]]:
+    """Resuelve el mensaje del sistema y el contexto (incluido el recuperado).
+
+    Devuelve ``(db_message, context_texts)``.
+    """
+    context_texts = list(request.context_texts or [])
+    if request.retrieve and not 1 <= request.retrieve.k <= config.VECTOR_SEARCH_MAX_K:
+        raise GenerationError(400, f"k must be between 1 and {config.VECTOR_SEARCH_MAX_K}")
+
+    # Obtener mensaje del sistema si se especifica (desde la caché si está)
+    db_message = None
+    if request.system_message_id:
+        with time_stage("generate", "system_message"):
+            db_message = await system_message_service.get_system_message(db, request.system_message_id)
+        if not db_message:
+            raise GenerationError(404, "System message not found")
+
+    # Recuperar contexto de los embeddings almacenados si se pide
+    if request.retrieve:
+        with time_stage("generate", "retrieve"):
+            context_texts += await embedding_service.retrieve_context(
+                db, client, cache,
+                query=request.retrieve.query,
+                k=request.retrieve.k,
+                max_chars=request.retrieve.max_context_chars,
+                model=request.retrieve.model
+            )
+    return db_message, context_texts
+
+
+async def generate_response(
+    request: GeminiRequest,
+    client: GeminiClient,
+    cache: EmbeddingCache,
+    db: AsyncSession
+) -> GeminiResponse:
+    """Genera la respuesta de ``request``: contexto, caché de generación y proveedor.
+
+    La usan ``/generate`` y los trabajos ``generate`` de la cola. Lanza
+    ``GenerationError`` si la petición no es válida y ``GeminiError`` si falla
+    el proveedor.
+    """
+    use_cache = request.use_cache
+    if use_cache is None:
+        use_cache = config.GENERATION_CACHE_ENABLED and request.temperature == 0
+
+    db_message, context_texts = await prepare_generation(request, client, cache, db)
+    generation_args = dict(
+        prompt=request.prompt,
+        model=request.model,
+        temperature=request.temperature,
+        max_tokens=request.max_tokens,
+        system_message=db_message.content if db_message else None,
+        context_texts=context_texts or None
+    )
+
+    # Busca la respuesta en la caché (clave: prompt completo y parámetros)
+    resp = None
+    cache_key = None
+    if use_cache:
+        with time_stage("generate", "cache_lookup"):
+            cache_key = generation_cache_key(client.build_payload(**generation_args))
+            resp = await generation_cache.get(db, cache_key)
+    cached = resp is not None
+
+    # Genera el texto con el contexto completo
+    if not cached:
+        started = time.perf_counter()
+        with time_stage("generate", "provider"):
+            resp = await client.generate_text(**generation_args, hedge=request.hedge)
+        if cache_key:
+            with time_stage("generate", "cache_store"):
+                await generation_cache.set(db, cache_key, resp, (time.perf_counter() - started) * 1000)
+
+    with time_stage("generate", "response"):
+        # Extraer texto de la respuesta
+        text = extract_text(resp)
+        if text is None:
+            text = str(resp)
+
+        # Construir respuesta con contexto usado
+        include_raw = config.GENERATE_INCLUDE_RAW if request.include_raw is None else request.include_raw
+        include_context = (config.GENERATE_INCLUDE_CONTEXT if request.include_context is None
+                           else request.include_context)
+        response = GeminiResponse(
+            text=text,
+            raw=resp if include_raw else None,
+            used_context=(context_texts or None) if include_context else None,
+            cached=cached
+        )
+
+        if db_message:
+            response.used_system_message = db_message
+
+    return response
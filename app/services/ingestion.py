@@ -0,0 +1,297 @@
+"""Ingesta de documentos en streaming: fragmentación y embeddings por bloques.
+
+El cuerpo subido se lee por trozos y se divide en fragmentos solapados que
+pasan por una cola acotada (``INGEST_QUEUE_SIZE``) a ``INGEST_WORKERS``
+tareas. Cada tarea agrupa ``EMBEDDING_BATCH_SIZE`` fragmentos, obtiene sus
+embeddings por el camino con caché (``get_or_create_embeddings``) y guarda
+el linaje en ``document_chunks``. Si los embeddings van más lentos que la
+subida, la cola se llena y se deja de leer el cuerpo, así que la memoria no
+depende del tamaño del documento.
+
+``start_ingestion`` lanza la ingesta como tarea independiente de la petición
+y vuelve en cuanto se ha leído el cuerpo entero: la petición responde 202 y
+los fragmentos que quedan en cola se terminan en segundo plano. Mientras
+dura, la ingesta renueva el latido del documento; ``reap_stale_documents``
+marca como ``failed`` los que se quedan sin latido (worker caído).
+"""
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import codecs
+import json
+import logging
+import time
+
+from .. import crud_async
+from ..core import config
+from ..core.database import AsyncSessionLocal
+from . import embedding_service
+from .embedding_cache import embedding_cache
+from .embedding_transfer import iter_lines
+from .gemini_client import GeminiClient
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionError(ValueError):
+    """Documento no válido (formato o tamaño)."""
+
+
+def _cut_point(buffer: str, size: int) -> int:
+    """Posición de corte de un fragmento: el último espacio en la segunda mitad, o ``size``."""
+    cut = buffer.rfind(" ", size // 2, size)
+    if cut == -1:
+        cut = buffer.rfind("\n", size // 2, size)
+    return cut if cut != -1 else size
+
+
+async def chunk_text(pieces: AsyncIterable[str], size: int, overlap: int) -> AsyncIterator[Tuple[int, str]]:
+    """Divide un texto recibido por trozos en fragmentos de hasta ``size`` caracteres.
+
+    Cada fragmento empieza ``overlap`` caracteres (aprox., ajustado a un
+    espacio) antes de donde acabó el anterior. Devuelve ``(inicio, texto)``.
+    """
+    overlap = max(0, min(overlap, size // 2 - 1))
+    buffer = ""
+    offset = 0  # Posición de buffer[0] en el texto completo
+    emitted = 0  # Caracteres al principio de buffer que ya están en un fragmento
+    async for piece in pieces:
+        buffer += piece
+        while len(buffer) > size:
+            cut = _cut_point(buffer, size)
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield offset, chunk
+            start = max(cut - overlap, 1)
+            space = buffer.find(" ", start, cut)
+            if overlap and space != -1:
+                start = space + 1
+            buffer = buffer[start:]
+            offset += start
+            emitted = cut - start
+    # Lo que queda, salvo que todo esté ya dentro del solapamiento del anterior.
+    tail = buffer.strip()
+    if tail and buffer[emitted:].strip():
+        yield offset, tail
+
+
+async def _decode(chunks: AsyncIterable[bytes], counter: Dict[str, int]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in chunks:
+        counter["bytes"] += len(chunk)
+        if counter["bytes"] > config.INGEST_MAX_BYTES:
+            raise IngestionError(f"Document too large (max {config.INGEST_MAX_BYTES} bytes)")
+        yield decoder.decode(chunk)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def iter_chunks(body: AsyncIterable[bytes], content_type: str, counter: Dict[str, int],
+                      size: int, overlap: int) -> AsyncIterator[Tuple[int, int, str]]:
+    """Fragmentos ``(segmento, inicio, texto)`` de un cuerpo de texto plano o NDJSON.
+
+    En NDJSON cada línea es un registro ``{"text": ...}`` que se fragmenta por
+    separado (los fragmentos no mezclan registros).
+    """
+    if content_type == "text":
+        async for start, text in chunk_text(_decode(body, counter), size, overlap):
+            yield 0, start, text
+        return
+
+    async def counted(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            counter["bytes"] += len(chunk)
+            if counter["bytes"] > config.INGEST_MAX_BYTES:
+                raise IngestionError(f"Document too large (max {config.INGEST_MAX_BYTES} bytes)")
+            yield chunk
+
+    segment = 0
+    async for line in iter_lines(counted(body)):
+        if not line.strip():
+            continue
+        segment += 1
+        try:
+            text = json.loads(line)["text"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise IngestionError(f"Line {segment}: invalid record ({e})")
+        if not isinstance(text, str):
+            raise IngestionError(f"Line {segment}: 'text' must be a string")
+        async for start, chunk in chunk_text(_single(text), size, overlap):
+            yield segment, start, chunk
+
+
+class IngestionProgress:
+    """Progreso de una ingesta en curso (en memoria, por proceso)."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.produced = 0
+        self.embedded = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "chunks_total": self.produced,
+            "chunks_embedded": self.embedded,
+            "elapsed_s": round(elapsed, 3),
+            "chunks_per_second": round(self.embedded / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+# Ingestas en curso en este proceso: document_id -> progreso.
+active_ingestions: Dict[int, IngestionProgress] = {}
+
+
+async def ingest_document(client: GeminiClient, document_id: int, body: AsyncIterable[bytes],
+                          content_type: str, model: str,
+                          on_uploaded: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """Fragmenta ``body`` y guarda embeddings y linaje del documento ``document_id``.
+
+    ``on_uploaded`` se llama cuando se ha leído el cuerpo entero. Deja el
+    documento en ``done`` (o ``failed`` con el error) y devuelve el progreso final.
+    """
+    batch_size = max(1, config.EMBEDDING_BATCH_SIZE)
+    workers = max(1, config.INGEST_WORKERS)
+    queue: "asyncio.Queue[Optional[Tuple[int, int, int, str]]]" = asyncio.Queue(config.INGEST_QUEUE_SIZE)
+    progress = active_ingestions[document_id] = IngestionProgress()
+    counter = {"bytes": 0}
+
+    async def produce() -> None:
+        position = 0
+        async for segment, start, text in iter_chunks(body, content_type, counter,
+                                                      config.INGEST_CHUNK_SIZE, config.INGEST_CHUNK_OVERLAP):
+            await queue.put((position, segment, start, text))
+            position += 1
+            progress.produced = position
+        if on_uploaded is not None:
+            on_uploaded()
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def store(db, batch: List[Tuple[int, int, int, str]]) -> None:
+        stored = await embedding_service.get_or_create_embeddings(
+            db, client, embedding_cache, texts=[text for _, _, _, text in batch], model=model
+        )
+        await crud_async.add_document_chunks(db, document_id, [
+            {
+                "document_id": document_id,
+                "position": position,
+                "segment": segment,
+                "start_char": start,
+                "text_hash": embedding.text_hash,
+                "embedding_id": embedding.id,
+            }
+            for (position, segment, start, _), embedding in zip(batch, stored)
+        ], chunks_total=progress.produced)
+        progress.embedded += len(batch)
+
+    async def consume() -> None:
+        async with AsyncSessionLocal() as db:
+            batch: List[Tuple[int, int, int, str]] = []
+            while True:
+                item = await queue.get()
+                if item is not None:
+                    batch.append(item)
+                if batch and (item is None or len(batch) >= batch_size or queue.empty()):
+                    await store(db, batch)
+                    batch = []
+                if item is None:
+                    return
+
+    async def heartbeat() -> None:
+        async with AsyncSessionLocal() as db:
+            while True:
+                await asyncio.sleep(config.INGEST_STALE_AFTER / 3)
+                await crud_async.touch_document(db, document_id)
+
+    beat = asyncio.ensure_future(heartbeat())
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(consume()) for _ in range(workers)]
+    error: Optional[BaseException] = None
+    try:
+        # Si una tarea falla se cancelan las demás (productor y consumidores).
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                error = task.exception()
+                break
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    except BaseException as e:
+        error = e
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        beat.cancel()
+        del active_ingestions[document_id]
+        async with AsyncSessionLocal() as db:
+            await crud_async.finish_document(
+                db, document_id,
+                status="failed" if error is not None else "done",
+                error=(str(error) or type(error).__name__) if error is not None else None,
+                bytes_received=counter["bytes"],
+                chunks_total=progress.produced,
+            )
+        if error is not None and not isinstance(error, IngestionError):
+            logger.warning("Ingestion of document %d failed: %s", document_id, error)
+    if error is not None:
+        raise error
+    return progress.as_dict()
+
+
+# Ingestas lanzadas con ``start_ingestion`` (se guarda la referencia para que
+# no las recoja el recolector y para cancelarlas al parar la app).
+_background: Set[asyncio.Task] = set()
+
+
+def _forget(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled():
+        task.exception()  # El error ya queda en el documento (y en el log).
+
+
+async def start_ingestion(client: GeminiClient, document_id: int, body: AsyncIterable[bytes],
+                          content_type: str, model: str) -> None:
+    """Lanza la ingesta en segundo plano y vuelve cuando se ha leído todo ``body``.
+
+    Si la ingesta falla antes (documento no válido, error del proveedor), el
+    error se propaga. Si la petición se corta durante la subida, la lectura
+    del cuerpo falla y el documento queda en ``failed``.
+    """
+    uploaded = asyncio.Event()
+    task = asyncio.ensure_future(ingest_document(client, document_id, body, content_type, model,
+                                                 on_uploaded=uploaded.set))
+    _background.add(task)
+    task.add_done_callback(_forget)
+    waiter = asyncio.ensure_future(uploaded.wait())
+    try:
+        await asyncio.wait([task, waiter], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+    if task.done() and not uploaded.is_set():
+        task.result()
+
+
+async def shutdown() -> None:
+    """Cancela las ingestas en curso (quedan en ``failed``)."""
+    for task in list(_background):
+        task.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+
+
+async def reap_stale_documents() -> None:
+    """Marca periódicamente como ``failed`` los documentos sin latido."""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                failed = await crud_async.fail_stale_documents(db, config.INGEST_STALE_AFTER)
+            if failed:
+                logger.warning("Marked %d interrupted document ingestions as failed", failed)
+        except Exception:
+            logger.exception("Document reaper error")
+        await asyncio.sleep(config.INGEST_STALE_AFTER / 3)
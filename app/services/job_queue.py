@@ -0,0 +1,181 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from .. import crud_async, models
+from ..core import config
+from ..core.database import AsyncSessionLocal
+from ..schemas.gemini import BatchEmbeddingRequest, GeminiRequest
+from . import embedding_service
+from .embedding_cache import embedding_cache
+from .gemini_client import GeminiClient
+from .generation_service import GenerationError, generate_response
+
+logger = logging.getLogger(__name__)
+
+
+class JobError(Exception):
+    """Error definitivo de un trabajo (no se reintenta)."""
+
+
+async def _run_generate(db, client: GeminiClient, payload: dict) -> Dict[str, Any]:
+    # Mismo camino que POST /generate (contexto, caché de generación y proveedor).
+    try:
+        response = await generate_response(GeminiRequest(**payload), client, embedding_cache, db)
+    except GenerationError as e:
+        raise JobError(e.detail)
+    return response.model_dump(mode="json")
+
+
+async def _run_embeddings(db, client: GeminiClient, payload: dict) -> List[Dict[str, Any]]:
+    request = BatchEmbeddingRequest(**payload)
+    stored = await embedding_service.get_or_create_embeddings(
+        db, client, embedding_cache, texts=request.texts, model=request.model
+    )
+    # Solo ids y hashes: los vectores se consultan en GET /gemini/embeddings/{id}.
+    return [{"id": item.id, "text_hash": item.text_hash} for item in stored]
+
+
+HANDLERS = {
+    "generate": _run_generate,
+    "embeddings": _run_embeddings,
+}
+
+
+class JobWorkerPool:
+    """Pool de tareas asyncio que ejecutan los trabajos de la tabla ``jobs``.
+
+    Cada tarea reclama el siguiente trabajo disponible (por prioridad, con un
+    máximo de trabajos simultáneos por usuario), lo ejecuta y guarda el
+    resultado. Los errores del proveedor se reintentan con espera exponencial
+    hasta ``max_attempts``. Varios procesos pueden compartir la misma tabla:
+    mientras un trabajo se ejecuta se renueva su latido, y cada pool vuelve a
+    encolar periódicamente los trabajos sin latido (de procesos que murieron).
+    """
+
+    def __init__(self, client: GeminiClient, workers: Optional[int] = None,
+                 per_owner_limit: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.client = client
+        self.workers = workers or config.JOB_WORKERS
+        self.per_owner_limit = per_owner_limit or config.JOB_PER_OWNER_CONCURRENCY
+        self.poll_interval = poll_interval or config.JOB_POLL_INTERVAL
+        self._tasks: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self) -> None:
+        await self._requeue_stale()
+        self._reaper = asyncio.create_task(self._reap())
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        tasks = self._tasks + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._reaper = None
+
+    async def _requeue_stale(self) -> None:
+        async with AsyncSessionLocal() as db:
+            requeued, failed = await crud_async.requeue_stale_jobs(db, config.JOB_STALE_AFTER)
+        if failed:
+            logger.warning("Failed %d stale jobs that used up their attempts", failed)
+        if requeued:
+            logger.warning("Requeued %d stale jobs", requeued)
+            self._wakeup.set()
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(config.JOB_STALE_AFTER / 3)
+            try:
+                await self._requeue_stale()
+            except Exception:
+                logger.exception("Job reaper error")
+
+    @staticmethod
+    async def _heartbeat(job_id: int) -> None:
+        # Sesión propia: la del trabajo la está usando el handler.
+        async with AsyncSessionLocal() as db:
+            while True:
+                await asyncio.sleep(config.JOB_STALE_AFTER / 3)
+                try:
+                    await crud_async.touch_job(db, job_id)
+                except Exception:
+                    logger.exception("Job heartbeat error")
+                    await db.rollback()
+
+    def notify(self) -> None:
+        """Despierta a las tareas en espera (se llama al encolar un trabajo)."""
+        self._wakeup.set()
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                async with AsyncSessionLocal() as db:
+                    job = await crud_async.claim_next_job(db, self.per_owner_limit)
+                    if job is not None:
+                        await self._execute(db, job)
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker error")
+            # Sin trabajo: espera a un aviso o al siguiente sondeo.
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, db, job: models.Job) -> None:
+        handler = HANDLERS.get(job.kind)
+        job_id = job.id
+        self.running += 1
+        beat = asyncio.ensure_future(self._heartbeat(job_id))
+        try:
+            if handler is None:
+                raise JobError(f"Unknown job kind: {job.kind}")
+            result = await handler(db, self.client, job.payload)
+        except (JobError, ValueError) as e:
+            # Errores de la petición: no tiene sentido reintentar.
+            self.failed += 1
+            job = await self._reload(db, job_id)
+            await crud_async.finish_job(db, job, "failed", error=str(e))
+        except Exception as e:
+            job = await self._reload(db, job_id)
+            if job.attempts < job.max_attempts:
+                self.retried += 1
+                delay = config.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                await crud_async.retry_job(db, job, delay, error=str(e))
+            else:
+                self.failed += 1
+                await crud_async.finish_job(db, job, "failed", error=str(e))
+        else:
+            self.completed += 1
+            await crud_async.finish_job(db, job, "succeeded", result=result)
+        finally:
+            beat.cancel()
+            self.running -= 1
+
+    @staticmethod
+    async def _reload(db, job_id: int) -> models.Job:
+        """Descarta lo que haya dejado a medias el handler y vuelve a leer el trabajo."""
+        await db.rollback()
+        return await crud_async.get_job(db, job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
@@ -0,0 +1,216 @@
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import asyncio
+import time
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Interpreta la cabecera ``Retry-After`` (segundos o fecha HTTP) como segundos."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Cubo de tokens: ``rate`` tokens por segundo con ráfagas de hasta ``capacity``.
+
+    Con ``rate <= 0`` no limita nada.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Detiene la entrega de tokens durante ``seconds`` (por ejemplo, tras un 429)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Espera hasta disponer de ``amount`` tokens. Devuelve los segundos esperados."""
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self.paused_until > now:
+                    delay = self.paused_until - now
+                else:
+                    self._refill()
+                    if self.tokens >= amount:
+                        self.tokens -= amount
+                        return waited
+                    delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class AdaptiveConcurrency:
+    """Límite de peticiones simultáneas ajustado con AIMD.
+
+    Cada respuesta rápida suma ``1/limit`` (≈ +1 por ventana completa de
+    peticiones); un 429 o una latencia por encima del objetivo divide el
+    límite a la mitad. El límite se mueve entre ``minimum`` y ``maximum``.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.active = 0
+        self.waiting = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.active < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.active += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if self.latency_target > 0 and latency > self.latency_target:
+            self.decrease()
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def decrease(self) -> None:
+        # Un solo recorte por intervalo: una ráfaga de 429 cuenta como una señal.
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class RetryBudget:
+    """Presupuesto de reintentos: como mucho ``ratio`` reintentos por petición.
+
+    Cada petición deposita ``ratio`` y cada reintento gasta 1, con un mínimo
+    de ``min_retries`` disponible para que el tráfico bajo pueda reintentar.
+    """
+
+    def __init__(self, ratio: float, min_retries: float = 3.0, maximum: float = 100.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.maximum = maximum
+        self.balance = min_retries
+
+    def deposit(self) -> None:
+        self.balance = min(self.maximum, self.balance + self.ratio)
+
+    def can_spend(self) -> bool:
+        return self.balance >= 1.0
+
+    def try_spend(self) -> bool:
+        if self.can_spend():
+            self.balance -= 1.0
+            return True
+        return False
+
+
+class ProviderLimiter:
+    """Control de tráfico hacia el proveedor para un tipo de llamada.
+
+    Combina un cubo de peticiones/s, un cubo de tokens/min, la concurrencia
+    adaptativa y el presupuesto de reintentos, y lleva las métricas de cola y
+    de limitaciones (429) recibidas.
+    """
+
+    def __init__(self, name: str, requests_per_second: float, tokens_per_minute: float,
+                 initial_concurrency: int, min_concurrency: int, max_concurrency: int,
+                 latency_target: float, retry_budget_ratio: float):
+        self.name = name
+        self.requests = TokenBucket(requests_per_second)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency,
+                                               max_concurrency, latency_target)
+        self.retry_budget = RetryBudget(retry_budget_ratio)
+        self.queued = 0
+        self.throttled = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.queue_wait_total = 0.0
+
+    @asynccontextmanager
+    async def slot(self, tokens: float = 0.0):
+        """Espera turno (peticiones/s, tokens/min y concurrencia) y lo libera al salir."""
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            await self.requests.acquire(1.0)
+            if tokens:
+                await self.tokens.acquire(tokens)
+            await self.concurrency.acquire()
+        finally:
+            self.queued -= 1
+        self.queue_wait_total += time.monotonic() - started
+        try:
+            yield
+        finally:
+            await self.concurrency.release()
+
+    def on_request(self) -> None:
+        """Una petición lógica nueva (sus reintentos y copias no cuentan): deposita presupuesto."""
+        self.retry_budget.deposit()
+
+    def on_success(self, latency: float) -> None:
+        """Latencia de una respuesta 2xx (los errores no deben subir el límite)."""
+        self.concurrency.on_success(latency)
+
+    def on_throttle(self, retry_after: Optional[float]) -> None:
+        """Registra un 429: reduce la concurrencia y pausa el envío si hay ``Retry-After``."""
+        self.throttled += 1
+        self.concurrency.decrease()
+        if retry_after:
+            self.requests.pause(retry_after)
+            self.tokens.pause(retry_after)
+
+    def allow_retry(self) -> bool:
+        if self.retry_budget.try_spend():
+            self.retries += 1
+            return True
+        self.retries_denied += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.concurrency.active,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "queue_wait_total_s": round(self.queue_wait_total, 3),
+        }
@@ -0,0 +1,39 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes idénticas en una sola ("single-flight").
+
+    La primera llamada con una clave lanza la operación como tarea; las que
+    llegan mientras sigue en curso esperan esa misma tarea en lugar de repetir
+    la llamada al proveedor. La tarea se protege con ``asyncio.shield``: si
+    quien la lanzó se cancela (por ejemplo, el cliente HTTP se desconecta) el
+    resto sigue recibiendo el resultado.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Marca la excepción como recuperada aunque nadie espere ya la tarea.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
@@ -0,0 +1,50 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import crud_async
+from ..core import config
+from ..schemas.gemini import SystemMessage
+from ..core.ttl_cache import TTLCache
+
+# Caché compartida por todo el proceso: id -> SystemMessage.
+system_message_cache = TTLCache(
+    maxsize=config.SYSTEM_MESSAGE_CACHE_SIZE,
+    ttl=config.SYSTEM_MESSAGE_CACHE_TTL,
+)
+
+
+async def get_system_message(db: AsyncSession, message_id: int) -> Optional[SystemMessage]:
+    """Devuelve un mensaje del sistema, consultando antes la caché."""
+    cached = system_message_cache.get(message_id)
+    if cached is not None:
+        return cached
+    db_message = await crud_async.get_system_message(db, message_id)
+    if db_message is None:
+        return None
+    message = SystemMessage.model_validate(db_message)
+    system_message_cache.put(message_id, message)
+    return message
+
+
+async def create_system_message(db: AsyncSession, message: SystemMessage):
+    db_message = await crud_async.create_system_message(db, message)
+    system_message_cache.put(db_message.id, SystemMessage.model_validate(db_message))
+    return db_message
+
+
+async def update_system_message(db: AsyncSession, message_id: int, message: SystemMessage):
+    db_message = await crud_async.update_system_message(db, message_id, message)
+    if db_message is None:
+        system_message_cache.pop(message_id)
+    else:
+        system_message_cache.put(message_id, SystemMessage.model_validate(db_message))
+    return db_message
+
+
+async def warm(db: AsyncSession) -> int:
+    """Precarga en la caché hasta ``maxsize`` mensajes. Devuelve cuántos se cargaron."""
+    messages, _ = await crud_async.get_system_messages(db, limit=system_message_cache.maxsize)
+    for db_message in messages:
+        system_message_cache.put(db_message.id, SystemMessage.model_validate(db_message))
+    return len(messages)
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import crud_async
+from ..core import config
+from ..schemas.user import User
+from ..core.ttl_cache import TTLCache
+
+# Caché compartida por todo el proceso: username -> User.
+user_cache = TTLCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    """Devuelve el usuario, consultando la base de datos solo si no está en caché."""
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+    db_user = await crud_async.get_user_by_username(db, username=username)
+    if db_user is None:
+        return None
+    user = User.model_validate(db_user)
+    user_cache.put(username, user)
+    return user
@@ -0,0 +1,242 @@
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple
+import threading
+
+import numpy as np
+
+from ..core import config
+
+try:  # Índice aproximado (ANN) opcional para tablas grandes.
+    import hnswlib
+except ImportError:  # pragma: no cover - dependencia opcional
+    hnswlib = None
+
+
+def _normalize(vector: Any) -> np.ndarray:
+    """Convierte un vector a float32 y lo normaliza (norma L2 = 1)."""
+    array = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(array)
+    if norm > 0:
+        array = array / norm
+    return array
+
+
+class _ModelIndex:
+    """Matriz contigua float32 con los vectores normalizados de un modelo.
+
+    Las filas se añaden al final (creciendo la capacidad al doble cuando hace
+    falta) y al borrar se mueve la última fila al hueco, así que tanto las
+    altas como las bajas son O(dim).
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.size = 0
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.texts: List[str] = []
+        self.positions: Dict[int, int] = {}
+        self.ann = None
+
+    def _grow(self) -> None:
+        capacity = max(1024, self.matrix.shape[0] * 2)
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self.size] = self.ids[:self.size]
+        self.matrix, self.ids = matrix, ids
+
+    def add(self, embedding_id: int, text: str, vector: np.ndarray) -> None:
+        if embedding_id in self.positions:
+            self.remove(embedding_id)
+        if self.size == self.matrix.shape[0]:
+            self._grow()
+        self.matrix[self.size] = vector
+        self.ids[self.size] = embedding_id
+        self.texts.append(text)
+        self.positions[embedding_id] = self.size
+        self.size += 1
+        if self.ann is not None:
+            if self.ann.get_current_count() >= self.ann.get_max_elements():
+                self.ann.resize_index(self.ann.get_max_elements() * 2)
+            self.ann.add_items(vector.reshape(1, -1), np.array([embedding_id]), replace_deleted=True)
+        elif hnswlib is not None and self.size >= config.VECTOR_INDEX_ANN_THRESHOLD:
+            self.build_ann()
+
+    def remove(self, embedding_id: int) -> bool:
+        position = self.positions.pop(embedding_id, None)
+        if position is None:
+            return False
+        last = self.size - 1
+        if position != last:
+            self.matrix[position] = self.matrix[last]
+            self.ids[position] = self.ids[last]
+            self.texts[position] = self.texts[last]
+            self.positions[int(self.ids[position])] = position
+        self.texts.pop()
+        self.size -= 1
+        if self.ann is not None:
+            self.ann.mark_deleted(embedding_id)
+        return True
+
+    def build_ann(self) -> None:
+        """Construye el índice HNSW (coseno) con las filas actuales."""
+        ann = hnswlib.Index(space="cosine", dim=self.dim)
+        ann.init_index(max_elements=max(self.size * 2, 1024), ef_construction=200, M=16,
+                       allow_replace_deleted=True)
+        ann.add_items(self.matrix[:self.size], self.ids[:self.size])
+        ann.set_ef(max(50, config.VECTOR_INDEX_ANN_EF))
+        self.ann = ann
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, str, float]]:
+        k = min(k, self.size)
+        if k <= 0:
+            return []
+        if self.ann is not None:
+            labels, distances = self.ann.knn_query(query.reshape(1, -1), k=k)
+            return [
+                (int(label), self.texts[self.positions[int(label)]], float(1.0 - distance))
+                for label, distance in zip(labels[0], distances[0])
+                if int(label) in self.positions
+            ]
+        # Búsqueda exacta: un único producto matriz-vector sobre filas normalizadas.
+        scores = self.matrix[:self.size] @ query
+        if k < self.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self.size)
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), self.texts[i], float(scores[i])) for i in top]
+
+
+class VectorIndex:
+    """Índice en memoria para búsqueda por similitud coseno sobre ``embeddings``.
+
+    Mantiene un ``_ModelIndex`` por modelo (cada modelo tiene su dimensión).
+    Se carga una vez desde la base de datos y después se actualiza de forma
+    incremental en cada alta o baja, de modo que las búsquedas nunca leen ni
+    decodifican filas de la tabla. Las altas y bajas que llegan mientras se
+    carga se guardan en ``_pending`` y se aplican al terminar la carga (la
+    lectura de la tabla puede no verlas).
+    """
+
+    def __init__(self):
+        self._models: Dict[str, _ModelIndex] = {}
+        self._lock = threading.Lock()
+        self._pending: Optional[List[Tuple[Any, ...]]] = None
+        self.loaded = False
+
+    # El índice en memoria se carga siempre desde la primera fila.
+    resume_after_id = 0
+
+    def load(self, rows: Iterable[Any]) -> None:
+        """Reconstruye el índice a partir de filas ``models.Embedding``."""
+        self._start_load()
+        indexes: Dict[str, _ModelIndex] = {}
+        try:
+            for row in rows:
+                self._add(indexes, row.id, row.text, row.model, row.array)
+        except BaseException:
+            self._abort_load()
+            raise
+        self._replace(indexes)
+
+    async def aload(self, rows: AsyncIterable[Any]) -> None:
+        """Como ``load`` pero leyendo las filas de un iterador asíncrono."""
+        self._start_load()
+        indexes: Dict[str, _ModelIndex] = {}
+        try:
+            async for row in rows:
+                self._add(indexes, row.id, row.text, row.model, row.array)
+        except BaseException:
+            self._abort_load()
+            raise
+        self._replace(indexes)
+
+    def _start_load(self) -> None:
+        with self._lock:
+            if self._pending is None:
+                self._pending = []
+
+    def _abort_load(self) -> None:
+        # La carga no ha terminado: el índice sigue sin cargar y se relee entero.
+        with self._lock:
+            self._pending = None
+
+    def _replace(self, indexes: Dict[str, _ModelIndex]) -> None:
+        with self._lock:
+            for operation in self._pending or ():
+                if operation[0] == "add":
+                    self._add(indexes, *operation[1:])
+                else:
+                    self._remove(indexes, operation[1])
+            self._pending = None
+            self._models = indexes
+            self.loaded = True
+
+    @staticmethod
+    def _add(indexes: Dict[str, _ModelIndex], embedding_id: int, text: str, model: str, vector: Any) -> None:
+        array = _normalize(vector)
+        if array.size == 0:
+            return
+        index = indexes.get(model)
+        if index is None:
+            index = indexes[model] = _ModelIndex(array.size)
+        elif index.dim != array.size:
+            return
+        index.add(embedding_id, text, array)
+
+    @staticmethod
+    def _remove(indexes: Dict[str, _ModelIndex], embedding_id: int) -> None:
+        for index in indexes.values():
+            if index.remove(embedding_id):
+                break
+
+    def invalidate(self) -> None:
+        """Descarta el índice para que se vuelva a cargar en la siguiente búsqueda.
+
+        Tras una importación masiva sale más barato que añadir fila a fila.
+        """
+        with self._lock:
+            self._models = {}
+            self.loaded = False
+
+    def add(self, embedding_id: int, text: str, model: str, vector: Any, text_hash: str = "") -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("add", embedding_id, text, model, vector))
+            elif self.loaded:
+                self._add(self._models, embedding_id, text, model, vector)
+
+    def remove(self, embedding_id: int) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("remove", embedding_id))
+            elif self.loaded:
+                self._remove(self._models, embedding_id)
+
+    def search(self, vector: Any, model: str, k: int = 5) -> List[Tuple[int, str, float]]:
+        """Devuelve ``(id, texto, score)`` de los ``k`` vectores más parecidos."""
+        with self._lock:
+            index = self._models.get(model)
+            query = _normalize(vector)
+            if index is None or index.dim != query.size:
+                return []
+            return index.search(query, k)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            model: {"rows": index.size, "dim": index.dim, "ann": index.ann is not None}
+            for model, index in self._models.items()
+        }
+
+
+def _create_index():
+    """``VectorIndex`` en memoria o, con ``VECTOR_STORE_DIR``, el almacén compartido en disco."""
+    if config.VECTOR_STORE_DIR:
+        from .vector_store import MmapVectorIndex
+        return MmapVectorIndex(config.VECTOR_STORE_DIR)
+    return VectorIndex()
+
+
+# Instancia compartida por todo el proceso.
+vector_index = _create_index()
@@ -0,0 +1,372 @@
+"""Almacén vectorial en disco, mapeado en memoria y compartido entre workers.
+
+Con ``VECTOR_STORE_DIR`` configurado, ``vector_index`` usa este almacén en
+lugar de construir una matriz por proceso. Estructura del directorio::
+
+    state.json            {"synced_id": N}: todas las filas con id <= N están incluidas
+    deleted.i64           ids borrados (tombstones), añadidos al final
+    lock                  cerrojo (flock) para los que escriben
+    <modelo>/meta.json    {"model", "dim", "generation"}
+    <modelo>/gen-<g>/vectors.f32   matriz float32 (filas, dim) normalizada
+    <modelo>/gen-<g>/rows.bin      por fila: id (int64) y text_hash (64 bytes)
+
+Los ficheros solo crecen (registro de altas y bajas): cada alta añade el
+vector y después su fila en ``rows.bin``, que es la que marca la fila como
+completa; antes de cada alta se recortan los restos de una escritura a medias. Los lectores no usan el cerrojo: mapean los ficheros en modo
+lectura y los vuelven a mapear cuando crecen, de modo que todos los workers
+comparten las mismas páginas a través de la caché del sistema operativo y un
+worker nuevo arranca sin leer la tabla entera. Al arrancar solo se añaden las
+filas con ``id > synced_id`` (las insertadas por caminos que no pasan por el
+índice, como la importación masiva).
+
+Es una caché reconstruible: si se borra el directorio se vuelve a generar
+desde la tabla ``embeddings``. ``python -m app.services.vector_store compact``
+reescribe los ficheros sin las filas borradas.
+"""
+from contextlib import contextmanager
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from .vector_index import _normalize
+
+ROW_DTYPE = np.dtype([("id", "<i8"), ("hash", "S64")])
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """Escritura atómica (fichero temporal + ``os.replace``)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str, default: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return dict(default)
+
+
+def _model_dirname(model: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", model)[:48]
+    return f"{safe}-{hashlib.sha1(model.encode()).hexdigest()[:8]}"
+
+
+class _ModelStore:
+    """Ficheros de un modelo y su vista mapeada en memoria en este proceso."""
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self.meta_path = os.path.join(path, "meta.json")
+        self.meta: Optional[Dict[str, Any]] = None
+        self._meta_stat: Optional[Tuple[int, float]] = None
+        self._rows_size = -1
+        self.vectors: Optional[np.ndarray] = None
+        self.rows: Optional[np.ndarray] = None
+
+    # --- Lectura ---
+
+    def _refresh_meta(self) -> bool:
+        """Relee ``meta.json`` si ha cambiado (por ejemplo, tras una compactación)."""
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return False
+        key = (stat.st_ino, stat.st_mtime)
+        if key != self._meta_stat:
+            self.meta = _read_json(self.meta_path, {})
+            self._meta_stat = key
+            self._rows_size = -1
+        return True
+
+    def _files(self) -> Tuple[str, str]:
+        generation = os.path.join(self.path, f"gen-{self.meta['generation']}")
+        return os.path.join(generation, "vectors.f32"), os.path.join(generation, "rows.bin")
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """``(vectores, filas)`` mapeados, volviendo a mapear si los ficheros han crecido."""
+        if not self._refresh_meta():
+            return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=ROW_DTYPE)
+        vectors_path, rows_path = self._files()
+        try:
+            size = os.path.getsize(rows_path)
+        except FileNotFoundError:
+            size = 0
+        if size != self._rows_size:
+            count = size // ROW_DTYPE.itemsize
+            dim = self.meta["dim"]
+            if count:
+                self.rows = np.memmap(rows_path, dtype=ROW_DTYPE, mode="r", shape=(count,))
+                self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+            else:
+                self.rows = np.empty(0, dtype=ROW_DTYPE)
+                self.vectors = np.empty((0, dim), dtype=np.float32)
+            self._rows_size = size
+        return self.vectors, self.rows
+
+    # --- Escritura (con el cerrojo tomado) ---
+
+    def append(self, ids: List[int], hashes: List[str], vectors: np.ndarray) -> None:
+        self._refresh_meta()
+        if self.meta is None:
+            os.makedirs(self.path, exist_ok=True)
+            os.makedirs(os.path.join(self.path, "gen-0"), exist_ok=True)
+            _write_json(self.meta_path, {"model": self.model, "dim": int(vectors.shape[1]), "generation": 0})
+            self._refresh_meta()
+        if vectors.shape[1] != self.meta["dim"]:
+            return
+        rows = np.empty(len(ids), dtype=ROW_DTYPE)
+        rows["id"] = ids
+        rows["hash"] = [text_hash.encode() for text_hash in hashes]
+        vectors_path, rows_path = self._files()
+        # Si una escritura anterior quedó a medias (caída, disco lleno), los
+        # ficheros pueden tener restos tras la última fila completa: se recortan
+        # para que el vector i siga correspondiendo a la fila i.
+        count = self._complete_rows(rows_path)
+        self._truncate(rows_path, count * ROW_DTYPE.itemsize)
+        self._truncate(vectors_path, count * self.meta["dim"] * 4)
+        # Primero el vector: una fila solo cuenta cuando su entrada de rows.bin está escrita.
+        with open(vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        with open(rows_path, "ab") as f:
+            f.write(rows.tobytes())
+
+    @staticmethod
+    def _complete_rows(rows_path: str) -> int:
+        try:
+            return os.path.getsize(rows_path) // ROW_DTYPE.itemsize
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _truncate(path: str, size: int) -> None:
+        try:
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)
+        except FileNotFoundError:
+            pass
+
+    def compact(self, deleted: np.ndarray) -> int:
+        """Reescribe las filas vivas en una generación nueva. Devuelve las filas eliminadas."""
+        vectors, rows = self.view()
+        keep = ~np.isin(rows["id"], deleted) if len(rows) else np.zeros(0, dtype=bool)
+        # Quita también los ids repetidos (se conserva la última aparición).
+        _, last = np.unique(rows["id"][::-1], return_index=True)
+        unique = np.zeros(len(rows), dtype=bool)
+        unique[len(rows) - 1 - last] = True
+        keep &= unique
+        old_generation = self.meta["generation"]
+        generation = old_generation + 1
+        target = os.path.join(self.path, f"gen-{generation}")
+        os.makedirs(target, exist_ok=True)
+        with open(os.path.join(target, "vectors.f32"), "wb") as f:
+            f.write(np.ascontiguousarray(vectors[keep]).tobytes())
+        with open(os.path.join(target, "rows.bin"), "wb") as f:
+            f.write(rows[keep].tobytes())
+        _write_json(self.meta_path, {**self.meta, "generation": generation})
+        # Los procesos que aún tengan mapeada la generación anterior la siguen
+        # viendo hasta que vuelvan a mapear (los ficheros borrados siguen vivos).
+        shutil.rmtree(os.path.join(self.path, f"gen-{old_generation}"), ignore_errors=True)
+        self._refresh_meta()
+        return int(len(rows) - keep.sum())
+
+
+class MmapVectorIndex:
+    """Índice vectorial sobre ``VECTOR_STORE_DIR`` con la interfaz de ``VectorIndex``.
+
+    La búsqueda es exacta (producto matriz-vector sobre la matriz mapeada).
+    ``search`` devuelve el texto como ``None``: quien busca lo lee de la tabla
+    solo para los ``k`` resultados.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.state_path = os.path.join(path, "state.json")
+        self.deleted_path = os.path.join(path, "deleted.i64")
+        self.lock_path = os.path.join(path, "lock")
+        self._models: Dict[str, _ModelStore] = {}
+        self._deleted_size = -1
+        self._deleted = np.empty(0, dtype=np.int64)
+        self._masks: Dict[str, Tuple[Tuple[int, int, int], np.ndarray]] = {}
+        self.loaded = False
+
+    @property
+    def resume_after_id(self) -> int:
+        """Id a partir del cual hay que leer la tabla para ponerse al día."""
+        return int(_read_json(self.state_path, {"synced_id": 0})["synced_id"])
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _store(self, model: str) -> _ModelStore:
+        store = self._models.get(model)
+        if store is None:
+            store = self._models[model] = _ModelStore(os.path.join(self.path, _model_dirname(model)), model)
+        return store
+
+    def _deleted_ids(self) -> np.ndarray:
+        try:
+            size = os.path.getsize(self.deleted_path)
+        except FileNotFoundError:
+            size = 0
+        if size != self._deleted_size:
+            self._deleted = (np.fromfile(self.deleted_path, dtype="<i8", count=size // 8)
+                             if size else np.empty(0, dtype=np.int64))
+            self._deleted_size = size
+        return self._deleted
+
+    # --- Carga (puesta al día desde la tabla) ---
+
+    def _append_batch(self, batch: List[Any]) -> int:
+        """Añade filas ``models.Embedding`` que aún no estén en el almacén."""
+        with self._locked():
+            synced_id = self.resume_after_id
+            by_model: Dict[str, List[Any]] = {}
+            for row in batch:
+                if row.id > synced_id:
+                    by_model.setdefault(row.model, []).append(row)
+            for model, rows in by_model.items():
+                store = self._store(model)
+                _, existing = store.view()
+                # Ids añadidos ya por ``add`` (posteriores a synced_id).
+                recent = set(existing["id"][existing["id"] > synced_id].tolist()) if len(existing) else set()
+                pairs = [(row, _normalize(row.array)) for row in rows if row.id not in recent]
+                pairs = [(row, vector) for row, vector in pairs if vector.size]
+                if pairs:
+                    # Filas de otra dimensión no caben en la matriz del modelo: se omiten.
+                    dim = store.meta["dim"] if store.meta else pairs[0][1].size
+                    pairs = [(row, vector) for row, vector in pairs if vector.size == dim]
+                    store.append([row.id for row, _ in pairs], [row.text_hash for row, _ in pairs],
+                                 np.stack([vector for _, vector in pairs]))
+            if batch:
+                _write_json(self.state_path, {"synced_id": max(synced_id, max(row.id for row in batch))})
+        return len(batch)
+
+    def load(self, rows: Iterable[Any], batch_size: int = 1000) -> None:
+        """Añade las filas (en orden de id) que falten y marca el índice como cargado."""
+        batch: List[Any] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._append_batch(batch)
+                batch = []
+        self._append_batch(batch)
+        self.loaded = True
+
+    async def aload(self, rows: AsyncIterable[Any], batch_size: int = 1000) -> None:
+        """Como ``load`` pero leyendo de un iterador asíncrono.
+
+        El cerrojo se toma por bloques, así que otros workers pueden seguir
+        añadiendo mientras uno se pone al día.
+        """
+        batch: List[Any] = []
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._append_batch(batch)
+                batch = []
+        self._append_batch(batch)
+        self.loaded = True
+
+    def invalidate(self) -> None:
+        """La siguiente búsqueda se pondrá al día con las filas nuevas de la tabla."""
+        self.loaded = False
+
+    # --- Altas, bajas y búsqueda ---
+
+    def add(self, embedding_id: int, text: str, model: str, vector: Any, text_hash: str = "") -> None:
+        array = _normalize(vector)
+        if array.size == 0:
+            return
+        with self._locked():
+            self._store(model).append([embedding_id], [text_hash], array.reshape(1, -1))
+
+    def remove(self, embedding_id: int) -> None:
+        with self._locked():
+            with open(self.deleted_path, "ab") as f:
+                f.write(np.array([embedding_id], dtype="<i8").tobytes())
+
+    def _live_mask(self, model: str, rows: np.ndarray) -> np.ndarray:
+        """Filas no borradas (se recalcula solo cuando cambian las filas o los borrados)."""
+        deleted = self._deleted_ids()
+        key = (self._store(model).meta["generation"], len(rows), len(deleted))
+        cached = self._masks.get(model)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        mask = ~np.isin(rows["id"], deleted) if len(deleted) else np.ones(len(rows), dtype=bool)
+        self._masks[model] = (key, mask)
+        return mask
+
+    def search(self, vector: Any, model: str, k: int = 5) -> List[Tuple[int, Optional[str], float]]:
+        """Devuelve ``(id, None, score)`` de los ``k`` vectores más parecidos."""
+        vectors, rows = self._store(model).view()
+        query = _normalize(vector)
+        if not len(rows) or vectors.shape[1] != query.size:
+            return []
+        scores = np.asarray(vectors @ query)
+        scores[~self._live_mask(model, rows)] = -np.inf
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows["id"][i]), None, float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def _model_metas(self) -> Iterable[Dict[str, Any]]:
+        """``meta.json`` de cada modelo (los subdirectorios; el resto son ficheros de estado)."""
+        for entry in sorted(os.scandir(self.path), key=lambda entry: entry.name):
+            if entry.is_dir():
+                meta = _read_json(os.path.join(entry.path, "meta.json"), {})
+                if meta:
+                    yield meta
+
+    def compact(self) -> Dict[str, int]:
+        """Reescribe cada modelo sin las filas borradas y vacía los tombstones."""
+        with self._locked():
+            deleted = self._deleted_ids()
+            removed = {}
+            for meta in self._model_metas():
+                removed[meta["model"]] = self._store(meta["model"]).compact(deleted)
+            open(self.deleted_path, "wb").close()
+            self._masks.clear()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        data = {}
+        for meta in self._model_metas():
+            _, rows = self._store(meta["model"]).view()
+            data[meta["model"]] = {"rows": int(len(rows)), "dim": meta["dim"], "ann": False,
+                                   "generation": meta["generation"], "mmap": True}
+        return data
+
+
+def main() -> None:
+    import argparse
+
+    from ..core import config
+
+    parser = argparse.ArgumentParser(description="Mantenimiento del almacén vectorial en disco")
+    parser.add_argument("command", choices=["compact", "stats"])
+    args = parser.parse_args()
+    if not config.VECTOR_STORE_DIR:
+        raise SystemExit("VECTOR_STORE_DIR is not set")
+    index = MmapVectorIndex(config.VECTOR_STORE_DIR)
+    print(index.compact() if args.command == "compact" else index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks de carga y micro-benchmarks (ver ``benchmarks/README.md``)."""
@@ -0,0 +1,226 @@
+"""Generador de carga para la API: latencias p50/p95/p99 y RPS por endpoint.
+
+Con el servidor arrancado contra el proveedor simulado (``mock_provider``) y
+una base de datos preparada con ``fixtures``::
+
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 \\
+        --scenarios login,generate,embeddings,search --concurrency 32 --duration 30 \\
+        --output results.json --compare baseline.json
+
+Cada escenario se ejecuta por separado con ``--concurrency`` clientes en bucle
+cerrado durante ``--duration`` segundos (o ``--requests`` peticiones). El
+resultado se escribe en JSON para poder compararlo con ejecuciones anteriores.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import sys
+import time
+
+import httpx
+
+from .fixtures import BENCH_PASSWORD, BENCH_USERNAME
+
+Scenario = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil por interpolación lineal sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    total = len(values)
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "requests": total,
+        "ok": ok,
+        "errors": total - ok,
+        "statuses": statuses,
+        "duration_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def build_scenarios(run_id: str, cache_hits: bool) -> Dict[str, Scenario]:
+    """Peticiones de cada escenario; ``i`` numera la petición para variar el cuerpo.
+
+    Con ``cache_hits`` se repite siempre la misma entrada (y en ``generate`` se
+    usa temperature=0) para medir el camino de caché.
+    """
+
+    def key(i: int) -> str:
+        return "fixed" if cache_hits else f"{run_id}-{i}"
+
+    async def login(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/auth/login", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+
+    async def generate(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/gemini/generate", json={
+            "prompt": f"Resume la auditoría {key(i)}",
+            "temperature": 0 if cache_hits else 0.2,
+            "max_tokens": 64,
+        })
+
+    async def generate_stream(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        # Se lee la respuesta entera: la latencia incluye todos los fragmentos.
+        async with client.stream("POST", "/gemini/generate/stream", json={
+            "prompt": f"Resume la auditoría {key(i)}", "max_tokens": 64,
+        }) as resp:
+            await resp.aread()
+            return resp
+
+    async def embeddings(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/gemini/embeddings", json={"text": f"Texto de prueba {key(i)}"})
+
+    async def embeddings_batch(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/gemini/embeddings/batch", json={
+            "texts": [f"Texto de prueba {key(i)}-{n}" for n in range(32)],
+        })
+
+    async def search(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/gemini/embeddings/search", json={
+            "query": f"Documento de prueba número {i % 1000}", "k": 10,
+        })
+
+    async def list_embeddings(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get("/gemini/embeddings", params={"limit": 100, "fields": "summary"})
+
+    return {
+        "login": login,
+        "generate": generate,
+        "generate_stream": generate_stream,
+        "embeddings": embeddings,
+        "embeddings_batch": embeddings_batch,
+        "search": search,
+        "list_embeddings": list_embeddings,
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int,
+                       duration: float, max_requests: Optional[int]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            if max_requests is not None and i >= max_requests:
+                return
+            started = time.perf_counter()
+            try:
+                resp = await scenario(client, i)
+                status = str(resp.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def get_token(client: httpx.AsyncClient) -> str:
+    resp = await client.post("/auth/login", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def run(base_url: str, scenarios: List[str], concurrency: int, duration: float,
+              max_requests: Optional[int], warmup: int, cache_hits: bool) -> Dict[str, Any]:
+    available = build_scenarios(run_id=str(int(time.time())), cache_hits=cache_hits)
+    unknown = [name for name in scenarios if name not in available]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(available)})")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        client.headers["Authorization"] = f"Bearer {await get_token(client)}"
+        results: Dict[str, Any] = {}
+        for name in scenarios:
+            scenario = available[name]
+            for i in range(warmup):
+                await scenario(client, -1 - i)
+            results[name] = await run_scenario(client, scenario, concurrency, duration, max_requests)
+            print(f"{name:18s} {format_row(results[name])}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "base_url": base_url,
+            "concurrency": concurrency,
+            "duration_s": duration,
+            "max_requests": max_requests,
+            "cache_hits": cache_hits,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def format_row(result: Dict[str, Any]) -> str:
+    return (f"rps={result['rps']:>9.2f}  p50={result['p50_ms']:>8.2f}ms  "
+            f"p95={result['p95_ms']:>8.2f}ms  p99={result['p99_ms']:>8.2f}ms  errors={result['errors']}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Variación relativa (en %) de RPS y percentiles respecto a una ejecución anterior."""
+    deltas: Dict[str, Dict[str, float]] = {}
+    for name, result in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        deltas[name] = {
+            metric: round((result[metric] - previous[metric]) / previous[metric] * 100, 2)
+            for metric in ("rps", "p50_ms", "p95_ms", "p99_ms")
+            if previous.get(metric)
+        }
+    return deltas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default="login,generate,embeddings,search")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos por escenario")
+    parser.add_argument("--requests", type=int, default=None, help="Máximo de peticiones por escenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Peticiones previas no medidas")
+    parser.add_argument("--cache-hits", action="store_true", help="Repite la misma entrada (camino de caché)")
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    parser.add_argument("--compare", help="Resultados JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(
+        args.base_url, [name.strip() for name in args.scenarios.split(",") if name.strip()],
+        args.concurrency, args.duration, args.requests, args.warmup, args.cache_hits,
+    ))
+    if args.compare:
+        with open(args.compare) as f:
+            report["compare"] = {"baseline": args.compare, "delta_pct": compare(report, json.load(f))}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmarks de las piezas del camino caliente (sin red ni base de datos).
+
+    python -m benchmarks.micro [--dim 768] [--rows 20000] [--output micro.json]
+
+Mide codificación/decodificación de vectores, búsqueda en el índice vectorial,
+hash de textos y verificación de tokens JWT (con y sin la caché).
+"""
+from typing import Any, Callable, Dict
+import argparse
+import json
+import time
+
+import numpy as np
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.5) -> Dict[str, float]:
+    """Ejecuta ``func`` en bucle durante al menos ``min_time`` segundos."""
+    func()
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+    return {"runs": runs, "us_per_op": round(elapsed / runs * 1e6, 3), "ops_per_s": round(runs / elapsed, 1)}
+
+
+def run(dim: int, rows: int) -> Dict[str, Dict[str, float]]:
+    from fastapi import HTTPException
+
+    from app.core import security
+    from app.core.vectors import decode_vector, encode_vector
+    from app.services.embedding_cache import compute_text_hash
+    from app.services.vector_index import VectorIndex
+
+    rng = np.random.default_rng(0)
+    vector = rng.standard_normal(dim).astype(np.float32)
+    values = vector.tolist()
+    blob = encode_vector(values)[0]
+
+    index = VectorIndex()
+    index._replace({})
+    for i, row in enumerate(rng.standard_normal((rows, dim), dtype=np.float32)):
+        index.add(i, f"texto {i}", "bench", row)
+
+    token = security.create_access_token({"sub": "bench"})
+    error = HTTPException(status_code=401)
+
+    def verify_uncached():
+        security.token_cache.clear()
+        security.verify_token(token, error)
+
+    return {
+        "encode_vector_float32": measure(lambda: encode_vector(values)),
+        "decode_vector_float32": measure(lambda: decode_vector(blob)),
+        "compute_text_hash": measure(lambda: compute_text_hash("Documento de prueba " * 20, "bench")),
+        f"vector_search_k10_{rows}x{dim}": measure(lambda: index.search(vector, "bench", k=10)),
+        "verify_token_uncached": measure(verify_uncached),
+        "verify_token_cached": measure(lambda: security.verify_token(token, error)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    args = parser.parse_args()
+    output = json.dumps({"dim": args.dim, "rows": args.rows, "results": run(args.dim, args.rows)}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Proveedor Gemini simulado para benchmarks y pruebas locales.
+
+Implementa los dos endpoints que usa ``GeminiClient`` con latencia, errores,
+limitaciones (429) y streaming configurables por variables de entorno::
+
+    MOCK_LATENCY_MS=200 MOCK_THROTTLE_RATE=0.05 \\
+        uvicorn benchmarks.mock_provider:app --port 9000
+
+    export GEMINI_ENDPOINT=http://127.0.0.1:9000/v1/generate
+    export GEMINI_EMBED_ENDPOINT=http://127.0.0.1:9000/v1/embeddings
+    export GEMINI_API_KEY=mock
+
+Los embeddings son deterministas (dependen solo del texto), así que las
+cachés y la deduplicación se comportan igual que con el proveedor real.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import random
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Latencia base y variación aleatoria (±) de cada respuesta, en milisegundos.
+LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "100"))
+JITTER_MS = float(os.getenv("MOCK_JITTER_MS", "20"))
+# Latencia adicional por texto en las peticiones de embeddings en lote.
+EMBED_LATENCY_PER_TEXT_MS = float(os.getenv("MOCK_EMBED_LATENCY_PER_TEXT_MS", "1"))
+# Proporción de respuestas 500 y 429.
+ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+THROTTLE_RATE = float(os.getenv("MOCK_THROTTLE_RATE", "0"))
+# Valor de la cabecera Retry-After de los 429 (vacío para no enviarla).
+RETRY_AFTER = os.getenv("MOCK_RETRY_AFTER", "1")
+# Dimensión de los embeddings generados.
+EMBED_DIM = int(os.getenv("MOCK_EMBED_DIM", "768"))
+# Número de fragmentos y pausa entre ellos en las respuestas en streaming.
+STREAM_CHUNKS = int(os.getenv("MOCK_STREAM_CHUNKS", "20"))
+CHUNK_DELAY_MS = float(os.getenv("MOCK_CHUNK_DELAY_MS", "10"))
+
+app = FastAPI(title="Mock Gemini provider")
+counters: Dict[str, int] = {"generate": 0, "embeddings": 0, "throttled": 0, "errors": 0}
+
+
+async def _delay(extra_ms: float = 0.0) -> None:
+    jitter = random.uniform(-JITTER_MS, JITTER_MS)
+    await asyncio.sleep(max(0.0, LATENCY_MS + jitter + extra_ms) / 1000)
+
+
+def _failure() -> Optional[JSONResponse]:
+    """Respuesta de error simulada, o ``None`` si esta petición debe ir bien."""
+    roll = random.random()
+    if roll < THROTTLE_RATE:
+        counters["throttled"] += 1
+        headers = {"Retry-After": RETRY_AFTER} if RETRY_AFTER else {}
+        return JSONResponse({"error": "rate limited"}, status_code=429, headers=headers)
+    if roll < THROTTLE_RATE + ERROR_RATE:
+        counters["errors"] += 1
+        return JSONResponse({"error": "internal error"}, status_code=500)
+    return None
+
+
+def _embedding(text: str, model: str) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(f"{model}\n{text}".encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _usage(prompt: str, completion: str) -> Dict[str, int]:
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(completion) // 4)
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": completion_tokens,
+        "totalTokenCount": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/v1/generate")
+async def generate(request: Request):
+    payload: Dict[str, Any] = await request.json()
+    counters["generate"] += 1
+    await _delay()
+    failure = _failure()
+    if failure is not None:
+        return failure
+
+    prompt = payload.get("prompt", "")
+    words = [f"token{i}" for i in range(min(int(payload.get("max_output_tokens", 64)), 64))]
+    if not payload.get("stream"):
+        text = " ".join(words)
+        return {"text": text, "model": payload.get("model"), "usageMetadata": _usage(prompt, text)}
+
+    async def chunks():
+        per_chunk = max(1, len(words) // max(STREAM_CHUNKS, 1))
+        for start in range(0, len(words), per_chunk):
+            yield f"data: {json.dumps({'text': ' '.join(words[start:start + per_chunk]) + ' '})}\n\n"
+            await asyncio.sleep(CHUNK_DELAY_MS / 1000)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    payload: Dict[str, Any] = await request.json()
+    counters["embeddings"] += 1
+    model = payload.get("model", "")
+    texts = payload.get("texts")
+    await _delay(EMBED_LATENCY_PER_TEXT_MS * len(texts) if texts else 0.0)
+    failure = _failure()
+    if failure is not None:
+        return failure
+    if texts is not None:
+        return {"embeddings": [_embedding(text, model) for text in texts]}
+    return {"embedding": _embedding(payload.get("text", ""), model)}
+
+
+@app.get("/stats")
+async def stats():
+    return counters
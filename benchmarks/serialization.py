@@ -0,0 +1,91 @@
+"""Coste de serialización por respuesta: antes (Pydantic + json) y después (orjson, base64).
+
+    python -m benchmarks.serialization [--dim 768] [--batch 32] [--output serialization.json]
+
+Para cada carga mide el tiempo por respuesta y los bytes generados:
+
+* ``embedding_*``: un ``StoredEmbedding`` (y un lote de ``--batch``) por el
+  camino anterior (validación Pydantic + ``json``, como ``JSONResponse``) y por
+  el actual (``embedding_payload`` + ``FastJSONResponse``), en floats y en base64.
+* ``generate_*``: ``GeminiResponse`` con y sin ``raw``/``used_context``.
+* ``compress_*``: gzip y zstd (si está instalado) sobre el lote de embeddings.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+import argparse
+import json
+
+import numpy as np
+
+from .micro import measure
+
+
+def _stdlib(content: Any) -> bytes:
+    # Lo mismo que hace starlette.responses.JSONResponse.render.
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _case(func: Callable[[], bytes]) -> Dict[str, float]:
+    result = measure(func)
+    result["bytes"] = len(func())
+    return result
+
+
+def run(dim: int, batch: int) -> Dict[str, Dict[str, float]]:
+    from app.core import compression
+    from app.core.serialization import dumps, embedding_payload
+    from app.schemas.gemini import GeminiResponse, StoredEmbedding
+
+    rng = np.random.default_rng(0)
+    now = datetime.now(timezone.utc)
+    stored = [
+        StoredEmbedding(id=i, embedding=vector.tolist(), model="bench", text=f"Texto de prueba {i} " * 10,
+                        text_hash=f"{i:064x}", created_at=now)
+        for i, vector in enumerate(rng.standard_normal((batch, dim), dtype=np.float32))
+    ]
+    raw = {"candidates": [{"content": {"parts": [{"text": "Respuesta " * 200}]}}],
+           "choices": [{"text": "Respuesta " * 200}], "usage": {"prompt_tokens": 900, "completion_tokens": 400}}
+    context = [f"Fragmento de contexto {i} " * 40 for i in range(8)]
+    full_response = GeminiResponse(text="Respuesta " * 200, raw=raw, used_context=context)
+    lean_response = GeminiResponse(text="Respuesta " * 200)
+
+    def before_one(item: StoredEmbedding) -> Dict[str, Any]:
+        # Camino anterior de FastAPI con response_model: vuelca el modelo, lo
+        # valida de nuevo contra el response_model y lo vuelca a tipos JSON.
+        return StoredEmbedding.model_validate(item.model_dump()).model_dump(mode="json")
+
+    batch_payload = dumps([embedding_payload(item) for item in stored])
+    results = {
+        "embedding_before_pydantic_json": _case(lambda: _stdlib(before_one(stored[0]))),
+        "embedding_after_orjson": _case(lambda: dumps(embedding_payload(stored[0]))),
+        "embedding_after_base64": _case(lambda: dumps(embedding_payload(stored[0], "base64"))),
+        f"embedding_batch{batch}_before_pydantic_json": _case(lambda: _stdlib([before_one(item) for item in stored])),
+        f"embedding_batch{batch}_after_orjson": _case(lambda: dumps([embedding_payload(item) for item in stored])),
+        f"embedding_batch{batch}_after_base64": _case(
+            lambda: dumps([embedding_payload(item, "base64") for item in stored])),
+        "generate_before_full_json": _case(lambda: _stdlib(full_response.model_dump(mode="json"))),
+        "generate_after_full_orjson": _case(lambda: dumps(full_response.model_dump(mode="json"))),
+        "generate_after_lean_orjson": _case(lambda: dumps(lean_response.model_dump(mode="json"))),
+        f"compress_batch{batch}_gzip": _case(lambda: compression.compress(batch_payload, "gzip")),
+    }
+    if compression.zstandard is not None:
+        results[f"compress_batch{batch}_zstd"] = _case(lambda: compression.compress(batch_payload, "zstd"))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    args = parser.parse_args()
+    output = json.dumps({"dim": args.dim, "batch": args.batch, "results": run(args.dim, args.batch)}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Tiempo de arranque: importación de ``app.main`` y tiempo hasta la primera respuesta.
+
+    python -m benchmarks.startup [--runs 5] [--importtime] [--output startup.json]
+        [--max-import-ms 800] [--max-first-request-ms 2500]
+
+Cada medida se hace en un proceso nuevo (como un worker recién lanzado).
+La primera respuesta es ``GET /`` contra un ``uvicorn`` arrancado por el
+propio script, así que incluye el lifespan (precarga de mensajes del sistema,
+workers de trabajos...) con la configuración del entorno. Con ``--max-*`` el
+script termina con error si la mediana supera el límite, para usarlo como
+comprobación de regresión.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def measure_import() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 15) -> List[Dict[str, Any]]:
+    """Módulos con mayor tiempo acumulado según ``python -X importtime``."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         check=True, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        # Formato: "import time: <self us> | <cumulative us> | <módulo>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        rows.append({"module": parts[2].strip(), "self_ms": int(parts[0]) / 1000,
+                     "cumulative_ms": int(parts[1]) / 1000})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(timeout: float = 30.0) -> float:
+    """Segundos desde lanzar ``uvicorn`` hasta recibir la primera respuesta 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise SystemExit(f"uvicorn exited with code {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.005)
+        raise SystemExit(f"No response from uvicorn after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "runs": len(values),
+        "median_ms": round(statistics.median(values) * 1000, 2),
+        "min_ms": round(min(values) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def run(runs: int, importtime: bool) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "import": summarize([measure_import() for _ in range(runs)]),
+        "first_request": summarize([measure_first_request() for _ in range(runs)]),
+    }
+    if importtime:
+        report["slowest_imports"] = slowest_imports()
+    return report
+
+
+def check(report: Dict[str, Any], max_import_ms: Optional[float], max_first_request_ms: Optional[float]) -> List[str]:
+    """Límites superados (lista vacía si todo está dentro)."""
+    failures = []
+    if max_import_ms is not None and report["import"]["median_ms"] > max_import_ms:
+        failures.append(f"import median {report['import']['median_ms']}ms > {max_import_ms}ms")
+    if max_first_request_ms is not None and report["first_request"]["median_ms"] > max_first_request_ms:
+        failures.append(f"first request median {report['first_request']['median_ms']}ms > {max_first_request_ms}ms")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Incluye los módulos más lentos de importar")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-request-ms", type=float, default=None)
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    args = parser.parse_args()
+    report = run(args.runs, args.importtime)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    failures = check(report, args.max_import_ms, args.max_first_request_ms)
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# La app lee la configuración al importarse: los tests usan una base de datos
+# SQLite temporal y nunca el PostgreSQL por defecto.
+_tmpdir = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
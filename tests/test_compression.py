@@ -0,0 +1,72 @@
+import asyncio
+import gzip
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+
+
+def _app(body_parts, content_type=b"application/json", extra_headers=()):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type), *extra_headers]
+        if len(body_parts) == 1:
+            headers.append((b"content-length", str(len(body_parts[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, part in enumerate(body_parts):
+            await send({"type": "http.response.body", "body": part, "more_body": i < len(body_parts) - 1})
+    return app
+
+
+def _call(app, accept_encoding="gzip", minimum_size=100):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size)(scope, receive, send))
+    headers = dict(messages[0]["headers"])
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return headers, body, messages
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") in ("gzip", "zstd")
+
+
+def test_large_response_is_gzipped():
+    payload = b'{"v": "' + b"x" * 5000 + b'"}'
+    headers, body, _ = _call(_app([payload]))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body)
+    assert gzip.decompress(body) == payload
+
+
+def test_small_or_unsupported_responses_pass_through():
+    headers, body, _ = _call(_app([b'{"ok": true}']))
+    assert b"content-encoding" not in headers and body == b'{"ok": true}'
+    headers, body, _ = _call(_app([b"x" * 5000], content_type=b"image/png"))
+    assert b"content-encoding" not in headers
+    headers, body, _ = _call(_app([b"x" * 5000]), accept_encoding="identity")
+    assert b"content-encoding" not in headers and body == b"x" * 5000
+
+
+def test_streaming_response_is_flushed_per_chunk():
+    parts = [b'{"n": %d}\n' % i * 20 for i in range(5)]
+    headers, body, messages = _call(_app(parts, content_type=b"application/x-ndjson"))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # Cada fragmento sale comprimido y vaciado, sin esperar al final.
+    assert len(messages) == 1 + len(parts)
+    assert gzip.decompress(body) == b"".join(parts)
+
+
+def test_server_sent_events_are_not_compressed():
+    parts = [b"data: " + b"x" * 2000 + b"\n\n"] * 2
+    headers, body, _ = _call(_app(parts, content_type=b"text/event-stream"))
+    assert b"content-encoding" not in headers and body == b"".join(parts)
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from app.core.ttl_cache import TTLCache
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_embedding_cache_evicts_and_counts_like_ttl_cache():
+    caches = [EmbeddingCache(maxsize=2), TTLCache(maxsize=2, ttl=None)]
+    for cache in caches:
+        cache.put("a", SimpleNamespace(id=1))
+        cache.put("b", SimpleNamespace(id=2))
+        cache.get("a")
+        cache.put("c", SimpleNamespace(id=3))
+        assert cache.get("b") is None
+        assert cache.get("a").id == 1
+    base = caches[1].stats()
+    assert {key: caches[0].stats()[key] for key in base} == base
+
+
+def test_embedding_cache_layer_counters_and_discard_id():
+    cache = EmbeddingCache(maxsize=10)
+    cache.put("a", SimpleNamespace(id=1))
+    cache.record_db_hit()
+    cache.record_miss()
+    cache.discard_id(1)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["misses"], stats["db_hits"], stats["provider_misses"], stats["ttl"]) == (1, 1, 1, None)
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from app import models
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.services import embedding_service
+from app.services.embedding_cache import EmbeddingCache, compute_text_hash
+from app.services.gemini_client import GeminiClient, GeminiError
+
+
+@pytest.fixture(autouse=True)
+def embeddings_table():
+    Base.metadata.create_all(engine)
+    yield
+    with engine.begin() as conn:
+        conn.execute(delete(models.Embedding))
+
+
+class FlakyClient(GeminiClient):
+    """Falla los bloques que contienen ``"boom"``."""
+
+    async def generate_embeddings(self, texts, model=None):
+        if "boom" in texts:
+            raise GeminiError("provider down")
+        return [{"text": text, "text_hash": compute_text_hash(text, model), "model": model,
+                 "embedding": [1.0, float(len(text))]} for text in texts]
+
+
+def test_failed_chunk_keeps_the_others():
+    texts = ["a", "bb", "boom", "ccc", "dddd"]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(GeminiError):
+                await embedding_service.get_or_create_embeddings(
+                    db, FlakyClient(api_key="test"), EmbeddingCache(maxsize=100), texts, model="m", batch_size=2)
+            return await db.scalar(select(func.count()).select_from(models.Embedding))
+
+    # Bloques ["a", "bb"], ["boom", "ccc"], ["dddd"]: se guardan el primero y el último.
+    assert asyncio.run(run()) == 3
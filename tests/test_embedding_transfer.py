@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app.core import config
+from app.services import embedding_transfer
+from app.services.embedding_transfer import EmbeddingImportError, EmbeddingImportTooLarge, iter_lines
+
+
+async def _body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _lines(*chunks, max_line_bytes=None):
+    async def run():
+        return [line async for line in iter_lines(_body(*chunks), max_line_bytes=max_line_bytes)]
+    return asyncio.run(run())
+
+
+def test_iter_lines_joins_chunks():
+    assert _lines(b"ab", b"c\nd", b"\n\ne") == [b"abc", b"d", b"", b"e"]
+
+
+def test_iter_lines_rejects_long_line_before_it_ends():
+    consumed = []
+
+    async def endless():
+        while True:
+            consumed.append(1)
+            yield b"x" * 10
+
+    async def run():
+        async for _ in iter_lines(endless(), max_line_bytes=25):
+            pass
+
+    with pytest.raises(EmbeddingImportError, match="Line 1: line too long"):
+        asyncio.run(run())
+    assert len(consumed) == 3
+
+
+def test_iter_lines_reports_line_number():
+    with pytest.raises(EmbeddingImportError, match="Line 2"):
+        _lines(b"short\n", b"much too long\n", max_line_bytes=8)
+
+
+def test_import_rejects_body_over_limit(monkeypatch):
+    monkeypatch.setattr(config, "EMBEDDING_IMPORT_MAX_BYTES", 10)
+    with pytest.raises(EmbeddingImportTooLarge):
+        asyncio.run(embedding_transfer.import_ndjson(_body(b"\n" * 6, b"\n" * 6)))
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from app.services.endpoint_router import CircuitBreaker, Endpoint, EndpointRouter, parse_endpoints
+
+
+def test_breaker_opens_after_threshold_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.on_failure()
+    assert breaker.state == "closed"
+    breaker.on_failure()
+    assert breaker.state == "open" and not breaker.allows()
+
+    breaker.opened_at = time.monotonic() - 61
+    assert breaker.state == "half_open" and breaker.allows()
+    breaker.on_dispatch()
+    assert not breaker.allows()  # Solo una petición de prueba a la vez.
+    breaker.on_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_router_skips_open_endpoints_and_prefers_untried():
+    a, b = Endpoint("http://a", failure_threshold=1), Endpoint("http://b")
+    router = EndpointRouter([a, b])
+    assert router.choose(exclude=[a]) is b
+    a.record(None, ok=False)
+    assert all(router.choose() is b for _ in range(20))
+    b.record(None, ok=False)
+    b.breaker.opened_at = time.monotonic()
+    assert router.choose() is None and router.rejected == 1
+
+
+def test_router_only_uses_endpoints_serving_the_model():
+    pro, flash, any_model = Endpoint("http://pro", model="pro"), Endpoint("http://flash", model="flash"), \
+        Endpoint("http://any")
+    router = EndpointRouter([pro, flash, any_model])
+    chosen = {router.choose(model="pro").url for _ in range(50)}
+    assert chosen == {"http://pro", "http://any"}
+    assert not EndpointRouter([pro, flash]).serves("other")
+
+
+def test_parse_endpoints():
+    endpoints = parse_endpoints("http://a, http://b|3|pro ,", 5, 30.0)
+    assert [(e.url, e.weight, e.model) for e in endpoints] == [("http://a", 1.0, None), ("http://b", 3.0, "pro")]
+    for spec in ("http://a|0", "http://a|-1"):
+        with pytest.raises(ValueError):
+            parse_endpoints(spec, 5, 30.0)
+
+
+def test_endpoint_that_always_loses_the_hedge_gets_less_traffic():
+    fast, slow = Endpoint("http://fast"), Endpoint("http://slow")
+    for _ in range(5):
+        fast.record(0.01, ok=True)
+        slow.abandon(0.5)  # Cancelado al ganar la copia de respaldo.
+    router = EndpointRouter([fast, slow])
+    chosen = [router.choose().url for _ in range(500)]
+    assert chosen.count("http://slow") < 50
+    slow.abandon(0.001)  # Una cota inferior menor no rebaja la media.
+    assert slow.ewma == pytest.approx(0.5)
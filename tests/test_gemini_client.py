@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import config
+from app.services.endpoint_router import Endpoint, EndpointRouter
+from app.services.gemini_client import GeminiClient, GeminiError
+
+
+def _client(endpoints, slow):
+    """Cliente cuyo envío tarda ``slow[url]`` segundos y devuelve 200."""
+    client = GeminiClient(api_key="test", endpoint="http://primary")
+    router = EndpointRouter(endpoints, hedge_default_delay=0.01)
+    started = []
+
+    async def attempt(endpoint, payload):
+        started.append(endpoint.url)
+        try:
+            await asyncio.sleep(slow[endpoint.url])
+        except asyncio.CancelledError:
+            started.append(f"cancelled {endpoint.url}")
+            raise
+        return httpx.Response(200, json={"url": endpoint.url})
+
+    client._attempt = attempt
+    return client, router, started
+
+
+def test_hedge_uses_its_own_limiter_slot():
+    primary, backup = Endpoint("http://primary"), Endpoint("http://backup")
+    client, router, started = _client([primary, backup], {"http://primary": 1.0, "http://backup": 0.0})
+    limiter = client.limiters["generate"]
+
+    async def run():
+        async with limiter.slot():
+            return await client._hedged_attempt(router, limiter, 0.0, primary, {})
+
+    endpoint, resp = asyncio.run(run())
+    assert endpoint is backup and resp.json() == {"url": "http://backup"}
+    assert "cancelled http://primary" in started
+    assert limiter.concurrency.active == 0
+
+
+def test_hedge_without_endpoint_keeps_the_budget():
+    primary = Endpoint("http://primary")
+    primary.breaker.opened_at = float("inf")  # El único endpoint no admite la copia.
+    client, router, _ = _client([primary], {"http://primary": 0.05})
+    limiter = client.limiters["generate"]
+    balance = limiter.retry_budget.balance
+
+    endpoint, _ = asyncio.run(client._hedged_attempt(router, limiter, 0.0, primary, {}))
+    assert endpoint is primary
+    assert limiter.retry_budget.balance == balance
+
+
+def test_cancelling_the_caller_cancels_the_primary():
+    primary = Endpoint("http://primary")
+    client, router, started = _client([primary], {"http://primary": 1.0})
+    router.hedge_default_delay = 10.0
+
+    async def run():
+        task = asyncio.ensure_future(client._hedged_attempt(router, client.limiters["generate"], 0.0, primary, {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert started == ["http://primary", "cancelled http://primary"]
+
+
+def test_request_is_not_sent_to_an_endpoint_of_another_model():
+    client = GeminiClient(api_key="test", endpoint="http://primary")
+    client.routers["generate"] = EndpointRouter([Endpoint("http://pro", model="pro")])
+    with pytest.raises(GeminiError, match="no endpoint configured"):
+        asyncio.run(client._request("generate", {"model": "flash", "prompt": "hola"}))
+
+
+def test_retry_budget_and_latency_only_count_logical_successes(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_RETRY_BASE_DELAY", 0.0)
+    client = GeminiClient(api_key="test", endpoint="http://primary")
+    limiter = client.limiters["generate"]
+    responses = [httpx.Response(503), httpx.Response(400)]
+
+    async def attempt(endpoint, payload):
+        return responses.pop(0)
+
+    client._attempt = attempt
+    limit = limiter.concurrency.limit
+    balance = limiter.retry_budget.balance
+    resp = asyncio.run(client._request("generate", {"model": client.model, "prompt": "hola"}))
+    assert resp.status_code == 400
+    # Un depósito por la petición y un gasto por el reintento; el 400 no sube el límite.
+    assert limiter.retry_budget.balance == balance + limiter.retry_budget.ratio - 1
+    assert limiter.concurrency.limit == limit
+
+
+def test_explicit_zero_settings_override_config():
+    client = GeminiClient(api_key="", endpoint="http://primary", timeout=0, keepalive_expiry=0)
+    assert client.api_key == ""
+    assert client._client.timeout.read == 0
+    asyncio.run(client.aclose())
+
+
+def test_pool_stats_count_opened_connections():
+    client = GeminiClient(api_key="test", endpoint="http://primary")
+    assert client.pool_stats()["connections_opened"] == 0
+    asyncio.run(client.aclose())
+
+
+def test_cancelled_attempt_counts_as_latency_lower_bound():
+    client = GeminiClient(api_key="test", endpoint="http://primary")
+    slow = Endpoint("http://slow")
+
+    async def post(url, payload):
+        await asyncio.sleep(1.0)
+
+    client._post = post
+
+    async def run():
+        task = asyncio.ensure_future(client._attempt(slow, {}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert slow.ewma >= 0.05 and not slow.latencies
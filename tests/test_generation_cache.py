@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select
+
+from app import models
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.services.generation_cache import DatabaseBackend
+
+
+@pytest.fixture(autouse=True)
+def cache_table():
+    Base.metadata.create_all(engine)
+    yield
+    with engine.begin() as conn:
+        conn.execute(delete(models.GenerationCacheEntry))
+
+
+def _evict(backend, entries):
+    """Inserta ``(key, size, minutes_ago)`` y devuelve las claves que quedan tras ``evict``."""
+    now = datetime.now(timezone.utc)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                models.GenerationCacheEntry(key=key, response="{}", size_bytes=size, latency_ms=1.0,
+                                            created_at=now - timedelta(minutes=minutes_ago),
+                                            expires_at=now + timedelta(hours=1))
+                for key, size, minutes_ago in entries
+            ])
+            await db.commit()
+            await backend.evict(db)
+            return set(await db.scalars(select(models.GenerationCacheEntry.key)))
+
+    return asyncio.run(run())
+
+
+def test_evict_keeps_the_newest_entries():
+    backend = DatabaseBackend(ttl=60, max_entries=2, max_bytes=10_000)
+    assert _evict(backend, [("a", 10, 3), ("b", 10, 2), ("c", 10, 1)]) == {"b", "c"}
+
+
+def test_evict_respects_the_byte_limit():
+    backend = DatabaseBackend(ttl=60, max_entries=10, max_bytes=25)
+    assert _evict(backend, [("a", 10, 3), ("b", 10, 2), ("c", 10, 1)]) == {"b", "c"}
@@ -0,0 +1,58 @@
+import asyncio
+import random
+
+from app.services.ingestion import chunk_text
+
+
+async def _pieces(text, piece_size):
+    for i in range(0, len(text), piece_size):
+        yield text[i:i + piece_size]
+
+
+def _chunks(text, size, overlap, piece_size=97):
+    async def collect():
+        return [chunk async for chunk in chunk_text(_pieces(text, piece_size), size, overlap)]
+    return asyncio.run(collect())
+
+
+def _assert_covers(text, chunks, size):
+    covered = set()
+    for offset, chunk in chunks:
+        assert len(chunk) <= size
+        position = text.index(chunk, offset)
+        covered.update(range(position, position + len(chunk)))
+    missing = [i for i, char in enumerate(text) if not char.isspace() and i not in covered]
+    assert not missing, f"uncovered text: {text[missing[0]:missing[0] + 40]!r}"
+
+
+def _random_text(rng, words):
+    return " ".join("".join(rng.choice("abcdefghij") for _ in range(rng.randint(1, 12)))
+                    for _ in range(words))
+
+
+def test_chunks_cover_whole_input_with_default_settings():
+    rng = random.Random(0)
+    for _ in range(500):
+        text = _random_text(rng, rng.randint(1, 600))
+        _assert_covers(text, _chunks(text, 1000, 200), 1000)
+
+
+def test_chunks_cover_whole_input_with_other_settings():
+    rng = random.Random(1)
+    for _ in range(1000):
+        size = rng.randint(20, 200)
+        overlap = rng.randint(0, size)
+        text = _random_text(rng, rng.randint(1, 120))
+        _assert_covers(text, _chunks(text, size, overlap, piece_size=rng.randint(1, 50)), size)
+
+
+def test_consecutive_chunks_overlap():
+    text = " ".join(f"w{i}" for i in range(400))
+    chunks = _chunks(text, 100, 30)
+    for (_, previous), (_, current) in zip(chunks, chunks[1:]):
+        assert current.split()[0] in previous.split()
+
+
+def test_short_text_is_a_single_chunk():
+    assert _chunks("hola mundo", 100, 20) == [(0, "hola mundo")]
+    assert _chunks("   ", 100, 20) == []
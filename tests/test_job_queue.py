@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, update
+
+from app import crud_async, models
+from app.core.database import AsyncSessionLocal, Base, engine
+
+
+@pytest.fixture(autouse=True)
+def jobs_table():
+    Base.metadata.create_all(engine)
+    yield
+    with engine.begin() as conn:
+        conn.execute(delete(models.Job))
+
+
+async def _create(owner, count):
+    async with AsyncSessionLocal() as db:
+        for _ in range(count):
+            await crud_async.create_job(db, kind="generate", payload={"prompt": "hola"}, owner=owner)
+
+
+async def _claim(limit):
+    async with AsyncSessionLocal() as db:
+        job = await crud_async.claim_next_job(db, limit)
+        return job.owner if job else None
+
+
+def test_concurrent_claims_respect_the_owner_limit():
+    async def run():
+        await _create("ana", 4)
+        await _create("luis", 1)
+        return await asyncio.gather(*(_claim(1) for _ in range(4)))
+
+    claimed = asyncio.run(run())
+    assert sorted(owner for owner in claimed if owner) == ["ana", "luis"]
+
+
+def test_requeue_only_takes_jobs_without_heartbeat():
+    async def run():
+        await _create("ana", 2)
+        async with AsyncSessionLocal() as db:
+            alive = await crud_async.claim_next_job(db, 2)
+            dead = await crud_async.claim_next_job(db, 2)
+            # Los dos empezaron hace una hora; solo uno sigue renovando el latido.
+            await db.execute(update(models.Job).values(started_at=_hour_ago(), heartbeat_at=_hour_ago()))
+            await db.commit()
+            await crud_async.touch_job(db, alive.id)
+            assert await crud_async.requeue_stale_jobs(db, 600) == (1, 0)
+            statuses = {job.id: job.status for job in [await crud_async.get_job(db, alive.id),
+                                                        await crud_async.get_job(db, dead.id)]}
+        return statuses[alive.id], statuses[dead.id]
+
+    assert asyncio.run(run()) == ("running", "queued")
+
+
+def test_requeue_fails_jobs_without_attempts_left():
+    async def run():
+        await _create("ana", 2)
+        async with AsyncSessionLocal() as db:
+            retry = await crud_async.claim_next_job(db, 2)
+            last = await crud_async.claim_next_job(db, 2)
+            await db.execute(update(models.Job).values(started_at=_hour_ago(), heartbeat_at=_hour_ago()))
+            await db.execute(update(models.Job).where(models.Job.id == last.id).values(attempts=3))
+            await db.commit()
+            assert await crud_async.requeue_stale_jobs(db, 600) == (1, 1)
+            retry, last = await crud_async.get_job(db, retry.id), await crud_async.get_job(db, last.id)
+        return retry.status, last.status, last.error is not None
+
+    assert asyncio.run(run()) == ("queued", "failed", True)
+
+
+def _hour_ago():
+    return datetime.now(timezone.utc) - timedelta(hours=1)
@@ -0,0 +1,65 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(metrics.RequestMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield b"a"
+            yield b"b"
+        return StreamingResponse(chunks())
+
+    return app
+
+
+def _count(method, route, status):
+    return metrics.http_requests._values.get((method, route, status), 0)
+
+
+def test_requests_are_counted_by_full_route_template():
+    from app.core.database import Base, engine
+    from app.main import app
+
+    Base.metadata.create_all(engine)
+    keys = [("GET", "/gemini/embeddings/{embedding_id}", 401), ("POST", "/jobs", 401),
+            ("GET", "/metrics", 200), ("POST", "/auth/signup", 422), ("GET", "unmatched", 404)]
+    before = [_count(*key) for key in keys]
+    with TestClient(app) as client:
+        assert client.get("/gemini/embeddings/1").status_code == 401
+        assert client.get("/gemini/embeddings/2").status_code == 401
+        assert client.post("/jobs", json={}).status_code == 401
+        assert client.get("/metrics").status_code == 200
+        assert client.post("/auth/signup", json={}).status_code == 422
+        assert client.get("/missing").status_code == 404
+    assert [_count(*key) - count for key, count in zip(keys, before)] == [2, 1, 1, 1, 1]
+
+
+def test_streaming_responses_are_counted():
+    client = TestClient(_app())
+    before = _count("GET", "/stream", 200)
+    assert client.get("/stream").text == "ab"
+    assert client.get("/items/1").status_code == 200
+    assert _count("GET", "/stream", 200) - before == 1
+    assert _count("GET", "/items/{item_id}", 200) >= 1
+
+
+def test_model_label_groups_unknown_models(monkeypatch):
+    monkeypatch.setattr(metrics, "_known_models", None)
+    monkeypatch.setattr(metrics.config, "METRICS_MODELS", "extra-model")
+    monkeypatch.setattr(metrics.config, "GEMINI_ENDPOINTS", "http://a|1|pro,http://b")
+    assert metrics.model_label(metrics.config.GEMINI_MODEL) == metrics.config.GEMINI_MODEL
+    assert metrics.model_label("extra-model") == "extra-model"
+    assert metrics.model_label("pro") == "pro"
+    assert metrics.model_label("anything-a-client-sends") == "other"
+    assert metrics.model_label(None) == "other"
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.pagination import encode_cursor, keyset_page
+from app.core.database import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/pages.db")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _pages(fetch, limit):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = fetch(cursor, limit)
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            return seen
+
+
+def test_system_messages_pages_cover_every_row_once(db):
+    # Todas en el mismo segundo: created_at no desempata.
+    db.add_all([models.SystemMessage(name=f"m{i}", content="x") for i in range(23)])
+    db.commit()
+    seen = _pages(lambda cursor, limit: crud.get_system_messages(db, cursor=cursor, limit=limit), 5)
+    assert seen == sorted(seen)
+    assert len(seen) == 23 == len(set(seen))
+
+
+def test_embeddings_pages_newest_first(db):
+    db.execute(models.Embedding.insert_ignore_duplicates("sqlite"),
+               [models.Embedding.row_values({"text": f"t{i}", "text_hash": f"{i:064x}", "model": "m",
+                                             "embedding": [float(i), 1.0]}) for i in range(17)])
+    db.commit()
+    seen = _pages(lambda cursor, limit: crud.get_embeddings(db, cursor=cursor, limit=limit), 4)
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == 17 == len(set(seen))
+
+
+def test_cursor_without_created_at_is_rejected():
+    with pytest.raises(ValueError):
+        keyset_page(select(models.SystemMessage), models.SystemMessage.created_at, models.SystemMessage.id,
+                    encode_cursor(None, 3), 10, dialect="postgresql")
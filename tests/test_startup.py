@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en un proceso nuevo: en este los módulos ya pueden estar importados.
+IMPORT_CHECK = """
+import json, sys
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+connections = []
+event.listen(Pool, "connect", lambda *args: connections.append(1))
+import app.main
+print(json.dumps({
+    "connections": len(connections),
+    "jose": "jose" in sys.modules,
+    "passlib": "passlib" in sys.modules,
+}))
+"""
+
+
+def test_importing_the_app_is_cheap():
+    out = subprocess.run([sys.executable, "-c", IMPORT_CHECK], cwd=ROOT, env=os.environ.copy(),
+                         check=True, capture_output=True, text=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result == {"connections": 0, "jose": False, "passlib": False}
+
+
+def test_lifespan_starts_and_warms_system_messages():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete
+
+    from app import models
+    from app.core.database import Base, engine
+    from app.main import app
+    from app.services.system_message_service import system_message_cache
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.SystemMessage.__table__.insert().values(name="warm-test", content="Hola"))
+    system_message_cache.clear()
+    try:
+        with TestClient(app) as client:
+            assert client.get("/").status_code == 200
+            assert len(system_message_cache) == 1
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(models.SystemMessage))
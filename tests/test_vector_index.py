@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.vector_index import VectorIndex
+
+
+def _row(embedding_id, vector, model="m"):
+    return SimpleNamespace(id=embedding_id, text=f"t{embedding_id}", model=model, array=np.asarray(vector))
+
+
+def test_mutations_during_aload_are_applied():
+    index = VectorIndex()
+    vectors = np.eye(4, dtype=np.float32)
+
+    async def rows():
+        yield _row(1, vectors[0])
+        # Llegan mientras la carga sigue leyendo la tabla.
+        index.add(3, "t3", "m", vectors[2])
+        index.remove(1)
+        await asyncio.sleep(0)
+        yield _row(2, vectors[1])
+
+    asyncio.run(index.aload(rows()))
+    assert index.loaded
+    assert index.stats()["m"]["rows"] == 2
+    assert index.search(vectors[2], "m", k=1)[0][0] == 3
+    assert all(result[0] != 1 for result in index.search(vectors[0], "m", k=4))
+
+
+def test_mutations_before_load_are_ignored():
+    index = VectorIndex()
+    index.add(1, "t1", "m", [1.0, 0.0])
+    assert not index.loaded
+    index.load([_row(2, [0.0, 1.0])])
+    assert index.stats()["m"]["rows"] == 1
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.vector_store import MmapVectorIndex
+
+
+def _row(embedding_id, vector, model="m"):
+    return SimpleNamespace(id=embedding_id, model=model, array=np.asarray(vector, dtype=np.float32),
+                           text_hash=f"{embedding_id:064x}")
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((40, 8)).astype(np.float32)
+
+
+def test_round_trip_between_instances(tmp_path, vectors):
+    writer = MmapVectorIndex(str(tmp_path))
+    writer.load([_row(i + 1, vector) for i, vector in enumerate(vectors)], batch_size=7)
+    reader = MmapVectorIndex(str(tmp_path))
+
+    results = reader.search(vectors[3], "m", k=3)
+    assert results[0][0] == 4
+    assert results[0][1] is None
+    assert results[0][2] == pytest.approx(1.0, abs=1e-5)
+    assert reader.resume_after_id == 40
+
+    writer.add(41, "nuevo", "m", vectors[10] * 2, text_hash="f" * 64)
+    writer.remove(11)
+    assert reader.search(vectors[10], "m", k=1)[0][0] == 41
+    assert 11 not in [embedding_id for embedding_id, _, _ in reader.search(vectors[10], "m", k=40)]
+
+
+def test_catch_up_skips_rows_already_added(tmp_path, vectors):
+    index = MmapVectorIndex(str(tmp_path))
+    index.add(5, "", "m", vectors[4])
+    index.load([_row(i + 1, vector) for i, vector in enumerate(vectors[:10])])
+    assert index.stats()["m"]["rows"] == 10
+
+
+def test_stats_and_compact_ignore_state_files(tmp_path, vectors):
+    index = MmapVectorIndex(str(tmp_path))
+    index.load([_row(i + 1, vector) for i, vector in enumerate(vectors[:10])])
+    index.remove(2)
+    # lock, state.json y deleted.i64 ya existen junto a los directorios de modelo.
+    assert index.stats()["m"]["rows"] == 10
+    assert index.compact() == {"m": 1}
+    assert index.stats()["m"] == {"rows": 9, "dim": 8, "ann": False, "generation": 1, "mmap": True}
+    assert 2 not in [embedding_id for embedding_id, _, _ in index.search(vectors[1], "m", k=10)]
+
+
+def test_append_after_partial_write_stays_aligned(tmp_path, vectors):
+    index = MmapVectorIndex(str(tmp_path))
+    index.load([_row(i + 1, vector) for i, vector in enumerate(vectors[:5])])
+    store = index._store("m")
+    vectors_path, rows_path = store._files()
+    # Simula una caída entre la escritura del vector y la de su fila (y una fila a medias).
+    with open(vectors_path, "ab") as f:
+        f.write(np.ones(8, dtype="<f4").tobytes())
+    with open(rows_path, "ab") as f:
+        f.write(b"\0" * 10)
+
+    index.add(6, "", "m", vectors[5])
+    index.add(7, "", "m", vectors[6])
+    for i in (5, 6):
+        assert index.search(vectors[i], "m", k=1)[0][0] == i + 1